@@ -2,12 +2,14 @@ from __future__ import absolute_import, division, print_function
 import logging; _L = logging.getLogger('openaddr')
 
 from tempfile import mkdtemp, mkstemp
-from os.path import realpath, join, splitext, exists, dirname, abspath, relpath
-from shutil import copy, move, rmtree
+from os.path import realpath, join, splitext, exists, dirname, abspath, relpath, getsize
+from shutil import move, rmtree
 from os import close, utime, remove
 from urllib.parse import urlparse
 from datetime import datetime, date
 from calendar import timegm
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 import requests
 
 from boto.s3.connection import S3Connection
@@ -34,6 +36,11 @@ from .conform import (
 with open(join(dirname(__file__), 'VERSION')) as file:
     __version__ = file.read().strip()
 
+# Processed files downloaded at once, and bytes of them kept on disk ahead
+# of the consumer, by iterate_local_processed_files().
+PREFETCH_FILES = 4
+PREFETCH_BYTES = 2 * 1024 * 1024 * 1024
+
 class S3:
     _bucket = None
 
@@ -69,7 +76,7 @@ class LocalProcessedResult:
         self.run_state = run_state
         self.code_version = code_version
 
-def cache(data_source_name, data_source, destdir, extras):
+def cache(data_source_name, data_source, destdir, extras, download_cache=None, workers=1):
     ''' Python wrapper for openaddress-cache.
 
         Return a CacheResult object:
@@ -80,7 +87,9 @@ def cache(data_source_name, data_source, destdir, extras):
           elapsed: elapsed time as timedelta object
           output: subprocess output as string
 
-        Creates and destroys a subdirectory in destdir.
+        Creates and destroys a subdirectory in destdir. Unchanged files
+        are reused from download_cache, an optional cache.DownloadCache.
+        ESRI geometries are converted using up to the given number of processes.
     '''
     start = datetime.now()
     workdir = mkdtemp(prefix='cache-', dir=destdir)
@@ -93,7 +102,7 @@ def cache(data_source_name, data_source, destdir, extras):
 
     protocol_string = data_source.get('protocol')
 
-    task = DownloadTask.from_protocol_string(protocol_string, data_source_name)
+    task = DownloadTask.from_protocol_string(protocol_string, data_source_name, download_cache, workers)
     downloaded_files = task.download(source_urls, workdir, data_source.get('conform'))
 
     # FIXME: I wrote the download stuff to assume multiple files because
@@ -108,7 +117,8 @@ def cache(data_source_name, data_source, destdir, extras):
     #
     resultdir = join(destdir, 'cached')
     data_source['cache'], data_source['fingerprint'] \
-        = compare_cache_details(filepath_to_upload, resultdir, data_source)
+        = compare_cache_details(filepath_to_upload, resultdir, data_source,
+                                task.fingerprints.get(downloaded_files[0]))
 
     rmtree(workdir)
 
@@ -117,7 +127,7 @@ def cache(data_source_name, data_source, destdir, extras):
                        data_source.get('version', None),
                        datetime.now() - start)
 
-def conform(data_source_name, data_source, destdir, extras):
+def conform(data_source_name, data_source, destdir, extras, workers=1, extract_path=None):
     ''' Python wrapper for openaddresses-conform.
 
         Return a ConformResult object:
@@ -127,21 +137,17 @@ def conform(data_source_name, data_source, destdir, extras):
           geometry_type: typically Point or Polygon
           elapsed: elapsed time as timedelta object
           output: subprocess output as string
+          stats: ConformStats of processed rows, e.g. invalid locations
 
-        Creates and destroys a subdirectory in destdir.
+        Creates and destroys a subdirectory in destdir. Rows are conformed
+        using up to the given number of worker processes. Extracted source
+        rows are kept in a CSV file at extract_path, if given, for debugging.
     '''
     start = datetime.now()
     workdir = mkdtemp(prefix='conform-', dir=destdir)
 
     data_source.update(extras)
 
-    #
-    # The cached data will be a local path.
-    #
-    scheme, _, cache_path, _, _, _ = urlparse(extras.get('cache', ''))
-    if scheme == 'file':
-        copy(cache_path, workdir)
-
     source_urls = data_source.get('cache')
     if not isinstance(source_urls, list):
         source_urls = [source_urls]
@@ -150,9 +156,12 @@ def conform(data_source_name, data_source, destdir, extras):
     downloaded_path = task1.download(source_urls, workdir)
     _L.info("Downloaded to %s", downloaded_path)
 
+    # A single CSV named in a zip file is streamed instead of extracted.
+    stream = bool(data_source.get('conform', {}).get('format') == 'csv')
+
     task2 = DecompressionTask.from_format_string(data_source.get('compression'))
     names = elaborate_filenames(data_source.get('conform', {}).get('file', None))
-    decompressed_paths = task2.decompress(downloaded_path, workdir, names)
+    decompressed_paths = task2.decompress(downloaded_path, workdir, names, stream)
     _L.info("Decompressed to %d files", len(decompressed_paths))
 
     task3 = ExcerptDataTask()
@@ -167,7 +176,7 @@ def conform(data_source_name, data_source, destdir, extras):
 
     task4 = ConvertToCsvTask()
     try:
-        csv_path, addr_count = task4.convert(data_source, decompressed_paths, workdir)
+        csv_path, addr_count, conform_stats = task4.convert(data_source, decompressed_paths, workdir, workers, extract_path)
         if addr_count > 0:
             _L.info("Converted to %s with %d addresses", csv_path, addr_count)
         else:
@@ -175,7 +184,7 @@ def conform(data_source_name, data_source, destdir, extras):
             csv_path = None
     except Exception as e:
         _L.warning("Error doing conform; skipping", exc_info=True)
-        csv_path, addr_count = None, 0
+        csv_path, addr_count, conform_stats = None, 0, None
 
     out_path = None
     if csv_path is not None and exists(csv_path):
@@ -197,42 +206,105 @@ def conform(data_source_name, data_source, destdir, extras):
                          datetime.now() - start,
                          sharealike_flag,
                          attr_flag,
-                         attr_name)
+                         attr_name,
+                         conform_stats)
 
-def iterate_local_processed_files(runs, sort_on='datetime_tz'):
+def iterate_local_processed_files(runs, sort_on='datetime_tz', processed_cache=None,
+                                  prefetch=1, prefetch_bytes=PREFETCH_BYTES):
     ''' Yield a stream of local processed result files for a list of runs.
 
-        Used in ci.collect and dotmap processes.
+        Used in ci.collect, ci.tileindex and dotmap processes. Files are
+        reused from processed_cache, an optional cache.DownloadCache keyed
+        on process hash, and must not be modified in place.
+
+        Up to prefetch files are downloaded at once ahead of the consumer,
+        while those waiting on disk total less than prefetch_bytes.
     '''
     if sort_on == 'source_path':
         reverse, key = False, lambda run: run.source_path
     else:
         reverse, key = True, lambda run: run.datetime_tz or date(1970, 1, 1)
 
-    for run in sorted(runs, key=key, reverse=reverse):
-        source_base, _ = splitext(relpath(run.source_path, 'sources'))
-        processed_url = run.state and run.state.processed
-        run_state = run.state
+    runs = iter([run for run in sorted(runs, key=key, reverse=reverse)
+                 if run.state and run.state.processed])
 
-        if not processed_url:
-            continue
+    executor, pending = ThreadPoolExecutor(prefetch), deque()
 
-        try:
-            filename = download_processed_file(processed_url)
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 404:
-                continue
-            else:
-                _L.error('HTTP {} while downloading {}: {}'.format(e.response.status_code, processed_url, e))
+    try:
+        while True:
+            # Start more downloads while there's room for them.
+            while len(pending) < prefetch and _prefetched_bytes(pending) < prefetch_bytes:
+                run = next(runs, None)
+                if run is None:
+                    break
+                args = run.state.processed, run.state.process_hash, processed_cache
+                pending.append((run, executor.submit(_get_processed_file, *args)))
+
+            if not pending:
+                break
+
+            run, future = pending.popleft()
+            source_base, _ = splitext(relpath(run.source_path, 'sources'))
+            processed_url = run.state.processed
+
+            try:
+                filename = future.result()
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code == 404:
+                    continue
+                else:
+                    _L.error('HTTP {} while downloading {}: {}'.format(e.response.status_code, processed_url, e))
+                    continue
+            except Exception as e:
+                _L.error('Failed to download {}: {}'.format(processed_url, e))
                 continue
-        except Exception as e:
-            _L.error('Failed to download {}: {}'.format(processed_url, e))
-            continue
 
-        yield LocalProcessedResult(source_base, filename, run_state, run.code_version)
+            try:
+                yield LocalProcessedResult(source_base, filename, run.state, run.code_version)
+            finally:
+                if filename and exists(filename):
+                    remove(filename)
+
+    finally:
+        # Clean up after any downloads the consumer will never see.
+        for (_, future) in pending:
+            future.cancel()
+
+        executor.shutdown()
 
-        if filename and exists(filename):
-            remove(filename)
+        for (_, future) in pending:
+            if not future.cancelled() and future.exception() is None:
+                if future.result() and exists(future.result()):
+                    remove(future.result())
+
+def _prefetched_bytes(pending):
+    ''' Count bytes of finished downloads waiting for the consumer.
+    '''
+    filenames = [future.result() for (_, future) in pending
+                 if future.done() and not future.cancelled() and future.exception() is None]
+
+    return sum([getsize(filename) for filename in filenames if filename and exists(filename)])
+
+def _get_processed_file(url, process_hash, processed_cache):
+    ''' Get a local processed file, from processed_cache if possible.
+    '''
+    if processed_cache is None or not process_hash:
+        return download_processed_file(url)
+
+    _, ext = splitext(urlparse(url).path)
+    handle, filename = mkstemp(prefix='processed-', suffix=ext)
+    close(handle)
+
+    if processed_cache.checkout_fingerprint(process_hash, filename):
+        _L.debug('Found {} in processed cache'.format(url))
+        return filename
+
+    filename = download_processed_file(url)
+
+    if not processed_cache.checkin_fingerprint(filename, process_hash):
+        _L.warning('Not caching {}, which does not match its process hash'.format(url))
+
+    return filename
 
 def download_processed_file(url):
     ''' Download a URL to a local temporary file, return its path.
@@ -2,12 +2,16 @@ from __future__ import absolute_import, division, print_function
 import logging; _L = logging.getLogger('openaddr.cache')
 
 import os
+import time
 import errno
 import math
 import mimetypes
-import shutil
 import re
 import csv
+import fcntl
+import socket
+import multiprocessing
+import threading
 import simplejson as json
 
 from os import mkdir
@@ -18,8 +22,11 @@ from subprocess import check_output
 from tempfile import mkstemp
 from hashlib import sha1
 from shutil import move
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from collections import deque
 from shapely.geometry import shape
-from esridump import EsriDumper
+from esridump import EsriDumper, esri2geojson
 from esridump.errors import EsriDownloadError
 
 import requests
@@ -27,6 +34,21 @@ import requests
 # HTTP timeout in seconds, used in various calls to requests.get() and requests.post()
 _http_timeout = 180
 
+# Number of times to retry an ESRI page request that fails to connect
+ESRI_PAGE_RETRIES = 3
+
+# HTTP timeout in seconds for ESRI requests, features per page for layers
+# with no maxRecordCount, and most features per page, as in EsriDumper.
+ESRI_TIMEOUT = 300
+ESRI_PAGE_SIZE = 500
+ESRI_MAX_PAGE_SIZE = 1000
+
+# Default size in bytes of a DownloadCache directory
+DOWNLOAD_CACHE_BYTES = 20 * 1024 * 1024 * 1024
+
+# Age in seconds after which abandoned partial downloads are removed from a DownloadCache
+DOWNLOAD_CACHE_PARTIAL_AGE = 7 * 24 * 60 * 60
+
 from .conform import X_FIELDNAME, Y_FIELDNAME, GEOM_FIELDNAME, attrib_types
 from . import util
 
@@ -81,23 +103,32 @@ class CacheResult:
         return dict(cache=self.cache, fingerprint=self.fingerprint, version=self.version)
 
 
-def compare_cache_details(filepath, resultdir, data):
+def _file_md5(path):
+    ''' Return the MD5 hex digest of a file's contents.
+    '''
+    fingerprint = md5()
+
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            fingerprint.update(block)
+
+    return fingerprint.hexdigest()
+
+def compare_cache_details(filepath, resultdir, data, fingerprint=None):
     ''' Compare cache file with known source data, return cache and fingerprint.
 
         Checks if fresh data is already cached, returns a new file path if not.
+        An MD5 fingerprint already known for the file can be passed in.
     '''
     if not exists(filepath):
         raise Exception('cached file {} is missing'.format(filepath))
 
-    fingerprint = md5()
-
-    with open(filepath, 'rb') as file:
-        for line in file:
-            fingerprint.update(line)
+    if fingerprint is None:
+        fingerprint = _file_md5(filepath)
 
     # Determine if anything needs to be done at all.
     if urlparse(data.get('cache', '')).scheme == 'http' and 'fingerprint' in data:
-        if fingerprint.hexdigest() == data['fingerprint']:
+        if fingerprint == data['fingerprint']:
             return data['cache'], data['fingerprint']
 
     cache_name = basename(filepath)
@@ -108,7 +139,189 @@ def compare_cache_details(filepath, resultdir, data):
     move(filepath, join(resultdir, cache_name))
     data_cache = 'file://' + join(abspath(resultdir), cache_name)
 
-    return data_cache, fingerprint.hexdigest()
+    return data_cache, fingerprint
+
+class DownloadCache:
+    ''' Content-addressed directory of downloaded files, shared across runs.
+
+        Files are stored once under their MD5 fingerprint, and each URL
+        remembers the ETag and Last-Modified validators of its latest file.
+        Least-recently used files are evicted past a total size in bytes.
+        Concurrent workers coordinate through a lock file in the directory.
+
+        Partial downloads are also kept here by URL, so a failed download
+        can be resumed by a later run instead of starting over.
+    '''
+    def __init__(self, path, max_bytes=DOWNLOAD_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        mkdirsp(join(path, 'objects'))
+        mkdirsp(join(path, 'urls'))
+        mkdirsp(join(path, 'partial'))
+
+    @contextmanager
+    def _locked(self):
+        with open(join(self.path, 'lock'), 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _url_path(self, url):
+        return join(self.path, 'urls', sha1(url.encode('utf8')).hexdigest() + '.json')
+
+    def _object_path(self, fingerprint):
+        return join(self.path, 'objects', fingerprint)
+
+    @contextmanager
+    def partial(self, url):
+        ''' Hold the part file path for a URL, kept across runs to resume downloads.
+
+            Yields None if another worker is downloading the same URL now.
+        '''
+        part_path = join(self.path, 'partial', sha1(url.encode('utf8')).hexdigest())
+
+        with open(part_path + '.lock', 'a') as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except (IOError, OSError):
+                yield None
+                return
+
+            try:
+                yield part_path
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def checkout(self, url, dest_path):
+        ''' Link the cached file for a URL to dest_path, return its entry or None.
+
+            Entries are dictionaries with "etag", "last_modified" and "fingerprint".
+        '''
+        with self._locked():
+            try:
+                with open(self._url_path(url)) as file:
+                    entry = json.load(file)
+                object_path = self._object_path(entry['fingerprint'])
+                util.link_or_copy(object_path, dest_path)
+            except (IOError, OSError, ValueError, KeyError):
+                return None
+
+            # Mark the file as recently used.
+            os.utime(object_path)
+
+        return entry
+
+    def checkin(self, url, path, etag, last_modified, fingerprint=None):
+        ''' Save a copy of a downloaded file for a URL, return its MD5 fingerprint.
+        '''
+        if fingerprint is None:
+            fingerprint = _file_md5(path)
+
+        entry = dict(url=url, etag=etag, last_modified=last_modified, fingerprint=fingerprint)
+        url_path = self._url_path(url)
+
+        with self._locked():
+            self._save_object(path, fingerprint)
+
+            with open(url_path + '.tmp', 'w') as file:
+                json.dump(entry, file)
+            os.rename(url_path + '.tmp', url_path)
+
+            self._evict()
+
+        return fingerprint
+
+    def checkout_fingerprint(self, fingerprint, dest_path):
+        ''' Link the cached file with an MD5 fingerprint to dest_path.
+
+            Returns true if the file was found in the cache.
+        '''
+        object_path = self._object_path(fingerprint)
+
+        with self._locked():
+            try:
+                util.link_or_copy(object_path, dest_path)
+            except (IOError, OSError):
+                return False
+
+            # Mark the file as recently used.
+            os.utime(object_path)
+
+        return True
+
+    def checkin_fingerprint(self, path, fingerprint):
+        ''' Save a copy of a file expected to have an MD5 fingerprint.
+
+            Returns false without saving anything if the file doesn't match.
+        '''
+        if _file_md5(path) != fingerprint:
+            return False
+
+        with self._locked():
+            self._save_object(path, fingerprint)
+            self._evict()
+
+        return True
+
+    def _save_object(self, path, fingerprint):
+        ''' Atomically add a file to the cache, if it's not there already.
+        '''
+        object_path = self._object_path(fingerprint)
+
+        if not exists(object_path):
+            util.link_or_copy(path, object_path + '.tmp')
+            os.rename(object_path + '.tmp', object_path)
+
+        os.utime(object_path)
+
+    def _evict(self):
+        ''' Remove least-recently used files until the cache fits in max_bytes.
+        '''
+        objects_dir = join(self.path, 'objects')
+        objects = []
+
+        for name in os.listdir(objects_dir):
+            stat = os.stat(join(objects_dir, name))
+            objects.append((stat.st_mtime, stat.st_size, join(objects_dir, name)))
+
+        total = sum([size for (_, size, _) in objects])
+
+        for (_, size, object_path) in sorted(objects):
+            if total <= self.max_bytes:
+                break
+
+            _L.debug('Evicting {} bytes in {} from download cache'.format(size, object_path))
+            os.remove(object_path)
+            total -= size
+
+        self._evict_partials()
+
+    def _evict_partials(self):
+        ''' Remove partial downloads untouched for DOWNLOAD_CACHE_PARTIAL_AGE.
+        '''
+        partial_dir, cutoff = join(self.path, 'partial'), time.time() - DOWNLOAD_CACHE_PARTIAL_AGE
+
+        for name in os.listdir(partial_dir):
+            if not name.endswith('.lock') or os.stat(join(partial_dir, name)).st_mtime > cutoff:
+                continue
+
+            part_path = join(partial_dir, name[:-len('.lock')])
+            paths = [path for path in (part_path, part_path + '.json') if exists(path)]
+
+            if any([os.stat(path).st_mtime > cutoff for path in paths]):
+                continue
+
+            with open(part_path + '.lock', 'a') as file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    continue
+
+                _L.debug('Evicting partial download {} from download cache'.format(part_path))
+                for path in paths + [part_path + '.lock']:
+                    os.remove(path)
 
 class DownloadError(Exception):
     pass
@@ -116,11 +329,13 @@ class DownloadError(Exception):
 
 class DownloadTask(object):
 
-    def __init__(self, source_prefix, params={}, headers={}):
+    def __init__(self, source_prefix, params={}, headers={}, download_cache=None, workers=1):
         '''
 
             params: Additional query parameters, used by EsriRestDownloadTask.
             headers: Additional HTTP headers.
+            download_cache: Optional DownloadCache, used by URLDownloadTask.
+            workers: Number of processes, used by EsriRestDownloadTask.
         '''
         self.source_prefix = source_prefix
         self.headers = {
@@ -128,16 +343,21 @@ class DownloadTask(object):
         }
         self.headers.update(dict(**headers))
         self.query_params = dict(**params)
+        self.download_cache = download_cache
+        self.workers = workers
+
+        # MD5 fingerprints of downloaded files, where already known.
+        self.fingerprints = dict()
 
 
     @classmethod
-    def from_protocol_string(clz, protocol_string, source_prefix=None):
+    def from_protocol_string(clz, protocol_string, source_prefix=None, download_cache=None, workers=1):
         if protocol_string.lower() == 'http':
-            return URLDownloadTask(source_prefix)
+            return URLDownloadTask(source_prefix, download_cache=download_cache)
         elif protocol_string.lower() == 'ftp':
             return URLDownloadTask(source_prefix)
         elif protocol_string.lower() == 'esri':
-            return EsriRestDownloadTask(source_prefix)
+            return EsriRestDownloadTask(source_prefix, workers=workers)
         else:
             raise KeyError("I don't know how to extract for protocol {}".format(protocol_string))
 
@@ -225,9 +445,38 @@ def get_content_mimetype(chunk):
 
     return mime_type.decode('utf-8')
 
+def _response_length(resp):
+    ''' Return the length in bytes of a response body, or None if unknown.
+    '''
+    if resp.headers.get('Content-Encoding', 'identity') != 'identity':
+        # Content-Length counts encoded bytes, but requests decodes them.
+        return None
+
+    try:
+        return int(resp.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+def _range_validator(resp):
+    ''' Return a strong ETag or Last-Modified date to use with If-Range, or None.
+    '''
+    etag = resp.headers.get('ETag')
+
+    if etag and not etag.startswith('W/'):
+        return etag
+
+    return resp.headers.get('Last-Modified')
+
 class URLDownloadTask(DownloadTask):
     CHUNK = 16 * 1024
 
+    # Servers that accept byte ranges send large files in segments of this
+    # size, several at once. Dropped connections are resumed a few times.
+    SEGMENT = 64 * 1024 * 1024
+    SEGMENT_WORKERS = 4
+    RETRIES = 5
+    RETRY_DELAY = 1
+
     def get_file_path(self, url, dir_path):
         ''' Return a local file path in a directory for a URL.
 
@@ -262,35 +511,429 @@ class URLDownloadTask(DownloadTask):
             # Instead, implement a FileDownloadTask class?
             scheme, _, path, _, _, _ = urlparse(source_url)
             if scheme == 'file':
-                shutil.copy(path, file_path)
+                util.link_or_copy(path, file_path)
 
             if os.path.exists(file_path):
                 output_files.append(file_path)
                 _L.debug("File exists %s", file_path)
                 continue
 
+            headers, entry = dict(self.headers), None
+
+            if self.download_cache and scheme in ('http', 'https'):
+                # Ask for a new file only if the cached one has changed.
+                entry = self.download_cache.checkout(source_url, file_path)
+                if entry and entry['etag']:
+                    headers['If-None-Match'] = entry['etag']
+                if entry and entry['last_modified']:
+                    headers['If-Modified-Since'] = entry['last_modified']
+
             try:
-                resp = request('GET', source_url, headers=self.headers, stream=True)
+                resp = request('GET', source_url, headers=headers, stream=True)
             except Exception as e:
                 raise DownloadError("Could not connect to URL", e)
 
+            if entry and resp.status_code == 304:
+                resp.close()
+                self.fingerprints[file_path] = entry['fingerprint']
+                output_files.append(file_path)
+                _L.info("Using unchanged cached file %s", file_path)
+                continue
+            elif entry:
+                os.remove(file_path)
+
             if resp.status_code in range(400, 499):
                 raise DownloadError('{} response from {}'.format(resp.status_code, source_url))
 
-            size = 0
-            with open(file_path, 'wb') as fp:
-                for chunk in resp.iter_content(self.CHUNK):
-                    size += len(chunk)
-                    fp.write(chunk)
+            if self.download_cache and scheme in ('http', 'https'):
+                # Keep partial downloads in the cache to resume after failures.
+                with self.download_cache.partial(source_url) as part_path:
+                    size = self.download_response(source_url, resp, file_path, part_path)
+            else:
+                size = self.download_response(source_url, resp, file_path)
 
             output_files.append(file_path)
 
+            etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+
+            if self.download_cache and resp.status_code == 200 and (etag or last_modified):
+                self.fingerprints[file_path] = self.download_cache.checkin(source_url,
+                    file_path, etag, last_modified, self.fingerprints.get(file_path))
+
             _L.info("Downloaded %s bytes for file %s", size, file_path)
 
         return output_files
 
+    def download_response(self, url, resp, file_path, part_path=None):
+        ''' Save a streaming response from a URL to a local file, return its size.
+
+            Data is written to a part file, by default file_path with ".part",
+            that is moved into place once its size is verified. If the server
+            accepts byte ranges, large files are fetched in parallel segments
+            and dropped connections are resumed. Otherwise, the file's
+            fingerprint is computed as it streams in.
+        '''
+        part_path = part_path or file_path + '.part'
+        length = _response_length(resp)
+        accept_ranges = resp.headers.get('Accept-Ranges', '').lower()
+
+        if resp.status_code == 200 and length and accept_ranges == 'bytes':
+            self._download_ranges(url, resp, part_path, length)
+        else:
+            fingerprint = md5()
+            with open(part_path, 'wb') as fp:
+                for chunk in resp.iter_content(self.CHUNK):
+                    fingerprint.update(chunk)
+                    fp.write(chunk)
+            self.fingerprints[file_path] = fingerprint.hexdigest()
+
+        size = os.path.getsize(part_path)
+
+        if length is not None and size != length:
+            raise DownloadError('Got {} of {} bytes from {}'.format(size, length, url))
+
+        move(part_path, file_path)
+        return size
+
+    def _download_ranges(self, url, resp, part_path, length):
+        ''' Download a URL of known length into a part file in byte range segments.
+
+            Remaining ranges are saved alongside the part file as they finish,
+            so a later download to the same part file with the same length and
+            validator resumes, e.g. from DownloadCache.partial(). Without a
+            validator there's no If-Range check, so start over.
+        '''
+        state_path, state_lock = part_path + '.json', threading.Lock()
+        validator = _range_validator(resp)
+
+        try:
+            with open(state_path) as file:
+                state = json.load(file)
+        except (IOError, ValueError):
+            state = None
+
+        if validator and exists(part_path) and state and state.get('length') == length \
+        and state.get('validator') == validator:
+            _L.info('Resuming {} bytes of {}'.format(sum(end + 1 - offset for (offset, end) in state['ranges']), url))
+            ranges, first_resp = state['ranges'], None
+            resp.close()
+        else:
+            ranges = [[offset, min(offset + self.SEGMENT, length) - 1]
+                      for offset in range(0, length, self.SEGMENT)]
+            first_resp = resp
+
+            # Preallocate the whole file so segments can be written in place.
+            with open(part_path, 'wb') as fp:
+                fp.truncate(length)
+
+        def save_state():
+            with state_lock:
+                remaining = [span[:] for span in ranges if span[0] <= span[1]]
+                with open(state_path, 'w') as file:
+                    json.dump(dict(length=length, validator=validator, ranges=remaining), file)
+
+        def fetch(index):
+            self._fetch_range(url, part_path, ranges[index], validator,
+                              first_resp if index == 0 else None)
+            save_state()
+
+        _L.debug('Downloading {} bytes of {} in {} segments'.format(length, url, len(ranges)))
+
+        try:
+            with ThreadPoolExecutor(self.SEGMENT_WORKERS) as executor:
+                list(executor.map(fetch, range(len(ranges))))
+        except:
+            save_state()
+            raise
+
+        os.remove(state_path)
+
+    def _fetch_range(self, url, part_path, span, validator, resp=None):
+        ''' Write one [offset, end] byte span of a URL into a part file.
+
+            Advances the span offset as data arrives, and reconnects with a
+            Range request to pick up where a dropped connection left off.
+        '''
+        with open(part_path, 'r+b') as fp:
+            for attempt in range(self.RETRIES + 1):
+                try:
+                    if resp is None:
+                        time.sleep(self.RETRY_DELAY * attempt)
+                        resp = self._request_range(url, span, validator)
+
+                    fp.seek(span[0])
+
+                    for chunk in resp.iter_content(self.CHUNK):
+                        chunk = chunk[:span[1] + 1 - span[0]]
+                        fp.write(chunk)
+                        span[0] += len(chunk)
+
+                        if span[0] > span[1]:
+                            break
+
+                except requests.exceptions.RequestException as e:
+                    _L.warning('Error getting bytes {}-{} from {}: {}'.format(span[0], span[1], url, e))
+
+                finally:
+                    if resp is not None:
+                        resp.close()
+                    resp = None
+
+                if span[0] > span[1]:
+                    return
+
+        raise DownloadError('Gave up on bytes {}-{} from {}'.format(span[0], span[1], url))
+
+    def _request_range(self, url, span, validator):
+        ''' Request one [offset, end] byte span of a URL, return the response.
+        '''
+        headers = dict(self.headers, Range='bytes={}-{}'.format(*span))
+
+        if validator:
+            headers['If-Range'] = validator
+
+        resp = request('GET', url, headers=headers, stream=True)
+        content_range = resp.headers.get('Content-Range', '')
+
+        if resp.status_code != 206 or not content_range.startswith('bytes {}-'.format(span[0])):
+            resp.close()
+            raise DownloadError('{} response to range request from {}'.format(resp.status_code, url))
+
+        return resp
+
+def plan_esri_pages(layer_url, metadata, row_count):
+    ''' Return a list of query arguments for each page of an ESRI layer, or None.
+
+        Pages hold up to the layer's maxRecordCount features, capped like
+        EsriDumper because large pages from big layers tend to time out.
+        They are found with resultOffset, OID statistics, or OID enumeration
+        so that they can be fetched independently. Returns None for layers
+        that can only be scraped by geographic queries.
+    '''
+    page_size = min(ESRI_MAX_PAGE_SIZE, metadata.get('maxRecordCount') or ESRI_PAGE_SIZE)
+
+    def page_query_args(**args):
+        args.update(geometryPrecision=7, returnGeometry='true', outSR='4326', outFields='*', f='json')
+        return args
+
+    if row_count == 0:
+        return []
+
+    advanced = metadata.get('advancedQueryCapabilities') or {}
+
+    if row_count is not None and (metadata.get('supportsPagination') or advanced.get('supportsPagination')):
+        return [page_query_args(resultOffset=offset, resultRecordCount=page_size, where='1=1')
+                for offset in range(0, row_count, page_size)]
+
+    oid_field_name = _find_esri_oid_field_name(metadata)
+    if not oid_field_name:
+        raise EsriDownloadError("Could not find object ID field name for deduplication")
+
+    if metadata.get('supportsStatistics'):
+        try:
+            (oid_min, oid_max) = _get_esri_oid_range(layer_url, oid_field_name)
+        except EsriDownloadError:
+            _L.info("Finding max/min from statistics failed. Trying OID enumeration.")
+        else:
+            where = '{0} > {1} AND {0} <= {2}'
+            return [page_query_args(where=where.format(oid_field_name, page_min, min(page_min + page_size, oid_max)))
+                    for page_min in range(oid_min - 1, oid_max, page_size)]
+
+    try:
+        oids = sorted(map(int, _get_esri_oids(layer_url)))
+    except EsriDownloadError:
+        _L.info("Falling back to geo queries")
+        return None
+
+    where = '{0} >= {1} AND {0} <= {2}'
+    return [page_query_args(where=where.format(oid_field_name, oids[i], oids[i:i+page_size][-1]))
+            for i in range(0, len(oids), page_size)]
+
+def _find_esri_oid_field_name(metadata):
+    oid_field_name = metadata.get('objectIdField')
+
+    if not oid_field_name:
+        for field in metadata.get('fields') or []:
+            if field.get('type') == 'esriFieldTypeOID':
+                return field['name']
+
+    return oid_field_name
+
+def _get_esri_oid_range(layer_url, oid_field_name):
+    ''' Return minimum and maximum object IDs of an ESRI layer from statistics.
+    '''
+    statistics = [dict(statisticType=type, onStatisticField=oid_field_name, outStatisticFieldName=name)
+                  for (type, name) in (('min', 'THE_MIN'), ('max', 'THE_MAX'))]
+
+    data = _query_esri_layer(layer_url, dict(f='json', outFields='',
+        outStatistics=json.dumps(statistics, separators=(',', ':'))),
+        "Could not retrieve min/max oid values")
+
+    try:
+        # Some servers name statistics after their SQL instead of outStatisticFieldName.
+        values = data['features'][0]['attributes'].values()
+        oid_min, oid_max = int(min(values)), int(max(values))
+    except (KeyError, IndexError, TypeError, ValueError) as e:
+        raise EsriDownloadError("Server returned invalid min/max", e)
+
+    # Some servers return statistics that aren't real object IDs.
+    where = '{0} = {1} OR {0} = {2}'.format(oid_field_name, oid_min, oid_max)
+    data = _query_esri_layer(layer_url, dict(where=where, returnIdsOnly='true', f='json'),
+                             "Could not check min/max values")
+
+    if not {oid_min, oid_max} <= set(data.get('objectIds') or []):
+        raise EsriDownloadError('Server returned invalid min/max')
+
+    return oid_min, oid_max
+
+def _get_esri_oids(layer_url):
+    ''' Return a list of every object ID in an ESRI layer.
+    '''
+    data = _query_esri_layer(layer_url, dict(where='1=1', returnIdsOnly='true', f='json'),
+                             "Could not retrieve object IDs")
+
+    if not data.get('objectIds'):
+        raise EsriDownloadError("Server doesn't support returnIdsOnly")
+
+    return data['objectIds']
+
+def _query_esri_layer(layer_url, query_args, error_message, method='GET'):
+    ''' Return JSON data from an ESRI layer query, or raise EsriDownloadError.
+
+        Requests errors and invalid JSON are raised unchanged for callers to retry.
+    '''
+    url = layer_url.rstrip('/') + '/query'
+    args = dict(data=query_args) if method == 'POST' else dict(params=query_args)
+
+    try:
+        response = requests.request(method, url, timeout=ESRI_TIMEOUT, **args)
+    except requests.exceptions.SSLError:
+        _L.warning("Retrying {} without SSL verification".format(url))
+        response = requests.request(method, url, timeout=ESRI_TIMEOUT, verify=False, **args)
+
+    if response.status_code != 200:
+        raise EsriDownloadError('{}: {} HTTP {}'.format(url, error_message, response.status_code))
+
+    data = response.json()
+    error = data.get('error')
+
+    if error:
+        raise EsriDownloadError("{}: {}".format(error_message, error.get('message')))
+
+    return data
+
+def fetch_esri_page(layer_url, query_args):
+    ''' Return a list of ESRI JSON features for one page of query arguments.
+
+        Pages truncated by the server's transfer limit are completed with
+        more requests from later offsets, or raise EsriDownloadError when
+        they have no offset to continue from.
+    '''
+    data = _fetch_esri_data(layer_url, query_args)
+    features = data.get('features') or []
+
+    if not data.get('exceededTransferLimit'):
+        return features
+
+    if 'resultOffset' not in query_args:
+        raise EsriDownloadError("Server truncated page with args {}".format(query_args))
+
+    # Offset pages report the limit when more features follow them, too.
+    while data.get('exceededTransferLimit') and len(features) < query_args['resultRecordCount']:
+        remainder_args = dict(query_args, resultOffset=query_args['resultOffset'] + len(features),
+                              resultRecordCount=query_args['resultRecordCount'] - len(features))
+        data = _fetch_esri_data(layer_url, remainder_args)
+
+        if not data.get('features'):
+            raise EsriDownloadError("Server truncated page with args {}".format(query_args))
+
+        features += data['features']
+
+    return features
+
+def _fetch_esri_data(layer_url, query_args):
+    ''' Return JSON data for one ESRI query, retrying failed connections a few times.
+    '''
+    for attempt in range(ESRI_PAGE_RETRIES + 1):
+        try:
+            data = _query_esri_layer(layer_url, query_args, "Problem querying ESRI dataset with args {}".format(query_args), 'POST')
+        except socket.timeout as e:
+            raise EsriDownloadError("Timeout when connecting to URL", e)
+        except ValueError as e:
+            raise EsriDownloadError("Could not parse JSON", e)
+        except requests.exceptions.RequestException as e:
+            if attempt == ESRI_PAGE_RETRIES:
+                raise EsriDownloadError("Could not connect to URL", e)
+            _L.warning("Retrying ESRI page after error: {}".format(e))
+            time.sleep(2 ** attempt)
+        else:
+            return data
+
+def iterate_esri_pages(layer_url, page_args, threads):
+    ''' Yield a list of ESRI JSON features for each page, in page order.
+
+        Pages are fetched concurrently by a pool of threads, a few ahead.
+    '''
+    with ThreadPoolExecutor(threads) as executor:
+        pending = deque()
+
+        for query_args in page_args:
+            pending.append(executor.submit(fetch_esri_page, layer_url, query_args))
+
+            if len(pending) > threads * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def esri_feature_row(feature, field_names):
+    ''' Return a CSV row dictionary for a GeoJSON feature from ESRI, or None.
+
+        Rows have geometry WKT and centroid X and Y columns. Features
+        with missing or bad geometries return None.
+    '''
+    try:
+        geom = feature.get('geometry') or {}
+        row = feature.get('properties') or {}
+
+        if not geom:
+            raise TypeError("No geometry parsed")
+        if any((isinstance(g, float) and math.isnan(g)) for g in traverse(geom)):
+            raise TypeError("Geometry has NaN coordinates")
+
+        shp = shape(feature['geometry'])
+        row[GEOM_FIELDNAME] = shp.wkt
+        try:
+            centroid = shp.centroid
+        except RuntimeError as e:
+            if 'Invalid number of points in LinearRing found' not in str(e):
+                raise
+            xmin, xmax, ymin, ymax = shp.bounds
+            row[X_FIELDNAME] = round(xmin/2 + xmax/2, 7)
+            row[Y_FIELDNAME] = round(ymin/2 + ymax/2, 7)
+        else:
+            if centroid.is_empty:
+                raise TypeError(json.dumps(feature['geometry']))
+            row[X_FIELDNAME] = round(centroid.x, 7)
+            row[Y_FIELDNAME] = round(centroid.y, 7)
+
+        return {fn: row.get(fn) for fn in field_names}
+    except TypeError:
+        _L.debug("Skipping a geometry", exc_info=True)
+        return None
+
+def esri_page_rows(args):
+    ''' Return a list of CSV row dictionaries for a list of ESRI JSON features.
+
+        Takes a single tuple of features and field names for use with Pool.imap().
+    '''
+    features, field_names = args
+    rows = [esri_feature_row(esri2geojson(feature), field_names) for feature in features]
+    return [row for row in rows if row is not None]
 
 class EsriRestDownloadTask(DownloadTask):
+    # Number of threads fetching pages of features at once
+    PAGE_THREADS = 4
 
     def get_file_path(self, url, dir_path):
         ''' Return a local file path in a directory for a URL.
@@ -346,6 +989,32 @@ class EsriRestDownloadTask(DownloadTask):
         else:
             return None
 
+    def iterate_rows(self, source_url, downloader, page_args, field_names):
+        ''' Yield CSV row dictionaries for each feature of an ESRI layer in page order.
+
+            page_args is a list from plan_esri_pages(), or None to let the
+            EsriDumper find features with its own geographic queries.
+        '''
+        if page_args is None:
+            for feature in downloader:
+                row = esri_feature_row(feature, field_names)
+                if row is not None:
+                    yield row
+            return
+
+        _L.info("Downloading {} pages with {} threads".format(len(page_args), self.PAGE_THREADS))
+        features = iterate_esri_pages(source_url, page_args, self.PAGE_THREADS)
+        jobs = ((page, field_names) for page in features)
+
+        if self.workers > 1:
+            # Convert geometries in other processes, still in page order.
+            with multiprocessing.Pool(self.workers) as pool:
+                for rows in pool.imap(esri_page_rows, jobs):
+                    yield from rows
+        else:
+            for rows in map(esri_page_rows, jobs):
+                yield from rows
+
     def download(self, source_urls, workdir, conform=None):
         output_files = []
         download_path = os.path.join(workdir, 'esri')
@@ -362,7 +1031,7 @@ class EsriRestDownloadTask(DownloadTask):
                 _L.debug("File exists %s", file_path)
                 continue
 
-            downloader = EsriDumper(source_url, parent_logger=_L, timeout=300)
+            downloader = EsriDumper(source_url, parent_logger=_L, timeout=ESRI_TIMEOUT)
 
             metadata = downloader.get_metadata()
 
@@ -379,46 +1048,22 @@ class EsriRestDownloadTask(DownloadTask):
                 field_names.append(GEOM_FIELDNAME)
 
             # Get the count of rows in the layer
+            row_count = None
             try:
                 row_count = downloader.get_feature_count()
                 _L.info("Source has {} rows".format(row_count))
             except EsriDownloadError:
                 _L.info("Source doesn't support count")
 
+            page_args = plan_esri_pages(source_url, metadata, row_count)
+
             with open(file_path, 'w', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=field_names)
                 writer.writeheader()
 
-                for feature in downloader:
-                    try:
-                        geom = feature.get('geometry') or {}
-                        row = feature.get('properties') or {}
-
-                        if not geom:
-                            raise TypeError("No geometry parsed")
-                        if any((isinstance(g, float) and math.isnan(g)) for g in traverse(geom)):
-                            raise TypeError("Geometry has NaN coordinates")
-
-                        shp = shape(feature['geometry'])
-                        row[GEOM_FIELDNAME] = shp.wkt
-                        try:
-                            centroid = shp.centroid
-                        except RuntimeError as e:
-                            if 'Invalid number of points in LinearRing found' not in str(e):
-                                raise
-                            xmin, xmax, ymin, ymax = shp.bounds
-                            row[X_FIELDNAME] = round(xmin/2 + xmax/2, 7)
-                            row[Y_FIELDNAME] = round(ymin/2 + ymax/2, 7)
-                        else:
-                            if centroid.is_empty:
-                                raise TypeError(json.dumps(feature['geometry']))
-                            row[X_FIELDNAME] = round(centroid.x, 7)
-                            row[Y_FIELDNAME] = round(centroid.y, 7)
-
-                        writer.writerow({fn: row.get(fn) for fn in field_names})
-                        size += 1
-                    except TypeError:
-                        _L.debug("Skipping a geometry", exc_info=True)
+                for row in self.iterate_rows(source_url, downloader, page_args, field_names):
+                    writer.writerow(row)
+                    size += 1
 
             _L.info("Downloaded %s ESRI features for file %s", size, file_path)
             output_files.append(file_path)
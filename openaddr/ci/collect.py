@@ -1,10 +1,10 @@
 import logging; _L = logging.getLogger('openaddr.ci.collect')
 
 from argparse import ArgumentParser
-from collections import defaultdict
-from os import environ, stat, close, remove
-from zipfile import ZipFile, ZIP_DEFLATED
-from os.path import splitext, exists, basename, join, dirname
+from collections import defaultdict, deque
+from os import environ, stat, close, remove, cpu_count, utime
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED, ZIP64_LIMIT
+from os.path import splitext, exists, basename, join, dirname, relpath
 from urllib.parse import urlparse
 from operator import attrgetter
 from csv import DictReader, DictWriter
@@ -12,16 +12,41 @@ from tempfile import mkstemp, mkdtemp
 from itertools import product
 from io import TextIOWrapper
 from datetime import date
-from shutil import rmtree
+from shutil import rmtree, move, copyfileobj
 from math import ceil, floor, sqrt
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from time import sleep, mktime
+from hashlib import md5
+import multiprocessing
+import struct
+import json
+import sys
+
+from boto.utils import compute_md5
 
 from .objects import read_latest_set, read_completed_runs_to_date
 from . import db_connect, db_cursor, setup_logger, log_function_errors
-from .. import S3, iterate_local_processed_files, util
+from .. import (
+    S3, LocalProcessedResult, iterate_local_processed_files,
+    download_processed_file, util, geoparquet, PREFETCH_FILES
+    )
 from ..conform import OPENADDR_CSV_SCHEMA
+from ..cache import DownloadCache, DOWNLOAD_CACHE_BYTES
 
 MULTIPART_CHUNK_SIZE = 5 * 1024 * 1024
 
+# Number of parts uploaded at once, and seconds to wait before retrying one.
+MULTIPART_THREADS = 8
+MULTIPART_RETRY_DELAY = 1
+
+# Zip members can be opened for writing, see _open_zipfile_text() and
+# copy_zipfile_members(). Older Pythons use temporary files instead.
+ZIP_STREAMING = sys.version_info >= (3, 6)
+
+# Collection zip member listing the members added for each source.
+MANIFEST_NAME = 'manifest.json'
+
 parser = ArgumentParser(description='Run some source files.')
 
 parser.add_argument('-o', '--owner', default='openaddresses',
@@ -47,6 +72,15 @@ parser.add_argument('-q', '--quiet', help='Turn off most logging',
                     action='store_const', dest='loglevel',
                     const=logging.WARNING, default=logging.INFO)
 
+parser.add_argument('--workers', help='Number of processes to use for reading sources. Defaults to number of CPUs.',
+                    type=int, dest='workers', default=cpu_count() or 1)
+
+parser.add_argument('--processed-cache', help='Optional directory of processed files to reuse across runs. Defaults to PROCESSED_CACHE_DIR environment variable.',
+                    dest='processed_cache', default=environ.get('PROCESSED_CACHE_DIR', None))
+
+parser.add_argument('--processed-cache-size', help='Size in bytes of processed cache directory. Defaults to PROCESSED_CACHE_SIZE environment variable or {}.'.format(DOWNLOAD_CACHE_BYTES),
+                    type=int, dest='processed_cache_size', default=environ.get('PROCESSED_CACHE_SIZE', DOWNLOAD_CACHE_BYTES))
+
 @log_function_errors
 def main():
     ''' Single threaded worker to serve the job queue.
@@ -56,10 +90,17 @@ def main():
     s3 = S3(None, None, args.bucket)
     db_args = util.prepare_db_kwargs(args.database_url)
 
+    if args.processed_cache:
+        processed_cache = DownloadCache(args.processed_cache, args.processed_cache_size)
+    else:
+        processed_cache = None
+
     with db_connect(**db_args) as conn:
         with db_cursor(conn) as db:
             set = read_latest_set(db, args.owner, args.repository)
             runs = read_completed_runs_to_date(db, set.id)
+            add_manifest_column(db)
+            previous_zips = load_collection_manifests(db)
 
     dir = mkdtemp(prefix='collected-')
 
@@ -75,12 +116,10 @@ def main():
         'sa': (lambda result: result.run_state.share_alike == 'true')
         }
 
-    collections = prepare_collections(s3, set, dir, area_tests, sa_tests)
-
-    for result in iterate_local_processed_files(runs):
-        for (collection, test) in collections:
-            if test(result):
-                collection.collect(result)
+    collections = prepare_collections(s3, set, dir, area_tests, sa_tests, previous_zips)
+    changed_runs = collect_unchanged_sources(collections, runs)
+    results = iterate_local_processed_files(changed_runs, processed_cache=processed_cache, prefetch=PREFETCH_FILES)
+    build_collections(collections, results, dir, args.workers)
 
     with db_connect(**db_args) as conn:
         with db_cursor(conn) as db:
@@ -90,8 +129,32 @@ def main():
 
     rmtree(dir)
 
-def prepare_collections(s3, set, dir, area_tests, sa_tests):
+def add_manifest_column(db):
+    ''' Add zips.manifest to databases created before schema.pgsql had it.
     '''
+    db.execute('''SELECT column_name FROM information_schema.columns
+                  WHERE table_name = 'zips' AND column_name = 'manifest' ''')
+
+    if db.fetchone() is None:
+        _L.info('Adding manifest column to zips table')
+        db.execute('ALTER TABLE zips ADD COLUMN manifest JSON NULL')
+
+def load_collection_manifests(db):
+    ''' Get URLs and manifests of current collection zips.
+
+        Returns a dictionary keyed on (collection, license_attr) tuples.
+    '''
+    db.execute('''SELECT collection, license_attr, url, manifest
+                  FROM zips WHERE is_current AND manifest IS NOT NULL''')
+
+    return {(coll, attr): (url, manifest)
+            for (coll, attr, url, manifest) in db.fetchall()}
+
+def prepare_collections(s3, set, dir, area_tests, sa_tests, previous_zips={}):
+    ''' Prepare collections for every pair of area and share-alike tests.
+
+        previous_zips is from load_collection_manifests(), and lets each
+        collection reuse unchanged sources from its previous zip.
     '''
     collections = []
     pairs = product(area_tests.items(), sa_tests.items())
@@ -104,11 +167,178 @@ def prepare_collections(s3, set, dir, area_tests, sa_tests):
         attr_suffix = ('-' + attr_id).rstrip('-')
         new_name = 'openaddr-collected{}{}.zip'.format(area_suffix, attr_suffix)
         new_zip = _prepare_zip(set, join(dir, new_name))
-        new_collection = CollectorPublisher(s3, new_zip, area_id, attr_id)
+        previous = previous_zips.get((area_id, attr_id))
+        new_collection = CollectorPublisher(s3, new_zip, area_id, attr_id, previous)
         collections.append((new_collection, _and(area_test, sa_test)))
 
     return collections
 
+def collect_unchanged_sources(collections, runs):
+    ''' Copy sources unchanged since the previous collection zips.
+
+        A run's source is copied only if every collection it belongs to has
+        it unchanged. Returns a list of the remaining runs to collect.
+    '''
+    changed_runs = list()
+
+    for run in runs:
+        if not (run.state and run.state.processed):
+            changed_runs.append(run)
+            continue
+
+        source_base, _ = splitext(relpath(run.source_path, 'sources'))
+        result = LocalProcessedResult(source_base, None, run.state, run.code_version)
+        matches = [collection for (collection, test) in collections if test(result)]
+
+        if matches and all(collection.is_unchanged(result) for collection in matches):
+            for collection in matches:
+                collection.reuse(result)
+        else:
+            changed_runs.append(run)
+
+    return changed_runs
+
+def build_collections(collections, results, dir, workers):
+    ''' Add a stream of LocalProcessedResult instances to matching collections.
+
+        Each source is read, validated and compressed once in a pool of
+        worker processes, and the compressed members are then copied into
+        every collection that the source belongs to.
+    '''
+    pending = deque()
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in results:
+            matches = [collection for (collection, test) in collections if test(result)]
+
+            if not matches:
+                continue
+
+            # iterate_local_processed_files() removes each file once we move
+            # on to the next, so hold on to it until a worker has staged it.
+            _, ext = splitext(result.filename)
+            handle, filename = mkstemp(prefix='source-', suffix=ext, dir=dir)
+            close(handle)
+            move(result.filename, filename)
+
+            args = result.source_base, filename, dir
+            pending.append((result, matches, pool.apply_async(stage_source, args)))
+
+            # Keep a bounded number of staged sources on disk.
+            while len(pending) > workers * 2:
+                _collect_staged_source(*pending.popleft())
+
+        while pending:
+            _collect_staged_source(*pending.popleft())
+
+def _collect_staged_source(result, collections, async_result):
+    staged_filename = async_result.get()
+
+    for collection in collections:
+        collection.collect(result, staged_filename)
+
+    remove(staged_filename)
+
+def stage_source(source_base, filename, dir):
+    ''' Write one processed source file to a new staging zip in dir.
+
+        Staged members are compressed exactly as they will appear in each
+        collection. Removes the source file and returns the staging zip path.
+    '''
+    handle, staged_filename = mkstemp(prefix='staged-', suffix='.zip', dir=dir)
+    close(handle)
+
+    with ZipFile(staged_filename, 'w', ZIP_DEFLATED, allowZip64=True) as zip_out:
+        _add_source_file_to_zipfile(zip_out, source_base, filename)
+
+    remove(filename)
+
+    return staged_filename
+
+def copy_zipfile_members(zip_in, zip_out, names=None):
+    ''' Copy members of zip_in to zip_out without decompressing them.
+
+        Copies every member unless a list of names is given, and returns
+        the names copied. Python's zipfile has no public way to write
+        already-compressed data, so this follows ZipFile._open_to_write().
+        Where those internals are missing, members are decompressed and
+        compressed again instead.
+    '''
+    infos = zip_in.infolist() if names is None else [zip_in.getinfo(name) for name in names]
+
+    if not _can_copy_zipfile_members(zip_out):
+        for info in infos:
+            _recompress_zipfile_member(zip_in, zip_out, info)
+        return [info.filename for info in infos]
+
+    for info in infos:
+        # Find the start of member data after its local file header.
+        zip_in.fp.seek(info.header_offset)
+        name_length, extra_length = struct.unpack('<HH', zip_in.fp.read(30)[26:30])
+        zip_in.fp.seek(name_length + extra_length, 1)
+
+        new_info = ZipInfo(info.filename, info.date_time)
+        new_info.compress_type = info.compress_type
+        new_info.external_attr = info.external_attr
+        new_info.CRC = info.CRC
+        new_info.compress_size = info.compress_size
+        new_info.file_size = info.file_size
+        zip64 = max(info.file_size, info.compress_size) > ZIP64_LIMIT
+
+        with zip_out._lock:
+            if zip_out._writing:
+                raise ValueError("Can't write to the ZIP file while there is another write handle open on it.")
+
+            zip_out.fp.seek(zip_out.start_dir)
+            new_info.header_offset = zip_out.fp.tell()
+            zip_out._writecheck(new_info)
+            zip_out._didModify = True
+
+            zip_out.fp.write(new_info.FileHeader(zip64))
+            copyfileobj(_LimitedReader(zip_in.fp, info.compress_size), zip_out.fp)
+
+            zip_out.start_dir = zip_out.fp.tell()
+            zip_out.filelist.append(new_info)
+            zip_out.NameToInfo[new_info.filename] = new_info
+
+    return [info.filename for info in infos]
+
+def _can_copy_zipfile_members(zip_out):
+    ''' Return true if zip_out has the internals used by copy_zipfile_members().
+    '''
+    names = '_lock', '_writing', '_writecheck', '_didModify', 'start_dir'
+    return ZIP_STREAMING and all(hasattr(zip_out, name) for name in names)
+
+def _recompress_zipfile_member(zip_in, zip_out, info):
+    ''' Copy one member of zip_in to zip_out through a temporary file.
+    '''
+    handle, tmp_filename = mkstemp(prefix='member-'); close(handle)
+
+    try:
+        with zip_in.open(info) as file, open(tmp_filename, 'wb') as output:
+            copyfileobj(file, output)
+
+        # ZipFile.write() takes the member timestamp from the file.
+        mtime = mktime(info.date_time + (0, 0, -1))
+        utime(tmp_filename, (mtime, mtime))
+        zip_out.write(tmp_filename, info.filename, info.compress_type)
+    finally:
+        remove(tmp_filename)
+
+class _LimitedReader:
+    ''' Read no more than a fixed number of bytes from a file.
+    '''
+    def __init__(self, file, length):
+        self.file, self.remaining = file, length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
 def _prepare_zip(set, filename):
     '''
     '''
@@ -133,19 +363,68 @@ Data source information can be found at
 class CollectorPublisher:
     '''
     '''
-    def __init__(self, s3, collection_zip, collection_id, license_attr):
+    def __init__(self, s3, collection_zip, collection_id, license_attr, previous=None):
         self.s3 = s3
         self.zip = collection_zip
         self.results = set()
         self.collection_id = collection_id
         self.license_attr = license_attr
 
-    def collect(self, result):
+        # Members added for each source, saved with the zip as a manifest.
+        self.manifest = dict()
+
+        # URL and manifest of the last published zip, downloaded as needed.
+        self.previous_url, self.previous_manifest = previous or (None, dict())
+        self.previous_zip = None
+
+    def collect(self, result, staged_filename=None):
         ''' Add LocalProcessedResult instance to collection zip.
+
+            If given, members are copied from the zip at staged_filename
+            prepared by stage_source() instead of read from the result.
         '''
         _L.info(u'Adding {} to {}'.format(result.source_base, self.zip.filename))
-        add_source_to_zipfile(self.zip, result)
+
+        if staged_filename is None:
+            existing_names = set(self.zip.namelist())
+            add_source_to_zipfile(self.zip, result)
+            names = [name for name in self.zip.namelist() if name not in existing_names]
+        else:
+            with ZipFile(staged_filename, 'r') as zip_in:
+                names = copy_zipfile_members(zip_in, self.zip)
+
+        self.results.add(result)
+        self.manifest[result.source_base] = _make_manifest_entry(result, names)
+
+    def is_unchanged(self, result):
+        ''' Return true if result can be copied from the previous zip.
+        '''
+        entry = self.previous_manifest.get(result.source_base)
+
+        if entry != _make_manifest_entry(result, entry and entry['members']):
+            return False
+
+        if self.previous_zip is None and self.previous_url is not None:
+            try:
+                filename = download_processed_file(self.previous_url)
+                self.previous_zip = ZipFile(filename, 'r')
+            except Exception as e:
+                _L.warning(u'Failed to read {}: {}'.format(self.previous_url, e))
+                self.previous_url, self.previous_manifest = None, dict()
+                return False
+
+        return self.previous_zip is not None
+
+    def reuse(self, result):
+        ''' Copy unchanged LocalProcessedResult instance from the previous zip.
+        '''
+        _L.info(u'Copying {} to {}'.format(result.source_base, self.zip.filename))
+
+        entry = self.previous_manifest[result.source_base]
+        copy_zipfile_members(self.previous_zip, self.zip, entry['members'])
+
         self.results.add(result)
+        self.manifest[result.source_base] = entry
 
     def publish(self, db):
         ''' Create new S3 object with zipfile name and upload the collection.
@@ -153,9 +432,16 @@ class CollectorPublisher:
         license_text = util.summarize_result_licenses(self.results)
         self.zip.writestr('LICENSE.txt', license_text.encode('utf8'))
 
+        manifest_text = json.dumps(self.manifest, indent=2, sort_keys=True)
+        self.zip.writestr(MANIFEST_NAME, manifest_text.encode('utf8'))
+
         self.zip.close()
         _L.info(u'Finished {}'.format(self.zip.filename))
 
+        if self.previous_zip is not None:
+            self.previous_zip.close()
+            remove(self.previous_zip.filename)
+
         zip_key = write_to_s3(self.s3.bucket, self.zip.filename, basename(self.zip.filename))
         _L.info(u'Uploaded {} to {}'.format(self.zip.filename, zip_key.name))
 
@@ -165,27 +451,89 @@ class CollectorPublisher:
         db.execute('''DELETE FROM zips WHERE url = %s''', (zip_url, ))
 
         db.execute('''INSERT INTO zips
-                      (url, datetime, is_current, content_length, collection, license_attr)
-                      VALUES (%s, NOW(), true, %s, %s, %s)''',
-                   (zip_url, length, self.collection_id, self.license_attr))
+                      (url, datetime, is_current, content_length, collection, license_attr, manifest)
+                      VALUES (%s, NOW(), true, %s, %s, %s, %s)''',
+                   (zip_url, length, self.collection_id, self.license_attr, manifest_text))
 
-def _upload_s3_part(s3_bucket, multipart_id, part_num, source_path, offset, bytes, retries=3):
+def _make_manifest_entry(result, names):
+    ''' Describe a collected LocalProcessedResult and its zip members.
+    '''
+    return {'processed': result.run_state.processed, 'process hash': result.run_state.process_hash,
+            'members': names}
+
+def _get_multipart_chunks(source_size):
+    ''' Return a list of (offset, bytes) parts for a multipart upload.
+    '''
+    # With help from https://gist.github.com/fabiant7t/924094
+    bytes_per_chunk = max(int(sqrt(MULTIPART_CHUNK_SIZE) * sqrt(source_size)), MULTIPART_CHUNK_SIZE)
+    chunk_count = int(ceil(source_size / float(bytes_per_chunk)))
+
+    return [(i * bytes_per_chunk, min(bytes_per_chunk, source_size - i * bytes_per_chunk))
+            for i in range(chunk_count)]
+
+def get_s3_etag(filename):
+    ''' Return the ETag S3 will give the file at `filename` after upload_to_s3().
+
+        Single PUT objects are tagged with their MD5 hash, and multipart
+        objects with a hash of their part hashes and a count of parts.
+    '''
+    source_size = stat(filename).st_size
+
+    with open(filename, 'rb') as file:
+        if source_size <= MULTIPART_CHUNK_SIZE:
+            return compute_md5(file)[0]
+
+        part_hashes = list()
+
+        for (offset, bytes) in _get_multipart_chunks(source_size):
+            file.seek(offset)
+            part_hashes.append(md5(file.read(bytes)).digest())
+
+    return '{}-{}'.format(md5(b''.join(part_hashes)).hexdigest(), len(part_hashes))
+
+def upload_to_s3(s3_bucket, filename, keyname, policy='private', content_type='application/zip'):
+    ''' Writes the file at `filename` to the S3 key `keyname` if it has changed.
+
+        Files up to MULTIPART_CHUNK_SIZE are sent in a single PUT request,
+        and larger ones with write_to_s3(). Returns True if the file was
+        uploaded, or False if an identical object was already in S3.
+    '''
+    etag = get_s3_etag(filename)
+    existing_key = s3_bucket.get_key(keyname)
+
+    if existing_key is not None and existing_key.etag.strip('"') == etag:
+        _L.debug('Skipping unchanged {}'.format(keyname))
+        return False
+
+    if stat(filename).st_size > MULTIPART_CHUNK_SIZE:
+        write_to_s3(s3_bucket, filename, keyname, policy, content_type)
+        return True
+
+    with open(filename, 'rb') as file:
+        key = s3_bucket.new_key(keyname)
+        key.set_contents_from_file(file, headers={'Content-Type': content_type},
+                                   md5=compute_md5(file), policy=policy)
+
+    return True
+
+def _upload_s3_part(multipart, part_num, source_path, offset, bytes, retries=3):
     """ Uploads a part to S3 with retries.
+
+        The part's MD5 hash is sent along with it, so S3 will reject any
+        part that arrives corrupted. Failed attempts are retried with backoff.
     """
-    while True:
-        retries -= 1
+    for attempt in range(retries):
         try:
             _L.info('Start uploading part #%d ...', part_num)
-            for mp in s3_bucket.get_all_multipart_uploads():
-                if mp.id == multipart_id:
-                    with open(source_path, 'rb') as fp:
-                        fp.seek(offset)
-                        mp.upload_part_from_file(fp=fp, part_num=part_num, size=bytes)
-                    break
+            with open(source_path, 'rb') as fp:
+                fp.seek(offset)
+                hex_md5, b64_md5, _ = compute_md5(fp, size=bytes)
+                multipart.upload_part_from_file(fp=fp, part_num=part_num, md5=(hex_md5, b64_md5), size=bytes)
         except Exception:
-            if retries == 0:
+            if attempt == retries - 1:
                 _L.info('... Failed uploading part #%d', part_num)
                 raise
+            sleep(MULTIPART_RETRY_DELAY * 2 ** attempt)
         else:
             _L.info('... Uploaded part #%d', part_num)
             return
@@ -194,21 +542,33 @@ def write_to_s3(s3_bucket, filename, keyname, policy='private', content_type='ap
     ''' Writes the file at `filename` to the S3 key `keyname` using
         S3's multipart upload functionality.
 
+        Up to MULTIPART_THREADS parts are uploaded at once.
         Returns the S3 Key object for the file that was uploaded.
     '''
     mp = s3_bucket.initiate_multipart_upload(keyname, headers={'Content-Type': content_type})
 
-    # With help from https://gist.github.com/fabiant7t/924094
-    source_size = stat(filename).st_size
-    bytes_per_chunk = max(int(sqrt(MULTIPART_CHUNK_SIZE) * sqrt(source_size)), MULTIPART_CHUNK_SIZE)
-    chunk_count = int(ceil(source_size / float(bytes_per_chunk)))
+    chunks = _get_multipart_chunks(stat(filename).st_size)
+    chunk_count = len(chunks)
+
+    with ThreadPoolExecutor(MULTIPART_THREADS) as executor:
+        futures = list()
 
-    for i in range(chunk_count):
-        offset = i * bytes_per_chunk
-        remaining_bytes = source_size - offset
-        bytes = min([bytes_per_chunk, remaining_bytes])
-        part_num = i + 1
-        _upload_s3_part(s3_bucket, mp.id, part_num, filename, offset, bytes)
+        for (i, (offset, bytes)) in enumerate(chunks):
+            part_num = i + 1
+            futures.append(executor.submit(_upload_s3_part, mp, part_num, filename, offset, bytes))
+
+        try:
+            for future in futures:
+                future.result()
+        except Exception:
+            # Give up on remaining parts and abandon the upload.
+            try:
+                for future in futures:
+                    future.cancel()
+                executor.shutdown()
+            finally:
+                mp.cancel_upload()
+            raise
 
     if len(mp.get_all_parts()) != chunk_count:
         mp.cancel_upload()
@@ -226,20 +586,35 @@ def add_csv_to_zipfile(zip_out, arc_filename, file):
 
         File is assumed to be open in binary mode.
     '''
-    handle, tmp_filename = mkstemp(suffix='.csv'); close(handle)
-    size, squares = .1, defaultdict(lambda: 0)
-
-    with open(tmp_filename, 'w') as output:
-        in_csv = DictReader(TextIOWrapper(file, 'utf8'))
-        out_csv = DictWriter(output, OPENADDR_CSV_SCHEMA, dialect='excel')
-        out_csv.writerow({col: col for col in OPENADDR_CSV_SCHEMA})
-
-        for row in in_csv:
+    def iterate_rows():
+        for row in DictReader(TextIOWrapper(file, 'utf8')):
             try:
                 lat, lon = float(row['LAT']), float(row['LON'])
             except ValueError:
                 continue
 
+            yield lon, lat, row
+
+    _add_rows_to_zipfile(zip_out, arc_filename, iterate_rows())
+
+def add_parquet_to_zipfile(zip_out, arc_filename, parquet_file):
+    ''' Write GeoParquet rows to zipfile as csv.
+    '''
+    rows = ((lon, lat, row) for (lon, lat, row) in geoparquet.iterate_rows(parquet_file)
+            if lon is not None and lat is not None)
+
+    _add_rows_to_zipfile(zip_out, arc_filename, rows)
+
+def _add_rows_to_zipfile(zip_out, arc_filename, rows):
+    ''' Stream (lon, lat, row) tuples to zipfile as csv, with a spatial summary.
+    '''
+    size, squares = .1, defaultdict(lambda: 0)
+
+    with _open_zipfile_text(zip_out, arc_filename) as output:
+        out_csv = DictWriter(output, OPENADDR_CSV_SCHEMA, dialect='excel')
+        out_csv.writerow({col: col for col in OPENADDR_CSV_SCHEMA})
+
+        for (lon, lat, row) in rows:
             if not (-90 <= lat <= 90 and -180 <= lon <= 180):
                 continue
 
@@ -247,20 +622,43 @@ def add_csv_to_zipfile(zip_out, arc_filename, file):
             key = floor(lat / size) * size, floor(lon / size) * size
             squares[key] += 1
 
-    zip_out.write(tmp_filename, arc_filename)
-    remove(tmp_filename)
-
     _add_spatial_summary_to_zipfile(zip_out, arc_filename, size, squares)
 
+@contextmanager
+def _open_zipfile_text(zip_out, arc_filename):
+    ''' Open a new zipfile member to write text into as it's compressed.
+
+        Collected members can be larger than 2GB, so always use Zip64.
+        Without ZIP_STREAMING, text goes to a temporary file added on close.
+    '''
+    if ZIP_STREAMING:
+        member = zip_out.open(arc_filename, 'w', force_zip64=True)
+        with TextIOWrapper(member, 'utf8', newline='') as output:
+            yield output
+        return
+
+    handle, tmp_filename = mkstemp(suffix='.csv'); close(handle)
+
+    try:
+        with open(tmp_filename, 'w', encoding='utf8', newline='') as output:
+            yield output
+
+        zip_out.write(tmp_filename, arc_filename)
+    finally:
+        remove(tmp_filename)
+
 def _add_spatial_summary_to_zipfile(zip_out, arc_filename, size, squares):
     '''
     '''
     assert size in (.1, .2, .5, 1.)
     F = '{:.1f}'
 
-    handle, tmp_filename = mkstemp(suffix='.csv'); close(handle)
+    prefix, _ = splitext(arc_filename)
+    support_csvname = join('summary', prefix+'-summary.csv')
+    support_vrtname = join('summary', prefix+'-summary.vrt')
 
-    with open(tmp_filename, 'w') as output:
+    # Write the contents of the summary file.
+    with _open_zipfile_text(zip_out, support_csvname) as output:
         columns = 'count', 'lon', 'lat', 'area'
         out_csv = DictWriter(output, columns, dialect='excel')
         out_csv.writerow({col: col for col in columns})
@@ -270,13 +668,6 @@ def _add_spatial_summary_to_zipfile(zip_out, arc_filename, size, squares):
             area = 'POLYGON(({0} {1},{0} {3},{2} {3},{2} {1},{0} {1}))'.format(*args)
             out_csv.writerow(dict(count=count, lon=F.format(lon), lat=F.format(lat), area=area))
 
-    prefix, _ = splitext(arc_filename)
-    support_csvname = join('summary', prefix+'-summary.csv')
-    support_vrtname = join('summary', prefix+'-summary.vrt')
-
-    # Write the contents of the summary file.
-    zip_out.write(tmp_filename, support_csvname)
-
     with open(join(dirname(__file__), 'templates', 'source-summary.vrt'), 'rb') as file:
         args = dict(filename=basename(support_csvname))
         args.update(name=splitext(args['filename'])[0])
@@ -285,24 +676,34 @@ def _add_spatial_summary_to_zipfile(zip_out, arc_filename, size, squares):
     # Write the contents of the summary file VRT.
     zip_out.writestr(support_vrtname, vrt_content)
 
-    remove(tmp_filename)
-
 def add_source_to_zipfile(zip_out, result):
     ''' Add a LocalProcessedResult to zipfile via add_csv_to_zipfile().
     '''
-    _, ext = splitext(result.filename)
+    _add_source_file_to_zipfile(zip_out, result.source_base, result.filename)
+
+def _add_source_file_to_zipfile(zip_out, source_base, filename):
+    '''
+    '''
+    _, ext = splitext(filename)
 
     if ext == '.csv':
-        with open(result.filename) as file:
-            add_csv_to_zipfile(zip_out, result.source_base + ext, file)
+        with open(filename, 'rb') as file:
+            add_csv_to_zipfile(zip_out, source_base + ext, file)
 
     elif ext == '.zip':
-        with open(result.filename, 'rb') as file:
+        with open(filename, 'rb') as file:
             zip_in = ZipFile(file, 'r')
+            parquet_name, parquet_file = geoparquet.open_zipped_parquet(zip_in) or (None, None)
+
             for zipinfo in zip_in.infolist():
                 if zipinfo.filename == 'README.txt':
                     # Skip README files when building collection.
                     continue
+                elif splitext(zipinfo.filename)[1] == '.parquet':
+                    # Collections are CSV only; typed rows are read below.
+                    continue
+                elif splitext(zipinfo.filename)[1] == '.csv' and parquet_file is not None:
+                    add_parquet_to_zipfile(zip_out, zipinfo.filename, parquet_file)
                 elif splitext(zipinfo.filename)[1] == '.csv':
                     zipped_file = zip_in.open(zipinfo.filename)
                     add_csv_to_zipfile(zip_out, zipinfo.filename, zipped_file)
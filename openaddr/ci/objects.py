@@ -80,8 +80,8 @@ class RunState:
     # Dictionary of acceptable keys for the input json blob.
     key_attrs = {key: key.replace(' ', '_').replace('-', '_')
         for key in ('source', 'cache', 'sample', 'geometry type',
-        'address count', 'version', 'fingerprint', 'cache time', 'processed',
-        'output', 'process time', 'website', 'skipped', 'license',
+        'address count', 'address stats', 'version', 'fingerprint', 'cache time',
+        'processed', 'output', 'process time', 'website', 'skipped', 'license',
         'share-alike', 'attribution required', 'attribution name',
         'attribution flag', 'process hash', 'preview', 'slippymap',
         'source problem', 'code version', 'tests passed', 'run id')}
@@ -96,6 +96,7 @@ class RunState:
         self.sample = blob_dict.get('sample')
         self.geometry_type = blob_dict.get('geometry type')
         self.address_count = blob_dict.get('address count')
+        self.address_stats = blob_dict.get('address stats')
         self.version = blob_dict.get('version')
         self.fingerprint = blob_dict.get('fingerprint')
         self.cache_time = blob_dict.get('cache time')
@@ -1,77 +1,250 @@
 import logging; _L = logging.getLogger('openaddr.ci.tileindex')
 
 from io import TextIOWrapper
-from operator import attrgetter
 from tempfile import mkstemp, mkdtemp
-from zipfile import ZipFile, ZIP_DEFLATED
-from itertools import groupby, zip_longest
-from os.path import splitext, join, exists
-from os import close, environ, mkdir
+from zipfile import ZipFile, ZipInfo, ZIP_DEFLATED
+from collections import OrderedDict
+from os.path import splitext, join, exists, relpath
+from os import close, environ, mkdir, remove, cpu_count
 from argparse import ArgumentParser
-from csv import DictReader, DictWriter
+from shutil import copyfileobj
+from csv import DictReader
 from random import randint
-import gzip
+from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+import gzip, csv, json, time
 
 from . import db_connect, db_cursor, setup_logger, log_function_errors, collect
 from .objects import read_latest_set, read_completed_runs_to_date
-from .. import S3, iterate_local_processed_files, util
+from .. import (
+    S3, LocalProcessedResult, iterate_local_processed_files, util, geoparquet,
+    PREFETCH_FILES
+    )
 from ..conform import OPENADDR_CSV_SCHEMA
+from ..cache import DownloadCache, DOWNLOAD_CACHE_BYTES
 
-BLOCK_SIZE = 100000
 SOURCE_COLNAME = 'OA:Source'
 TILE_SIZE = 1.
 
-class Point:
+# Most tile files kept open at once by populate_tiles().
+MAX_OPEN_TILES = 256
 
-    def __init__(self, lon, lat, result, row):
-        self.row = row
-        self.result = result
-        self.key = lonlat_key(lon, lat)
+# Number of tiles uploaded at once by publish_tiles().
+PUBLISH_THREADS = 16
+
+# Timestamp of tile zip members, see package_tile().
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+# Sources contributing to each published tile, see read_tile_manifest().
+MANIFEST_KEYNAME = 'tiles/manifest.json'
+
+# Quadtree leaves of tiles split by split_tile(), see read_tile_index().
+INDEX_KEYNAME = 'tiles/index.json'
+
+# Seconds a web server may keep using a downloaded index, so leaves dropped
+# from it are deleted only this long afterwards, see schedule_leaf_removals().
+INDEX_TTL = 300
+
+# Tiles with more points are split into quadrants, at most this many times.
+MAX_TILE_POINTS = 250000
+MAX_TILE_DEPTH = 6
 
 class Tile:
 
     columns = OPENADDR_CSV_SCHEMA + [SOURCE_COLNAME]
 
-    def __init__(self, key, dirname):
+    def __init__(self, key, dirname, quadkey=''):
         self.key = key
+        self.quadkey = quadkey
         self.dirname = dirname
         self.results = set()
+        self.count = 0
+        self.file, self.rows = None, None
 
         handle, self.filename = mkstemp(prefix='tile-', suffix='.csv.gz', dir=dirname)
         close(handle)
 
         with gzip.open(self.filename, 'wt', encoding='utf8') as file:
-            rows = DictWriter(file, Tile.columns)
-            rows.writerow({k: k for k in Tile.columns})
+            rows = csv.writer(file)
+            rows.writerow(Tile.columns)
+
+    def open(self):
+        ''' Open tile file for appending points.
+        '''
+        if self.file is None:
+            self.file = gzip.open(self.filename, 'at', encoding='utf8')
+            self.rows = csv.writer(self.file)
+
+    def close(self):
+        ''' Close tile file, if open.
+        '''
+        if self.file is not None:
+            self.file.close()
+            self.file, self.rows = None, None
+
+    def add_point(self, result, row):
+        ''' Add a single point to an open tile file.
+        '''
+        self.results.add(result)
+        self.rows.writerow([row.get(col) for col in OPENADDR_CSV_SCHEMA] + [result.source_base])
+        self.count += 1
 
     def add_points(self, points):
-        with gzip.open(self.filename, 'at', encoding='utf8') as file:
-            rows = DictWriter(file, Tile.columns)
-            for point in points:
-                self.results.add(point.result)
+        ''' Add (key, result, row) point tuples to tile file.
+        '''
+        self.open()
+
+        for (_, result, row) in points:
+            self.add_point(result, row)
 
-                row = {SOURCE_COLNAME: point.result.source_base}
-                row.update(point.row)
-                rows.writerow(row)
+        self.close()
+
+    @property
+    def keyname(self):
+        return tile_keyname(self.key, self.quadkey)
+
+    def package(self):
+        ''' Zip tile file with its license text, return the zip filename.
+        '''
+        license_text = util.summarize_result_licenses(self.results)
+        return package_tile(self.filename, self.dirname, license_text)
 
     def publish(self, s3_bucket):
         '''
         '''
-        handle, zip_filename = mkstemp(prefix='tile-', suffix='.zip', dir=self.dirname)
-        close(handle)
+        collect.upload_to_s3(s3_bucket, self.package(), self.keyname)
 
-        zipfile = ZipFile(zip_filename, 'w', ZIP_DEFLATED, allowZip64=True)
+def tile_keyname(key, quadkey=''):
+    ''' Return the S3 key name for a tile, or for one of its quadtree leaves.
+    '''
+    if quadkey:
+        return 'tiles/{:.1f}/{:.1f}/{}.zip'.format(key[0], key[1], quadkey)
 
-        with gzip.open(self.filename, 'rb') as file:
-            zipfile.writestr('addresses.csv', file.read())
+    return 'tiles/{:.1f}/{:.1f}.zip'.format(*key)
 
-        license_text = util.summarize_result_licenses(self.results)
-        zipfile.writestr('LICENSE.txt', license_text.encode('utf8'))
+def lonlat_quadkey(lon, lat, key, depth):
+    ''' Return a quadkey string for a point within the tile at key.
+
+        Each digit picks a quadrant of the one before: 0 southwest,
+        1 southeast, 2 northwest, and 3 northeast.
+    '''
+    x, y = (lon - key[0] * TILE_SIZE) / TILE_SIZE, (lat - key[1] * TILE_SIZE) / TILE_SIZE
+    digits = list()
+
+    for _ in range(depth):
+        x, y = x * 2, y * 2
+        east, north = min(max(int(x), 0), 1), min(max(int(y), 0), 1)
+        x, y = x - east, y - north
+        digits.append(str(east + 2 * north))
+
+    return ''.join(digits)
+
+def split_tile(tile, max_points, max_depth=MAX_TILE_DEPTH):
+    ''' Return a list of quadtree leaf Tiles with up to max_points each.
+
+        A tile with few enough points is returned alone. Otherwise its points
+        are split among four quadrants, which are split again in turn down to
+        max_depth. Every quadrant is returned, even if it has no points, so
+        that any location maps to exactly one leaf.
+    '''
+    depth = len(tile.quadkey) + 1
+
+    if tile.count <= max_points or depth > max_depth:
+        return [tile]
+
+    results = {result.source_base: result for result in tile.results}
+    children = {digit: Tile(tile.key, tile.dirname, tile.quadkey + digit) for digit in '0123'}
+
+    for child in children.values():
+        child.open()
+
+    with gzip.open(tile.filename, 'rt', encoding='utf8') as file:
+        for row in DictReader(file):
+            quadkey = lonlat_quadkey(float(row['LON']), float(row['LAT']), tile.key, depth)
+            children[quadkey[-1]].add_point(results[row[SOURCE_COLNAME]], row)
+
+    leaves = list()
+
+    for (_, child) in sorted(children.items()):
+        child.close()
+        child_leaves = split_tile(child, max_points, max_depth)
+        leaves.extend(child_leaves)
+
+        if child not in child_leaves:
+            remove(child.filename)
+
+    return leaves
+
+def lookup_tile_keyname(index, lon, lat):
+    ''' Return the S3 key name of the leaf tile for a location in a tile index.
+
+        Index is from read_tile_index(), and may be None for 1° tiles only.
+    '''
+    key = lonlat_key(lon, lat)
+    quadkeys = (index or {}).get('tiles', {}).get(tile_key_string(key))
+
+    if not quadkeys:
+        return tile_keyname(key)
+
+    depth = max(map(len, quadkeys))
+    quadkey = lonlat_quadkey(lon, lat, key, depth)
+
+    for length in range(1, depth + 1):
+        if quadkey[:length] in quadkeys:
+            return tile_keyname(key, quadkey[:length])
+
+    return tile_keyname(key)
+
+def package_tile(filename, dirname, license_text):
+    ''' Zip a gzipped tile file and license text, return the zip filename.
+
+        Member timestamps are fixed so unchanged tiles zip to identical bytes.
+    '''
+    handle, zip_filename = mkstemp(prefix='tile-', suffix='.zip', dir=dirname)
+    close(handle)
+
+    with ZipFile(zip_filename, 'w', ZIP_DEFLATED, allowZip64=True) as zipfile:
+        with gzip.open(filename, 'rb') as file:
+            info = ZipInfo('addresses.csv', ZIP_DATE_TIME)
+            info.compress_type = ZIP_DEFLATED
+            if collect.ZIP_STREAMING:
+                with zipfile.open(info, 'w', force_zip64=True) as output:
+                    copyfileobj(file, output)
+            else:
+                # Leaf tiles are kept small, see split_tile().
+                zipfile.writestr(info, file.read())
+
+        info = ZipInfo('LICENSE.txt', ZIP_DATE_TIME)
+        zipfile.writestr(info, license_text.encode('utf8'), ZIP_DEFLATED)
+
+    return zip_filename
+
+def _package_tile(args):
+    return package_tile(*args)
+
+def _upload_tile(s3_bucket, zip_filename, keyname):
+    try:
+        return collect.upload_to_s3(s3_bucket, zip_filename, keyname)
+    finally:
+        remove(zip_filename)
+
+def publish_tiles(s3_bucket, tiles, workers):
+    ''' Zip tiles in a pool of processes and upload them in a pool of threads.
+
+        Return the number of tiles uploaded, skipping those unchanged in S3.
+    '''
+    tiles = list(tiles)
+    args = ((tile.filename, tile.dirname, util.summarize_result_licenses(tile.results))
+            for tile in tiles)
+
+    with multiprocessing.Pool(workers) as pool, ThreadPoolExecutor(PUBLISH_THREADS) as executor:
+        futures = list()
 
-        zipfile.close()
-        keyname = 'tiles/{:.1f}/{:.1f}.zip'.format(*self.key)
+        for (tile, zip_filename) in zip(tiles, pool.imap(_package_tile, args)):
+            _L.debug('Publishing tile {} with {} sources'.format(tile.key, len(tile.results)))
+            futures.append(executor.submit(_upload_tile, s3_bucket, zip_filename, tile.keyname))
 
-        collect.write_to_s3(s3_bucket, zipfile.filename, keyname)
+        return sum([future.result() for future in futures])
 
 parser = ArgumentParser(description='Create a tiled spatial index of CSV data in S3.')
 
@@ -98,6 +271,21 @@ parser.add_argument('-q', '--quiet', help='Turn off most logging',
                     action='store_const', dest='loglevel',
                     const=logging.WARNING, default=logging.INFO)
 
+parser.add_argument('--processed-cache', help='Optional directory of processed files to reuse across runs. Defaults to PROCESSED_CACHE_DIR environment variable.',
+                    dest='processed_cache', default=environ.get('PROCESSED_CACHE_DIR', None))
+
+parser.add_argument('--processed-cache-size', help='Size in bytes of processed cache directory. Defaults to PROCESSED_CACHE_SIZE environment variable or {}.'.format(DOWNLOAD_CACHE_BYTES),
+                    type=int, dest='processed_cache_size', default=environ.get('PROCESSED_CACHE_SIZE', DOWNLOAD_CACHE_BYTES))
+
+parser.add_argument('--workers', help='Number of processes to use for zipping tiles. Defaults to number of CPUs.',
+                    type=int, dest='workers', default=cpu_count() or 1)
+
+parser.add_argument('--max-tile-points', help='Split tiles with more points into quadtree leaves. Defaults to {}.'.format(MAX_TILE_POINTS),
+                    type=int, dest='max_tile_points', default=MAX_TILE_POINTS)
+
+parser.add_argument('--rebuild', help='Rebuild all tiles, instead of only those with changed sources.',
+                    action='store_true', dest='rebuild', default=False)
+
 @log_function_errors
 def main():
     ''' Single threaded worker to serve the job queue.
@@ -107,6 +295,11 @@ def main():
     s3 = S3(None, None, args.bucket)
     db_args = util.prepare_db_kwargs(args.database_url)
 
+    if args.processed_cache:
+        processed_cache = DownloadCache(args.processed_cache, args.processed_cache_size)
+    else:
+        processed_cache = None
+
     with db_connect(**db_args) as conn:
         with db_cursor(conn) as db:
             set = read_latest_set(db, args.owner, args.repository)
@@ -114,23 +307,272 @@ def main():
 
     dir = mkdtemp(prefix='tileindex-')
 
-    addresses = iterate_runs_points(runs)
-    point_blocks = iterate_point_blocks(addresses)
-    tiles = populate_tiles(dir, point_blocks)
+    index_tiles(dir, s3.bucket, runs, args.workers, processed_cache, args.rebuild, args.max_tile_points)
+
+def index_tiles(dirname, s3_bucket, runs, workers, processed_cache=None,
+                rebuild=False, max_points=MAX_TILE_POINTS):
+    ''' Publish tiles with points from a list of runs, and a new tile manifest.
+
+        Unless rebuild is true, only tiles with sources that changed since
+        the last manifest are published, and points from unchanged sources
+        are copied from the previously-published tiles instead of re-read.
+
+        Tiles with more than max_points are also published as quadtree
+        leaves, listed in a new tile index.
+    '''
+    source_runs = get_source_runs(runs)
+    manifest = None if rebuild else read_tile_manifest(s3_bucket)
+
+    changed_runs, tiles = prepare_tiles(dirname, source_runs, manifest)
+    _L.info('Indexing points from {} of {} sources'.format(len(changed_runs), len(source_runs)))
+
+    addresses = iterate_runs_points(changed_runs, processed_cache, PREFETCH_FILES)
+    tiles = populate_tiles(dirname, addresses, tiles)
+
+    if not add_unchanged_points(s3_bucket, source_runs, manifest, tiles):
+        _L.warning('Missing a previously-published tile, rebuilding all tiles')
+        return index_tiles(dirname, s3_bucket, runs, workers, processed_cache, True, max_points)
+
+    full_tiles = [tile for tile in tiles.values() if tile.results]
+    leaves = {tile.key: split_tile(tile, max_points, MAX_TILE_DEPTH) for tile in full_tiles}
+    split_leaves = [leaf for tile in full_tiles for leaf in leaves[tile.key] if leaf is not tile]
+
+    uploaded = publish_tiles(s3_bucket, full_tiles + split_leaves, workers)
+    _L.info('Uploaded {} of {} tiles'.format(uploaded, len(full_tiles) + len(split_leaves)))
 
     for tile in tiles.values():
-        _L.debug('Publishing tile {} with {} sources'.format(tile.key, len(tile.results)))
-        tile.publish(s3.bucket)
+        if not tile.results:
+            _L.debug('Removing empty tile {}'.format(tile.key))
+            s3_bucket.delete_key(tile.keyname)
+
+    previous_index = read_tile_index(s3_bucket)
+    index = make_tile_index(previous_index, tiles, leaves)
+
+    removed_keynames = get_removed_leaf_keynames(previous_index, index, tiles)
+    published_keynames = [leaf.keyname for leaf in split_leaves]
+    expired_keynames, index['removed'] = schedule_leaf_removals(previous_index,
+        removed_keynames, published_keynames, time.time())
+
+    write_tile_json(s3_bucket, dirname, MANIFEST_KEYNAME, make_tile_manifest(source_runs, manifest, tiles))
+    write_tile_json(s3_bucket, dirname, INDEX_KEYNAME, index)
+
+    for keyname in expired_keynames:
+        _L.debug('Removing old leaf tile {}'.format(keyname))
+        s3_bucket.delete_key(keyname)
+
+def get_source_runs(runs):
+    ''' Return a dictionary of processed, non-share-alike runs keyed on source base.
+    '''
+    return {splitext(relpath(run.source_path, 'sources'))[0]: run for run in runs
+            if run.state and run.state.processed and run.state.share_alike != 'true'}
+
+def read_tile_manifest(s3_bucket):
+    ''' Return the manifest of previously-published tiles, or None if there is none.
+
+        Manifest "sources" maps source bases to process hashes, and "tiles"
+        maps tile key strings from tile_key_string() to lists of source bases.
+    '''
+    return _read_tile_json(s3_bucket, MANIFEST_KEYNAME)
+
+def read_tile_index(s3_bucket):
+    ''' Return the index of previously-published quadtree leaves, or None if there is none.
+
+        Index "tiles" maps tile key strings from tile_key_string() to sorted
+        lists of leaf quadkeys from lonlat_quadkey(), for split tiles only.
+        Index "removed" maps S3 key names of leaves waiting to be deleted to
+        the time they were dropped, see schedule_leaf_removals().
+    '''
+    return _read_tile_json(s3_bucket, INDEX_KEYNAME)
+
+def _read_tile_json(s3_bucket, keyname):
+    key = s3_bucket.get_key(keyname)
+
+    if key is None:
+        return None
+
+    return json.loads(key.get_contents_as_string().decode('utf8'))
+
+def make_tile_manifest(source_runs, manifest, tiles):
+    ''' Return a new manifest, updating a previous one with newly-published tiles.
+    '''
+    sources = {source_base: run.state.process_hash for (source_base, run) in source_runs.items()}
+    tile_sources = dict(manifest['tiles']) if manifest else dict()
+
+    for (key, tile) in tiles.items():
+        if tile.results:
+            tile_sources[tile_key_string(key)] = sorted({result.source_base for result in tile.results})
+        else:
+            tile_sources.pop(tile_key_string(key), None)
+
+    return dict(sources=sources, tiles=tile_sources)
+
+def make_tile_index(index, tiles, leaves):
+    ''' Return a new index, updating a previous one with newly-split tiles.
+
+        Leaves is a dictionary of split_tile() lists keyed on tile key.
+    '''
+    tile_quadkeys = dict(index['tiles']) if index else dict()
+
+    for key in tiles:
+        quadkeys = sorted(leaf.quadkey for leaf in leaves.get(key, []) if leaf.quadkey)
+
+        if quadkeys:
+            tile_quadkeys[tile_key_string(key)] = quadkeys
+        else:
+            tile_quadkeys.pop(tile_key_string(key), None)
+
+    return dict(tile_size=TILE_SIZE, tiles=tile_quadkeys)
+
+def get_removed_leaf_keynames(previous_index, index, tiles):
+    ''' Return a list of S3 key names for leaves of tiles no longer in the index.
+    '''
+    if previous_index is None:
+        return []
+
+    keynames = list()
+
+    for key in tiles:
+        old_quadkeys = set(previous_index['tiles'].get(tile_key_string(key), []))
+        new_quadkeys = set(index['tiles'].get(tile_key_string(key), []))
+        keynames.extend([tile_keyname(key, quadkey) for quadkey in sorted(old_quadkeys - new_quadkeys)])
+
+    return keynames
+
+def schedule_leaf_removals(previous_index, removed_keynames, published_keynames, now):
+    ''' Return a list of old leaf key names to delete, and a dictionary of the rest.
+
+        Leaves dropped from the index are kept for INDEX_TTL seconds, and
+        deleted by a later run once no web server can still be using them.
+        Returned dictionary maps key names to times, for the "removed" index.
+    '''
+    pending = dict(previous_index.get('removed', {})) if previous_index else dict()
+
+    for keyname in removed_keynames:
+        pending.setdefault(keyname, now)
+
+    # Leaves published again are in use once more.
+    for keyname in published_keynames:
+        pending.pop(keyname, None)
+
+    expired = sorted(keyname for (keyname, removed) in pending.items() if now - removed >= INDEX_TTL)
+
+    return expired, {keyname: removed for (keyname, removed) in pending.items() if keyname not in expired}
+
+def write_tile_json(s3_bucket, dirname, keyname, data):
+    ''' Upload a tile manifest or index to S3.
+    '''
+    handle, filename = mkstemp(prefix='tiles-', suffix='.json', dir=dirname)
+    close(handle)
+
+    try:
+        with open(filename, 'w') as file:
+            json.dump(data, file, sort_keys=True)
+
+        collect.upload_to_s3(s3_bucket, filename, keyname, content_type='application/json')
+    finally:
+        remove(filename)
+
+def tile_key_string(key):
+    '''
+    '''
+    return '{},{}'.format(*key)
+
+def get_stale_sources(source_runs, manifest):
+    ''' Return a set of source bases changed or removed since a previous manifest.
+    '''
+    previous_sources = manifest['sources']
+    changed = {source_base for (source_base, run) in source_runs.items()
+               if not run.state.process_hash
+               or previous_sources.get(source_base) != run.state.process_hash}
+
+    return changed | (set(previous_sources) - set(source_runs))
+
+def prepare_tiles(dirname, source_runs, manifest):
+    ''' Return a list of runs with changed points, and a dictionary of empty Tiles.
+
+        Returned tiles are those with stale sources in the previous manifest.
+        Without a manifest, every run is returned with no tiles.
+    '''
+    if manifest is None:
+        return list(source_runs.values()), dict()
+
+    stale = get_stale_sources(source_runs, manifest)
+    tiles = dict()
+
+    for (key_string, tile_sources) in manifest['tiles'].items():
+        if stale & set(tile_sources):
+            key = tuple(map(int, key_string.split(',')))
+            tiles[key] = _make_tile(dirname, key)
+
+    return [run for (source_base, run) in source_runs.items() if source_base in stale], tiles
+
+def add_unchanged_points(s3_bucket, source_runs, manifest, tiles):
+    ''' Add points from unchanged sources in previously-published tiles.
+
+        Return False if a previously-published tile is missing.
+    '''
+    if manifest is None:
+        return True
+
+    stale = get_stale_sources(source_runs, manifest)
+
+    for (key, tile) in tiles.items():
+        tile_sources = manifest['tiles'].get(tile_key_string(key), [])
+
+        results = {source_base: LocalProcessedResult(source_base, None, run.state, run.code_version)
+                   for (source_base, run) in source_runs.items()
+                   if source_base in tile_sources and source_base not in stale}
+
+        if not copy_previous_points(tile, s3_bucket, results):
+            return False
+
+    return True
+
+def copy_previous_points(tile, s3_bucket, results):
+    ''' Add points from a previously-published tile for sources in results.
+
+        Results is a dictionary of LocalProcessedResults keyed on source base.
+        Return False if there's no previously-published tile.
+    '''
+    if not results:
+        return True
+
+    key = s3_bucket.get_key(tile.keyname)
+
+    if key is None:
+        return False
+
+    handle, zip_filename = mkstemp(prefix='tile-', suffix='.zip', dir=tile.dirname)
+    close(handle)
+
+    try:
+        key.get_contents_to_filename(zip_filename)
+
+        with ZipFile(zip_filename) as zipfile:
+            with zipfile.open('addresses.csv') as file:
+                tile.open()
+
+                for row in DictReader(TextIOWrapper(file, 'utf8')):
+                    if row[SOURCE_COLNAME] in results:
+                        tile.add_point(results[row[SOURCE_COLNAME]], row)
+
+                tile.close()
+    finally:
+        remove(zip_filename)
+
+    return True
 
 def lonlat_key(lon, lat):
     '''
     '''
     return int(lon // TILE_SIZE), int(lat // TILE_SIZE) # Southwest corner lon, lat
 
-def iterate_runs_points(runs):
+def iterate_runs_points(runs, processed_cache=None, prefetch=1):
     ''' Iterate over all the points, skipping share-alike sources.
+
+        Points are (key, result, row) tuples, with a tile key from lonlat_key().
     '''
-    for result in iterate_local_processed_files(runs, sort_on='source_path'):
+    for result in iterate_local_processed_files(runs, 'source_path', processed_cache, prefetch):
         if result.run_state.share_alike == 'true':
             continue
 
@@ -138,6 +580,16 @@ def iterate_runs_points(runs):
         _L.debug('filename: {}'.format(result.filename))
         _L.debug('run_state: {}'.format(result.run_state))
         _L.debug('code_version: {}'.format(result.code_version))
+        with ZipFile(result.filename) as result_zip:
+            _, parquet_file = geoparquet.open_zipped_parquet(result_zip) or (None, None)
+
+        if parquet_file is not None:
+            for (lon, lat, row) in geoparquet.iterate_rows(parquet_file):
+                # Include this point if it's on Earth
+                if lon is not None and lat is not None and -180 <= lon <= 180 and -90 <= lat <= 90:
+                    yield (lonlat_key(lon, lat), result, row)
+            continue
+
         with open(result.filename, 'rb') as file:
             result_zip = ZipFile(file)
 
@@ -159,38 +611,41 @@ def iterate_runs_points(runs):
 
                 # Include this point if it's on Earth
                 if -180 <= lon <= 180 and -90 <= lat <= 90:
-                    yield Point(lon, lat, result, row)
-
-def iterate_point_blocks(points):
-    ''' Group points into blocks by key, generate (key, points) pairs.
-    '''
-    args, filler = [points] * BLOCK_SIZE, Point(0, -99, None, None) # Illegal lon, lat
-
-    for block in zip_longest(*args, fillvalue=filler):
-        point_block = sorted(block, key=attrgetter('key'))
-
-        for key, key_points in groupby(point_block, attrgetter('key')):
-            if key is not filler.key:
-                key_points_list = list(key_points)
-                _L.debug('Found {} points in tile {}'.format(len(key_points_list), key))
-                yield (key, key_points_list)
+                    yield (lonlat_key(lon, lat), result, row)
 
-    _L.debug('{} remain'.format(len(list(points))))
+def _make_tile(dirname, key):
+    tile_dirname = join(dirname, str(randint(100, 999)))
+    if not exists(tile_dirname):
+        mkdir(tile_dirname)
+    _L.debug('Adding Tile: {}'.format(key))
+    return Tile(key, tile_dirname)
 
-def populate_tiles(dirname, point_blocks):
+def populate_tiles(dirname, points, tiles=None):
     ''' Return a dictionary of Tiles keyed on southwest lon, lat.
+
+        Points are written to each tile's file as they arrive, keeping up to
+        MAX_OPEN_TILES of the most recently used tile files open at once.
+        Optional tiles is a dictionary of existing Tiles to add points to.
     '''
-    tiles = dict()
+    tiles, open_tiles = dict(tiles or {}), OrderedDict()
 
-    for (key, points) in point_blocks:
+    for (key, result, row) in points:
         if key not in tiles:
-            tile_dirname = join(dirname, str(randint(100, 999)))
-            if not exists(tile_dirname):
-                mkdir(tile_dirname)
-            _L.debug('Adding Tile: {}'.format(key))
-            tiles[key] = Tile(key, tile_dirname)
+            tiles[key] = _make_tile(dirname, key)
+
+        if key in open_tiles:
+            open_tiles.move_to_end(key)
+        else:
+            if len(open_tiles) >= MAX_OPEN_TILES:
+                _, least_recent_tile = open_tiles.popitem(last=False)
+                least_recent_tile.close()
+            tiles[key].open()
+            open_tiles[key] = tiles[key]
+
+        tiles[key].add_point(result, row)
 
-        tiles[key].add_points(points)
+    for tile in open_tiles.values():
+        tile.close()
 
     return tiles
 
@@ -3,7 +3,9 @@ import logging; _L = logging.getLogger('openaddr.ci.webapi')
 from urllib.parse import urljoin
 from operator import attrgetter
 from collections import defaultdict
-import json, os, csv, io
+import json, os, csv, io, time
+
+import requests
 
 from flask import Response, Blueprint, request, current_app, jsonify, url_for, redirect
 from flask_cors import CORS
@@ -21,9 +23,14 @@ CSV_HEADER = 'source', 'cache', 'sample', 'geometry type', 'address count', \
              'process hash', 'output', 'attribution required', 'attribution name', \
              'share-alike', 'code version'
 
+# Seconds to reuse a downloaded tile index, see get_tile_index().
+TILE_INDEX_TTL = tileindex.INDEX_TTL
+
 webapi = Blueprint('webapi', __name__)
 CORS(webapi)
 
+_tile_indexes = dict()
+
 @webapi.route('/index.json')
 @log_application_errors
 def app_index_json():
@@ -178,7 +185,8 @@ def app_get_tileindex_zip(lon, lat):
     '''
     '''
     try:
-        key = tileindex.lonlat_key(float(lon), float(lat))
+        lon, lat = float(lon), float(lat)
+        key = tileindex.lonlat_key(lon, lat)
     except ValueError:
         return Response('"{}" and "{}" must both be numeric.\n'.format(lon, lat), status=404)
 
@@ -186,9 +194,32 @@ def app_get_tileindex_zip(lon, lat):
         return Response('"{}" and "{}" must both be on earth.\n'.format(lon, lat), status=404)
 
     bucket = current_app.config['AWS_S3_BUCKET']
-    url = u'https://s3.amazonaws.com/{}/tiles/{:.1f}/{:.1f}.zip'.format(bucket, *key)
+    keyname = tileindex.lookup_tile_keyname(get_tile_index(bucket), lon, lat)
+    url = u'https://s3.amazonaws.com/{}/{}'.format(bucket, keyname)
     return redirect(nice_domain(url), 302)
 
+def get_tile_index(bucket):
+    ''' Return the published tile index for a bucket, or None if there isn't one.
+
+        Indexes are kept for TILE_INDEX_TTL seconds between downloads.
+    '''
+    if bucket in _tile_indexes:
+        fetched, index = _tile_indexes[bucket]
+        if time.time() - fetched < TILE_INDEX_TTL:
+            return index
+
+    url = u'https://s3.amazonaws.com/{}/{}'.format(bucket, tileindex.INDEX_KEYNAME)
+
+    try:
+        resp = requests.get(nice_domain(url), timeout=5)
+        index = resp.json() if resp.status_code == 200 else None
+    except (requests.RequestException, ValueError) as e:
+        _L.warning('Failed to read tile index {}: {}'.format(url, e))
+        index = None
+
+    _tile_indexes[bucket] = time.time(), index
+    return index
+
 def apply_webapi_blueprint(app):
     '''
     '''
@@ -4,14 +4,28 @@ from .. import util
 from ..jobs import JOB_TIMEOUT
 from .objects import RunState
 
-import os, json, tempfile, shutil, base64, subprocess
+import os, json, tempfile, shutil, base64, subprocess, mimetypes
 from urllib.parse import urlparse, urljoin
+from boto.utils import compute_md5
 
 MAGIC_OK_MESSAGE = 'Everything is fine'
 
 def upload_file(s3, keyname, filename):
     ''' Create a new S3 key with filename contents, return its URL and MD5 hash.
+
+        Files larger than one part are uploaded with collect.write_to_s3().
     '''
+    from .collect import write_to_s3, MULTIPART_CHUNK_SIZE
+
+    if os.path.getsize(filename) > MULTIPART_CHUNK_SIZE:
+        content_type, _ = mimetypes.guess_type(filename)
+        key = write_to_s3(s3.bucket, filename, keyname, content_type=content_type or 'application/octet-stream')
+
+        with open(filename, 'rb') as file:
+            hex_md5, _, _ = compute_md5(file)
+
+        return util.s3_key_url(key), hex_md5
+
     key = s3.new_key(keyname)
 
     key.set_contents_from_filename(filename)
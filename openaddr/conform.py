@@ -11,6 +11,11 @@ import json
 import copy
 import csv
 import re
+import io
+import math
+import functools
+import itertools
+import multiprocessing
 
 from zipfile import ZipFile
 from locale import getpreferredencoding
@@ -151,6 +156,60 @@ def mkdirsp(path):
             raise
 
 
+class ConformStats:
+    ''' Counts and bounding box of output rows, kept as they are written.
+    '''
+    def __init__(self):
+        self.row_count = 0
+        self.invalid_latlon_count = 0
+        self.missing_number_count = 0
+        self.missing_street_count = 0
+        self.bbox = None
+
+    def add_row(self, row):
+        self.row_count += 1
+
+        try:
+            lon, lat = float(row['LON']), float(row['LAT'])
+        except (TypeError, ValueError):
+            lon, lat = None, None
+
+        # Comparisons are all False for NaN, so it's counted invalid here too.
+        if lon is None or not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            self.invalid_latlon_count += 1
+        elif self.bbox is None:
+            self.bbox = [lon, lat, lon, lat]
+        else:
+            self.bbox = [min(self.bbox[0], lon), min(self.bbox[1], lat),
+                         max(self.bbox[2], lon), max(self.bbox[3], lat)]
+
+        if not row.get('NUMBER'):
+            self.missing_number_count += 1
+
+        if not row.get('STREET'):
+            self.missing_street_count += 1
+
+    def update(self, other):
+        ''' Add counts and bounding box from another ConformStats.
+        '''
+        self.row_count += other.row_count
+        self.invalid_latlon_count += other.invalid_latlon_count
+        self.missing_number_count += other.missing_number_count
+        self.missing_street_count += other.missing_street_count
+
+        if self.bbox is None:
+            self.bbox = other.bbox
+        elif other.bbox is not None:
+            self.bbox = [min(self.bbox[0], other.bbox[0]), min(self.bbox[1], other.bbox[1]),
+                         max(self.bbox[2], other.bbox[2]), max(self.bbox[3], other.bbox[3])]
+
+    def todict(self):
+        return dict(row_count=self.row_count, bbox=self.bbox,
+                    invalid_latlon_count=self.invalid_latlon_count,
+                    missing_number_count=self.missing_number_count,
+                    missing_street_count=self.missing_street_count)
+
+
 class ConformResult:
     processed = None
     sample = None
@@ -162,10 +221,11 @@ class ConformResult:
     sharealike_flag = None
     attribution_flag = None
     attribution_name = None
+    stats = None
 
     def __init__(self, processed, sample, website, license, geometry_type,
                  address_count, path, elapsed, sharealike_flag,
-                 attribution_flag, attribution_name):
+                 attribution_flag, attribution_name, stats=None):
         self.processed = processed
         self.sample = sample
         self.website = website
@@ -177,6 +237,7 @@ class ConformResult:
         self.sharealike_flag = sharealike_flag
         self.attribution_flag = attribution_flag
         self.attribution_name = attribution_name
+        self.stats = stats
 
     @staticmethod
     def empty():
@@ -206,48 +267,116 @@ class DecompressionTask(object):
 class GuessDecompressTask(DecompressionTask):
     ''' Decompression task that tries to guess compression from file names.
     '''
-    def decompress(self, source_paths, workdir, filenames):
+    def decompress(self, source_paths, workdir, filenames, stream=False):
         types = {type for (type, _) in map(mimetypes.guess_type, source_paths)}
 
         if types == {'application/zip'}:
             substitute_task = ZipDecompressTask()
             _L.info('Guessing zip compression based on file names')
-            return substitute_task.decompress(source_paths, workdir, filenames)
+            return substitute_task.decompress(source_paths, workdir, filenames, stream)
 
         _L.warning('Could not guess a single compression from file names')
         return source_paths
 
-def is_in(path, names):
+def _index_name(name):
+    return os.path.normpath(name.lower())
+
+def name_index(names):
+    ''' Return a precomputed set of lowercase names for use with is_in().
     '''
+    return frozenset(map(_index_name, names))
+
+def is_in(path, names):
+    ''' Return True if path is one of names, or inside a directory in names.
+
+        Names can be a list or a name_index(), which is faster for many paths.
     '''
-    if path.lower() in names:
-        # Found it!
-        return True
+    if not isinstance(names, frozenset):
+        names = name_index(names)
+
+    path = _index_name(path)
 
-    for name in names:
-        # Maybe one of the names is an enclosing directory?
-        if not os.path.relpath(path.lower(), name).startswith('..'):
-            # Yes, that's it.
+    while path:
+        if path in names:
+            # Found it, or one of the names is an enclosing directory.
             return True
 
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+
     return False
 
+ZIP_MEMBER_PREFIX = '/vsizip/'
+
+def zip_member_path(zip_path, name):
+    ''' Return a path to one member of a zip file, in GDAL's /vsizip/ syntax.
+    '''
+    return '{}{}/{}'.format(ZIP_MEMBER_PREFIX, os.path.abspath(zip_path), name)
+
+def split_zip_member_path(path):
+    ''' Return a zip file path and member name for a zip member path, or None.
+    '''
+    if not path.startswith(ZIP_MEMBER_PREFIX):
+        return None
+
+    path = path[len(ZIP_MEMBER_PREFIX):]
+    index = path.find('/', 1)
+
+    while index != -1:
+        if os.path.isfile(path[:index]):
+            return path[:index], path[index+1:]
+        index = path.find('/', index + 1)
+
+    return None
+
+def open_source_file(path, mode='r', encoding=None):
+    ''' Open a source file for reading, streaming it if it's a zip member path.
+    '''
+    member = split_zip_member_path(path)
+
+    if member is None:
+        return open(path, mode, encoding=encoding)
+
+    zip_path, name = member
+
+    # The member stays readable after the zip file itself is closed.
+    with ZipFile(zip_path, 'r') as z:
+        file = z.open(name, 'r')
+
+    if 'b' in mode:
+        return file
+
+    return io.TextIOWrapper(file, encoding=encoding)
+
 class ZipDecompressTask(DecompressionTask):
-    def decompress(self, source_paths, workdir, filenames):
+    def decompress(self, source_paths, workdir, filenames, stream=False):
+        ''' Extract members of zip files that match filenames, if any.
+
+            With stream=True, files named exactly are not extracted and are
+            returned as zip member paths to be read with open_source_file().
+        '''
         output_files = []
         expand_path = os.path.join(workdir, UNZIPPED_DIRNAME)
         mkdirsp(expand_path)
+        names = name_index(filenames)
 
         # Extract contents of zip file into expand_path directory.
         for source_path in source_paths:
             with ZipFile(source_path, 'r') as z:
-                for name in z.namelist():
-                    if len(filenames) and not is_in(name, filenames):
+                for info in z.infolist():
+                    if names and not is_in(info.filename, names):
                         # Download only the named file, if any.
-                        _L.debug("Skipped file {}".format(name))
+                        _L.debug("Skipped file {}".format(info.filename))
+                        continue
+
+                    if stream and not info.filename.endswith('/') and _index_name(info.filename) in names:
+                        output_files.append(zip_member_path(source_path, info.filename))
+                        _L.debug("Streaming file {}".format(output_files[-1]))
                         continue
 
-                    z.extract(name, expand_path)
+                    z.extract(info, expand_path)
 
         # Collect names of directories and files in expand_path directory.
         for (dirpath, dirnames, filenames) in os.walk(expand_path):
@@ -389,8 +518,14 @@ class ExcerptDataTask(object):
             return paths
 
         unzipped_base = os.path.join(workdir, UNZIPPED_DIRNAME)
-        unzipped_paths = dict([(os.path.relpath(source_path, unzipped_base), source_path)
-                               for source_path in source_paths])
+        unzipped_paths = dict()
+
+        for source_path in source_paths:
+            member = split_zip_member_path(source_path)
+            if member is None:
+                unzipped_paths[os.path.relpath(source_path, unzipped_base)] = source_path
+            else:
+                unzipped_paths[member[1]] = source_path
 
         if conform['file'] not in unzipped_paths:
             return []
@@ -402,7 +537,7 @@ class ExcerptDataTask(object):
     def _make_csv_path(csv_path):
         _, csv_ext = os.path.splitext(csv_path.lower())
 
-        if csv_ext != '.csv':
+        if csv_ext != '.csv' and split_zip_member_path(csv_path) is None:
             # Convince OGR it's looking at a CSV file.
             new_path = csv_path + '.csv'
             os.link(csv_path, new_path)
@@ -423,7 +558,7 @@ class ExcerptDataTask(object):
 
     @staticmethod
     def _excerpt_csv_file(data_path, encoding, csvsplit):
-        with open(data_path, 'r', encoding=encoding) as file:
+        with open_source_file(data_path, 'r', encoding) as file:
             input = csv.reader(file, delimiter=csvsplit)
             data_sample = [row for (row, _) in zip(input, range(6))]
 
@@ -586,7 +721,7 @@ def find_source_path(source_definition, source_paths):
 class ConvertToCsvTask(object):
     known_types = ('.shp', '.json', '.csv', '.kml', '.gdb')
 
-    def convert(self, source_definition, source_paths, workdir):
+    def convert(self, source_definition, source_paths, workdir, workers=1, extract_path=None):
         "Convert a list of source_paths and write results in workdir"
         _L.debug("Converting to %s", workdir)
 
@@ -600,16 +735,14 @@ class ConvertToCsvTask(object):
         if source_path is not None:
             basename, ext = os.path.splitext(os.path.basename(source_path))
             dest_path = os.path.join(convert_path, basename + ".csv")
-            rc = conform_cli(source_definition, source_path, dest_path)
+            stats = ConformStats()
+            rc = conform_cli(source_definition, source_path, dest_path, workers, extract_path, stats)
             if rc == 0:
-                with open(dest_path) as file:
-                    addr_count = sum(1 for line in file) - 1
-
                 # Success! Return the path of the output CSV
-                return dest_path, addr_count
+                return dest_path, stats.row_count, stats
 
         # Conversion must have failed
-        return None, 0
+        return None, 0, None
 
 def convert_regexp_replace(replace):
     ''' Convert regular expression replace string from $ syntax to slash-syntax.
@@ -657,8 +790,159 @@ def normalize_ogr_filename_case(source_path):
 
     return normal_path
 
-def ogr_source_to_csv(source_definition, source_path, dest_path):
-    ''' Convert a single shapefile or GeoJSON in source_path and put it in dest_path
+# Number of features to read at once from OGR layers that support it.
+OGR_READ_BATCHSIZE = 10000
+
+def _can_read_ogr_batches(layer, layer_defn):
+    ''' Return true if a layer can be read in columnar record batches.
+
+        Requires the Arrow stream interface from GDAL 3.6+, UTF-8 strings,
+        and only simple field types whose batch values match OGR GetField().
+        Numeric batch values come without their validity bitmap, so a null
+        would read as zero; layers with nullable numeric fields are read
+        feature by feature instead.
+    '''
+    if not hasattr(layer, 'GetArrowStreamAsNumPy'):
+        return False
+
+    if not layer.TestCapability(ogr.OLCStringsAsUTF8):
+        return False
+
+    for i in range(0, layer_defn.GetFieldCount()):
+        field_defn = layer_defn.GetFieldDefn(i)
+        if field_defn.GetSubType() != ogr.OFSTNone:
+            return False
+        if field_defn.type not in (ogr.OFTString, ogr.OFTInteger, ogr.OFTInteger64, ogr.OFTReal):
+            return False
+        if field_defn.type != ogr.OFTString and field_defn.IsNullable():
+            return False
+
+    return True
+
+def _geometry_centroid_xy(geom, coordTransform):
+    ''' Transform a geometry in place and return X and Y of its centroid.
+
+        Returns None for both if there is no geometry.
+    '''
+    if geom is None:
+        return None, None
+
+    geom.Transform(coordTransform)
+    # Calculate the centroid of the geometry and write it as X and Y columns
+    try:
+        centroid = geom.Centroid()
+    except RuntimeError as e:
+        if 'Invalid number of points in LinearRing found' not in str(e):
+            raise
+        xmin, xmax, ymin, ymax = geom.GetEnvelope()
+        return xmin/2 + xmax/2, ymin/2 + ymax/2
+    else:
+        return centroid.GetX(), centroid.GetY()
+
+def _add_geojson_points(sums, coordinates):
+    for (x, y) in ((c[0], c[1]) for c in coordinates):
+        sums['points'] += 1
+        sums['point_x'] += x
+        sums['point_y'] += y
+
+def _add_geojson_line(sums, coordinates):
+    if len(coordinates) < 2:
+        raise ValueError('Invalid line')
+
+    for (c0, c1) in zip(coordinates[:-1], coordinates[1:]):
+        length = math.hypot(c1[0] - c0[0], c1[1] - c0[1])
+        sums['length'] += length
+        sums['line_x'] += length * (c0[0] + c1[0]) / 2
+        sums['line_y'] += length * (c0[1] + c1[1]) / 2
+
+def _add_geojson_polygon(sums, rings):
+    if not rings:
+        raise ValueError('Empty polygon')
+
+    for (index, ring) in enumerate(rings):
+        if len(ring) < 4 or ring[0][:2] != ring[-1][:2]:
+            # OGR complains about these, let it do so.
+            raise ValueError('Invalid linear ring')
+
+        if sums['base'] is None:
+            sums['base'] = ring[0][0], ring[0][1]
+
+        (bx, by), area2 = sums['base'], 0
+
+        for (c0, c1) in zip(ring[:-1], ring[1:]):
+            area2 += c0[0] * c1[1] - c1[0] * c0[1]
+
+        # Shells add area and holes take it away, whatever their winding.
+        positive = (area2 < 0) if index == 0 else (area2 > 0)
+        sign = 1 if positive else -1
+
+        for (c0, c1) in zip(ring[:-1], ring[1:]):
+            triangle2 = (c0[0] - bx) * (c1[1] - by) - (c1[0] - bx) * (c0[1] - by)
+            sums['area'] += sign * triangle2
+            sums['area_x'] += sign * triangle2 * (bx + c0[0] + c1[0])
+            sums['area_y'] += sign * triangle2 * (by + c0[1] + c1[1])
+
+        _add_geojson_line(sums, ring)
+
+def _add_geojson_geometry(sums, geometry):
+    type, coordinates = geometry['type'], geometry.get('coordinates')
+
+    if type == 'Point':
+        _add_geojson_points(sums, [coordinates])
+    elif type == 'MultiPoint':
+        _add_geojson_points(sums, coordinates)
+    elif type == 'LineString':
+        _add_geojson_line(sums, coordinates)
+    elif type == 'MultiLineString':
+        for line in coordinates:
+            _add_geojson_line(sums, line)
+    elif type == 'Polygon':
+        _add_geojson_polygon(sums, coordinates)
+    elif type == 'MultiPolygon':
+        for polygon in coordinates:
+            _add_geojson_polygon(sums, polygon)
+    else:
+        raise ValueError('Unknown geometry type {}'.format(repr(type)))
+
+def _geojson_centroid_xy(geometry):
+    ''' Return X and Y of the centroid of a GeoJSON geometry dictionary.
+
+        Computes the same centroid as OGR straight from the coordinate arrays,
+        area first, then length, then points. Geometries that OGR might treat
+        differently are handed to OGR. Returns None if there is no geometry.
+    '''
+    if geometry is None:
+        return None
+
+    sums = dict(base=None, area=0, area_x=0, area_y=0, length=0,
+                line_x=0, line_y=0, points=0, point_x=0, point_y=0)
+
+    try:
+        _add_geojson_geometry(sums, geometry)
+    except (ValueError, TypeError, KeyError, IndexError):
+        geom = ogr.CreateGeometryFromJson(json.dumps(geometry))
+        if not geom:
+            return None
+        center = geom.Centroid()
+        return center.GetX(), center.GetY()
+
+    if sums['area'] != 0:
+        return sums['area_x'] / 3 / sums['area'], sums['area_y'] / 3 / sums['area']
+    elif sums['length'] > 0:
+        return sums['line_x'] / sums['length'], sums['line_y'] / sums['length']
+    elif sums['points'] > 0:
+        return sums['point_x'] / sums['points'], sums['point_y'] / sums['points']
+
+    # Degenerate geometry, e.g. a line with repeated points.
+    geom = ogr.CreateGeometryFromJson(json.dumps(geometry))
+    center = geom.Centroid()
+    return center.GetX(), center.GetY()
+
+def iterate_ogr_source(source_definition, source_path, columnar=True):
+    ''' Read a single shapefile or GeoJSON in source_path as extracted rows.
+
+        Return a list of field names and an iterator of row dictionaries.
+        Layers are read in columnar batches where possible, unless columnar is false.
     '''
     in_datasource = ogr.Open(source_path, 0)
     layer_id = source_definition['conform'].get('layer', 0)
@@ -711,50 +995,78 @@ def ogr_source_to_csv(source_definition, source_path, dest_path):
     outSpatialRef.ImportFromEPSG(4326)
     coordTransform = osr.CoordinateTransformation(inSpatialRef, outSpatialRef)
 
-    # Write a CSV file with one row per feature in the OGR source
-    with open(dest_path, 'w', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=out_fieldnames)
-        writer.writeheader()
+    # Field indexes, names, and string flags for each column in the layer
+    in_fields = []
+    for i in range(0, in_layer_defn.GetFieldCount()):
+        field_defn = in_layer_defn.GetFieldDefn(i)
+        in_fields.append((i, field_defn.GetNameRef(), field_defn.type == ogr.OFTString))
 
+    def iterate_rows():
+        # Yield one row per feature in the OGR source
         in_feature = in_layer.GetNextFeature()
         while in_feature:
             row = dict()
 
-            for i in range(0, in_layer_defn.GetFieldCount()):
-                field_defn = in_layer_defn.GetFieldDefn(i)
-                field_value = in_feature.GetField(i)
-                if field_defn.type is ogr.OFTString:
+            for (i, field_name, is_string) in in_fields:
+                if is_string:
                     # Convert OGR's byte sequence strings to Python Unicode strings
-                    field_value = in_feature.GetFieldAsBinary(i).decode(shp_encoding)
-                row[field_defn.GetNameRef()] = field_value
-            geom = in_feature.GetGeometryRef()
-            if geom is not None:
-                geom.Transform(coordTransform)
-                # Calculate the centroid of the geometry and write it as X and Y columns
-                try:
-                    centroid = geom.Centroid()
-                except RuntimeError as e:
-                    if 'Invalid number of points in LinearRing found' not in str(e):
-                        raise
-                    xmin, xmax, ymin, ymax = geom.GetEnvelope()
-                    row[X_FIELDNAME] = xmin/2 + xmax/2
-                    row[Y_FIELDNAME] = ymin/2 + ymax/2
+                    row[field_name] = in_feature.GetFieldAsBinary(i).decode(shp_encoding)
                 else:
-                    row[X_FIELDNAME] = centroid.GetX()
-                    row[Y_FIELDNAME] = centroid.GetY()
-            else:
-                row[X_FIELDNAME] = None
-                row[Y_FIELDNAME] = None
+                    row[field_name] = in_feature.GetField(i)
 
-            writer.writerow(row)
+            geom = in_feature.GetGeometryRef()
+            row[X_FIELDNAME], row[Y_FIELDNAME] = _geometry_centroid_xy(geom, coordTransform)
+
+            yield row
 
             in_feature.Destroy()
             in_feature = in_layer.GetNextFeature()
 
-    in_datasource.Destroy()
+        in_datasource.Destroy()
 
-def csv_source_to_csv(source_definition, source_path, dest_path):
-    "Convert a source CSV file to an intermediate form, coerced to UTF-8 and EPSG:4326"
+    def iterate_rows_columnar():
+        # Yield one row per feature from record batches of the OGR source
+        geometry_column = in_layer.GetGeometryColumn() or 'wkb_geometry'
+        options = ['INCLUDE_FID=NO', 'MAX_FEATURES_IN_BATCH={}'.format(OGR_READ_BATCHSIZE)]
+
+        for batch in in_layer.GetArrowStreamAsNumPy(options=options):
+            columns = []
+            for (_, field_name, is_string) in in_fields:
+                values = batch[field_name].tolist()
+                if is_string:
+                    # Decode whole string columns at once; null strings become blank
+                    values = [(v.decode(shp_encoding) if hasattr(v, 'decode') else v) or '' for v in values]
+                columns.append((field_name, values))
+
+            geometries = batch[geometry_column].tolist()
+
+            for (index, wkb) in enumerate(geometries):
+                row = {field_name: values[index] for (field_name, values) in columns}
+                geom = ogr.CreateGeometryFromWkb(wkb) if wkb else None
+                row[X_FIELDNAME], row[Y_FIELDNAME] = _geometry_centroid_xy(geom, coordTransform)
+                yield row
+
+        in_datasource.Destroy()
+
+    if columnar and _can_read_ogr_batches(in_layer, in_layer_defn):
+        _L.debug("Reading layer in batches of %d features", OGR_READ_BATCHSIZE)
+        return out_fieldnames, iterate_rows_columnar()
+
+    return out_fieldnames, iterate_rows()
+
+def ogr_source_to_csv(source_definition, source_path, dest_path):
+    ''' Convert a single shapefile or GeoJSON in source_path and put it in dest_path
+    '''
+    write_extract_csv(dest_path, *iterate_ogr_source(source_definition, source_path))
+
+# Number of source CSV rows to reproject at once.
+CSV_REPROJECT_BATCHSIZE = 10000
+
+def iterate_csv_source(source_definition, source_path):
+    ''' Read a source CSV file as extracted rows, reprojected to EPSG:4326.
+
+        Return a list of field names and an iterator of row dictionaries.
+    '''
     _L.info("Converting source CSV %s", source_path)
 
     # Encoding processing tag
@@ -765,97 +1077,168 @@ def csv_source_to_csv(source_definition, source_path, dest_path):
 
     # Extract the source CSV, applying conversions to deal with oddball CSV formats
     # Also convert encoding to utf-8 and reproject to EPSG:4326 in X and Y columns
-    with open(source_path, 'r', encoding=enc) as source_fp:
-        in_fieldnames = None   # in most cases, we let the csv module figure these out
-
-        # headers processing tag
-        if "headers" in source_definition["conform"]:
-            headers = source_definition["conform"]["headers"]
-            if (headers == -1):
-                # Read a row off the file to see how many columns it has
-                temp_reader = csv.reader(source_fp, delimiter=str(delim))
-                first_row = next(temp_reader)
-                num_columns = len(first_row)
-                source_fp.seek(0)
-                in_fieldnames = ["COLUMN%d" % n for n in range(1, num_columns+1)]
-                _L.debug("Synthesized header %s", in_fieldnames)
-            else:
-                # partial implementation of headers and skiplines,
-                # matches the sources in our collection as of January 2015
-                # this code handles the case for Korean inputs where there are
-                # two lines of headers and we want to skip the first one
-                assert "skiplines" in source_definition["conform"]
-                assert source_definition["conform"]["skiplines"] == headers
-                # Skip N lines to get to the real header. headers=2 means we skip one line
-                for n in range(1, headers):
-                    next(source_fp)
+    source_fp = open_source_file(source_path, 'r', enc)
+    in_fieldnames = None   # in most cases, we let the csv module figure these out
+
+    # headers processing tag
+    if "headers" in source_definition["conform"]:
+        headers = source_definition["conform"]["headers"]
+        if (headers == -1):
+            # Read a row off the file to see how many columns it has
+            temp_reader = csv.reader(source_fp, delimiter=str(delim))
+            first_row = next(temp_reader)
+            num_columns = len(first_row)
+            source_fp.seek(0)
+            in_fieldnames = ["COLUMN%d" % n for n in range(1, num_columns+1)]
+            _L.debug("Synthesized header %s", in_fieldnames)
         else:
-            # check the source doesn't specify skiplines without headers
-            assert "skiplines" not in source_definition["conform"]
+            # partial implementation of headers and skiplines,
+            # matches the sources in our collection as of January 2015
+            # this code handles the case for Korean inputs where there are
+            # two lines of headers and we want to skip the first one
+            assert "skiplines" in source_definition["conform"]
+            assert source_definition["conform"]["skiplines"] == headers
+            # Skip N lines to get to the real header. headers=2 means we skip one line
+            for n in range(1, headers):
+                next(source_fp)
+    else:
+        # check the source doesn't specify skiplines without headers
+        assert "skiplines" not in source_definition["conform"]
+
+    reader = csv.DictReader(source_fp, delimiter=delim, fieldnames=in_fieldnames)
+    num_fields = len(reader.fieldnames)
 
-        reader = csv.DictReader(source_fp, delimiter=delim, fieldnames=in_fieldnames)
-        num_fields = len(reader.fieldnames)
+    protocol_string = source_definition['protocol']
 
-        protocol_string = source_definition['protocol']
+    # Construct headers for the extracted CSV file
+    if protocol_string == "ESRI":
+        # ESRI sources: just copy what the downloader gave us. (Already has OA:x and OA:y)
+        out_fieldnames = list(reader.fieldnames)
+    else:
+        # CSV sources: replace the source's lat/lon columns with OA:x and OA:y
+        old_latlon = [source_definition["conform"]["lat"], source_definition["conform"]["lon"]]
+        old_latlon.extend([s.upper() for s in old_latlon])
+        out_fieldnames = [fn for fn in reader.fieldnames if fn not in old_latlon]
+        out_fieldnames.append(X_FIELDNAME)
+        out_fieldnames.append(Y_FIELDNAME)
+
+    def extract_batch(source_rows, row_number):
+        try:
+            return rows_extract_and_reproject(source_definition, source_rows)
+        except Exception as e:
+            first_row_number = row_number - len(source_rows) + 1
+            _L.error('Error in rows {}-{}: {}'.format(first_row_number, row_number, e))
+            raise
 
-        # Construct headers for the extracted CSV file
-        if protocol_string == "ESRI":
-            # ESRI sources: just copy what the downloader gave us. (Already has OA:x and OA:y)
-            out_fieldnames = list(reader.fieldnames)
-        else:
-            # CSV sources: replace the source's lat/lon columns with OA:x and OA:y
-            old_latlon = [source_definition["conform"]["lat"], source_definition["conform"]["lon"]]
-            old_latlon.extend([s.upper() for s in old_latlon])
-            out_fieldnames = [fn for fn in reader.fieldnames if fn not in old_latlon]
-            out_fieldnames.append(X_FIELDNAME)
-            out_fieldnames.append(Y_FIELDNAME)
-
-        # Write the extracted CSV file
-        with open(dest_path, 'w', encoding='utf-8') as dest_fp:
-            writer = csv.DictWriter(dest_fp, out_fieldnames)
-            writer.writeheader()
-            # For every row in the source CSV
-            row_number = 0
+    def iterate_rows():
+        with source_fp:
+            # For every row in the source CSV, reprojected in batches
+            row_number, source_rows = 0, []
             for source_row in reader:
                 row_number += 1
                 if len(source_row) != num_fields:
                     _L.debug("Skipping row. Got %d columns, expected %d", len(source_row), num_fields)
                     continue
-                try:
-                    out_row = row_extract_and_reproject(source_definition, source_row)
-                except Exception as e:
-                    _L.error('Error in row {}: {}'.format(row_number, e))
-                    raise
-                else:
-                    writer.writerow(out_row)
 
-def geojson_source_to_csv(source_path, dest_path):
-    '''
+                source_rows.append(source_row)
+                if len(source_rows) >= CSV_REPROJECT_BATCHSIZE:
+                    yield from extract_batch(source_rows, row_number)
+                    source_rows = []
+
+            if source_rows:
+                yield from extract_batch(source_rows, row_number)
+
+    return out_fieldnames, iterate_rows()
+
+def csv_source_to_csv(source_definition, source_path, dest_path):
+    "Convert a source CSV file to an intermediate form, coerced to UTF-8 and EPSG:4326"
+    write_extract_csv(dest_path, *iterate_csv_source(source_definition, source_path))
+
+def iterate_geojson_source(source_path):
+    ''' Read a source GeoJSON file as extracted rows with X and Y centroids.
+
+        Return a list of field names and an iterator of row dictionaries.
+        Field names come from the first feature, and are None if there are none.
     '''
-    # For every row in the source GeoJSON
-    with open(source_path) as file:
-        # Write the extracted CSV file
-        with open(dest_path, 'w', encoding='utf-8') as dest_fp:
-            writer = None
-            for (row_number, feature) in enumerate(stream_geojson(file)):
-                if writer is None:
-                    out_fieldnames = list(feature['properties'].keys())
-                    out_fieldnames.extend((X_FIELDNAME, Y_FIELDNAME))
-                    writer = csv.DictWriter(dest_fp, out_fieldnames)
-                    writer.writeheader()
+    file = open(source_path, 'rb')
+    features = enumerate(stream_geojson(file))
 
+    try:
+        first_feature = next(features)
+    except StopIteration:
+        file.close()
+        return None, iter([])
+
+    out_fieldnames = list(first_feature[1]['properties'].keys())
+    out_fieldnames.extend((X_FIELDNAME, Y_FIELDNAME))
+
+    def iterate_rows():
+        with file:
+            # For every row in the source GeoJSON
+            for (row_number, feature) in itertools.chain([first_feature], features):
                 try:
                     row = feature['properties']
-                    geom = ogr.CreateGeometryFromJson(json.dumps(feature['geometry']))
-                    if not geom:
+                    center = _geojson_centroid_xy(feature['geometry'])
+                    if center is None:
                         continue
-                    center = geom.Centroid()
                 except Exception as e:
                     _L.error('Error in row {}: {}'.format(row_number, e))
                     raise
                 else:
-                    row.update({X_FIELDNAME: center.GetX(), Y_FIELDNAME: center.GetY()})
-                    writer.writerow(row)
+                    row.update({X_FIELDNAME: center[0], Y_FIELDNAME: center[1]})
+                    yield row
+
+    return out_fieldnames, iterate_rows()
+
+def geojson_source_to_csv(source_path, dest_path):
+    '''
+    '''
+    write_extract_csv(dest_path, *iterate_geojson_source(source_path))
+
+def write_extract_csv(dest_path, fieldnames, rows):
+    ''' Write extracted rows to a UTF-8 CSV file with the given field names.
+
+        With no field names, the file is left empty.
+    '''
+    with open(dest_path, 'w', encoding='utf-8') as dest_fp:
+        if fieldnames is None:
+            return
+
+        writer = csv.DictWriter(dest_fp, fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+
+def _extract_value(value):
+    ''' Convert a value as it would be after a round trip through an extract CSV.
+    '''
+    if value is None:
+        return ''
+
+    if not isinstance(value, str):
+        value = str(value)
+
+    if '\r' in value:
+        # Extract files are read back with universal newlines.
+        value = value.replace('\r\n', '\n').replace('\r', '\n')
+
+    return value
+
+def iterate_extract_rows(fieldnames, rows):
+    ''' Yield rows exactly as they would be read back from an extract CSV.
+
+        Allows extracted rows to be streamed to the transform stage without
+        writing the intermediate extract CSV file to disk.
+    '''
+    fieldset = set(fieldnames or [])
+
+    for row in rows:
+        wrong_fields = row.keys() - fieldset
+        if wrong_fields:
+            raise ValueError("dict contains fields not in fieldnames: "
+                             + ", ".join([repr(x) for x in wrong_fields]))
+
+        yield {name: _extract_value(row.get(name)) for name in fieldnames}
 
 _transform_cache = {}
 def _transform_to_4326(srs):
@@ -870,8 +1253,12 @@ def _transform_to_4326(srs):
         _transform_cache[srs] = osr.CoordinateTransformation(in_spatial_ref, out_spatial_ref)
     return _transform_cache[srs]
 
-def row_extract_and_reproject(source_definition, source_row):
-    ''' Find lat/lon in source CSV data and store it in ESPG:4326 in X/Y in the row
+def _row_extract_coordinates(source_definition, source_row):
+    ''' Find lat/lon in source CSV data and return an output row with raw X/Y strings.
+
+        The output row has the source lat and lon columns removed. If either
+        coordinate is missing, its X/Y columns are set to None and the raw
+        strings returned are also None.
     '''
     format_string = source_definition["conform"].get('format')
     protocol_string = source_definition['protocol']
@@ -903,7 +1290,7 @@ def row_extract_and_reproject(source_definition, source_row):
             source_y = source_row[lat_name.upper()]
 
     # Prepare an output row with the source lat and lon columns deleted
-    out_row = copy.deepcopy(source_row)
+    out_row = dict(source_row)
     for n in lon_name, lon_name.upper(), lat_name, lat_name.upper():
         if n in out_row: del out_row[n]
 
@@ -915,6 +1302,16 @@ def row_extract_and_reproject(source_definition, source_row):
         # Add blank data to the output CSV and get out
         out_row[X_FIELDNAME] = None
         out_row[Y_FIELDNAME] = None
+        return out_row, None, None
+
+    return out_row, source_x, source_y
+
+def row_extract_and_reproject(source_definition, source_row):
+    ''' Find lat/lon in source CSV data and store it in ESPG:4326 in X/Y in the row
+    '''
+    out_row, source_x, source_y = _row_extract_coordinates(source_definition, source_row)
+
+    if source_x is None or source_y is None:
         return out_row
 
     # Reproject the coordinates if necessary
@@ -943,65 +1340,70 @@ def row_extract_and_reproject(source_definition, source_row):
     out_row[Y_FIELDNAME] = out_y
     return out_row
 
+def rows_extract_and_reproject(source_definition, source_rows):
+    ''' Find lat/lon in a batch of source CSV rows and store it in ESPG:4326 in X/Y.
 
-def row_function(sd, row, key, fxn):
-    function = fxn["function"]
-    if function == "join":
-        row = row_fxn_join(sd, row, key, fxn)
-    elif function == "regexp":
-        row = row_fxn_regexp(sd, row, key, fxn)
-    elif function == "format":
-        row = row_fxn_format(sd, row, key, fxn)
-    elif function == "prefixed_number":
-        row = row_fxn_prefixed_number(sd, row, key, fxn)
-    elif function == "postfixed_street":
-        row = row_fxn_postfixed_street(sd, row, key, fxn)
-    elif function == "postfixed_unit":
-        row = row_fxn_postfixed_unit(sd, row, key, fxn)
-    elif function == "remove_prefix":
-        row = row_fxn_remove_prefix(sd, row, key, fxn)
-    elif function == "remove_postfix":
-        row = row_fxn_remove_postfix(sd, row, key, fxn)
-    elif function == "chain":
-        row = row_fxn_chain(sd, row, key, fxn)
-    elif function == "first_non_empty":
-        row = row_fxn_first_non_empty(sd, row, key, fxn)
-    elif function == "get":
-        row = row_fxn_get_from_array_string(sd, row, key, fxn)
+        Returns the same rows as row_extract_and_reproject() would for each
+        source row, but reprojects all valid coordinates in a single call.
+    '''
+    if "srs" not in source_definition["conform"]:
+        return [row_extract_and_reproject(source_definition, row) for row in source_rows]
 
-    return row
+    srs = source_definition["conform"]["srs"]
+    out_rows, indexes, points = [], [], []
 
+    for source_row in source_rows:
+        out_row, source_x, source_y = _row_extract_coordinates(source_definition, source_row)
+        out_rows.append(out_row)
 
-def row_transform_and_convert(sd, row):
-    "Apply the full conform transform and extract operations to a row"
+        if source_x is None or source_y is None:
+            continue
 
-    # Some conform specs have fields named with a case different from the source
-    row = row_smash_case(sd, row)
+        try:
+            point = float(source_x), float(source_y)
+        except (TypeError, ValueError) as e:
+            # Bad coordinates are skipped row by row.
+            if not (source_x == "" or source_y == ""):
+                _L.debug("Could not reproject %s %s in SRS %s", source_x, source_y, srs)
+            out_row[X_FIELDNAME] = ""
+            out_row[Y_FIELDNAME] = ""
+        else:
+            indexes.append(len(out_rows) - 1)
+            points.append(point)
 
-    c = sd["conform"]
+    transform = _transform_to_4326(srs)
 
-    "Attribute tags can utilize processing fxns"
-    for k, v in c.items():
-        if k in attrib_types and type(v) is list:
-            "Lists are a concat shortcut to concat fields with spaces"
-            row = row_merge(sd, row, k)
-        if k in attrib_types and type(v) is dict:
-            "Dicts are custom processing functions"
-            row = row_function(sd, row, k, v)
+    try:
+        transformed = transform.TransformPoints(points) if points else []
+    except RuntimeError:
+        transformed = [None] * len(points)
 
-    if "advanced_merge" in c:
-        raise ValueError('Found unsupported "advanced_merge" option in conform')
-    if "split" in c:
-        raise ValueError('Found unsupported "split" option in conform')
+    for (index, point, result) in zip(indexes, points, transformed):
+        if result is None or not (math.isfinite(result[0]) and math.isfinite(result[1])):
+            # Retry points that failed in bulk one at a time, so errors are the same.
+            geom = ogr.Geometry(ogr.wkbPoint)
+            geom.AddPoint_2D(*point)
+            geom.Transform(transform)
+            result = geom.GetX(), geom.GetY()
+
+        out_rows[index][X_FIELDNAME] = "%.7f" % result[0]
+        out_rows[index][Y_FIELDNAME] = "%.7f" % result[1]
+
+    return out_rows
+
+
+def row_function(sd, row, key, fxn):
+    function = row_functions.get(fxn["function"])
+
+    if function is not None:
+        row = function(sd, row, key, fxn)
+
+    return row
 
-    # Make up a random fingerprint if none exists
-    cache_fingerprint = sd.get('fingerprint', str(uuid4()))
 
-    row2 = row_convert_to_out(sd, row)
-    row3 = row_canonicalize_unit_and_number(sd, row2)
-    row4 = row_round_lat_lon(sd, row3)
-    row5 = row_calculate_hash(cache_fingerprint, row4)
-    return row5
+def row_transform_and_convert(sd, row):
+    "Apply the full conform transform and extract operations to a row"
+    return compile_conform_transform(sd)(row)
 
 
 
@@ -1070,15 +1472,27 @@ def row_fxn_join(sd, row, key, fxn):
 
 def row_fxn_regexp(sd, row, key, fxn):
     "Split addresses like '123 Maple St' into '123' and 'Maple St'"
+    return _compile_fxn_regexp(key, fxn)(row)
+
+def _compile_fxn_regexp(key, fxn):
+    "Compile a regexp function once, returning a callable that applies it to a row"
     pattern = re.compile(fxn.get("pattern", False))
     replace = fxn.get('replace', False)
+    field, column = fxn["field"], var_types[key]
+
     if replace:
-        match = re.sub(pattern, convert_regexp_replace(replace), row[fxn["field"]])
-        row[var_types[key]] = match;
+        replace = convert_regexp_replace(replace)
+
+        def apply_regexp(row):
+            row[column] = pattern.sub(replace, row[field])
+            return row
     else:
-        match = pattern.search(row[fxn["field"]])
-        row[var_types[key]] = ''.join(match.groups()) if match else '';
-    return row
+        def apply_regexp(row):
+            match = pattern.search(row[field])
+            row[column] = ''.join(match.groups()) if match else ''
+            return row
+
+    return apply_regexp
 
 def row_fxn_prefixed_number(sd, row, key, fxn):
     "Extract '123' from '123 Maple St'"
@@ -1130,25 +1544,46 @@ def row_fxn_remove_postfix(sd, row, key, fxn):
 
 def row_fxn_format(sd, row, key, fxn):
     "Format multiple fields using a user-specified format string"
-    format_var_pattern = re.compile('\$([0-9]+)')
-
-    fields = [(row[n] or u'').strip() for n in fxn["fields"]]
-
-    parts = []
+    return _compile_fxn_format(key, fxn)(row)
 
-    idx = 0
-    num_fields_added = 0
+format_var_pattern = re.compile('\\$([0-9]+)')
 
+def _compile_fxn_format(key, fxn):
+    "Compile a format function once, returning a callable that applies it to a row"
+    field_names, column = fxn["fields"], var_types[key]
     format_str = fxn["format"]
-    for i, m in enumerate(format_var_pattern.finditer(format_str)):
+
+    # Split the format string into (literal prefix, field index) pairs. An index
+    # of None marks a $n reference with no matching field, which is skipped but
+    # still ends the literal that precedes it.
+    tokens, idx = [], 0
+    for m in format_var_pattern.finditer(format_str):
         field_idx = int(m.group(1))
         start, end = m.span()
 
-        if field_idx > 0 and field_idx - 1 < len(fields):
-            field = fields[field_idx - 1]
+        if field_idx > 0 and field_idx - 1 < len(field_names):
+            tokens.append((format_str[idx:start], field_idx - 1))
+        else:
+            tokens.append((None, None))
+
+        idx = end
+
+    suffix = format_str[idx:]
 
-            if idx == 0 or (num_fields_added > 0 and field):
-                parts.append(format_str[idx:start])
+    def apply_format(row):
+        fields = [(row[n] or u'').strip() for n in field_names]
+
+        parts = []
+        num_fields_added = 0
+
+        for (i, (literal, field_idx)) in enumerate(tokens):
+            if field_idx is None:
+                continue
+
+            field = fields[field_idx]
+
+            if i == 0 or (num_fields_added > 0 and field):
+                parts.append(literal)
 
             if field:
                 # if the value being added ends with '.0', remove it
@@ -1162,15 +1597,15 @@ def row_fxn_format(sd, row, key, fxn):
                 parts.append(field)
                 num_fields_added += 1
 
-        idx = end
+        if num_fields_added > 0:
+            parts.append(suffix)
+            row[column] = u''.join(parts)
+        else:
+            row[column] = u''
 
-    if num_fields_added > 0:
-        parts.append(format_str[idx:])
-        row[var_types[key]] = u''.join(parts)
-    else:
-        row[var_types[key]] = u''
+        return row
 
-    return row
+    return apply_format
 
 def row_fxn_chain(sd, row, key, fxn):
     functions = fxn["functions"]
@@ -1268,60 +1703,335 @@ def row_convert_to_out(sd, row):
         "ID": row.get(keys['id'], None) if keys['id'] else None,
     }
 
+### Compiled conform code. Conform specs are resolved once per source into row callables.
+
+row_functions = {
+    "join": row_fxn_join,
+    "regexp": row_fxn_regexp,
+    "format": row_fxn_format,
+    "prefixed_number": row_fxn_prefixed_number,
+    "postfixed_street": row_fxn_postfixed_street,
+    "postfixed_unit": row_fxn_postfixed_unit,
+    "remove_prefix": row_fxn_remove_prefix,
+    "remove_postfix": row_fxn_remove_postfix,
+    "chain": row_fxn_chain,
+    "first_non_empty": row_fxn_first_non_empty,
+    "get": row_fxn_get_from_array_string,
+    }
+
+def compile_row_function(sd, key, fxn):
+    ''' Return a callable that applies one conform function to a row.
+
+        Equivalent to row_function(sd, row, key, fxn), with patterns and
+        formats compiled ahead of time.
+    '''
+    function = fxn["function"]
+
+    if function == "regexp":
+        return _compile_fxn_regexp(key, fxn)
+    elif function == "format":
+        return _compile_fxn_format(key, fxn)
+    elif function == "chain":
+        return _compile_fxn_chain(sd, key, fxn)
+    elif function in row_functions:
+        return functools.partial(row_functions[function], sd, key=key, fxn=fxn)
+
+    # Unknown functions leave the row unchanged.
+    return lambda row: row
+
+def _compile_fxn_chain(sd, key, fxn):
+    "Compile a chain function once, returning a callable that applies it to a row"
+    functions = fxn["functions"]
+    var = fxn.get("variable")
+
+    if var and var not in attrib_types and var.lstrip('OA:') not in attrib_types:
+        # Chained functions may write into a new intermediate variable.
+        var_types[var] = var
+        var_steps = [compile_row_function(sd, var, func) for func in functions]
+    else:
+        var, var_steps = None, None
+
+    key_steps = [compile_row_function(sd, key, func) for func in functions]
+    column = var_types[key]
+
+    def apply_chain(row):
+        if var is not None and var not in row:
+            row[var] = u''
+            steps, result = var_steps, var
+        else:
+            steps, result = key_steps, column
+
+        for step in steps:
+            row = step(row)
+
+        row[column] = row[result]
+        return row
+
+    return apply_chain
+
+def _compile_merge(key, fields):
+    "Compile a list-style merge once, returning a callable that applies it to a row"
+    column = var_types[key]
+
+    def apply_merge(row):
+        row[column] = ' '.join([row[field] for field in fields])
+        return row
+
+    return apply_merge
+
+def compile_conform_transform(sd):
+    ''' Compile a source definition into a single row transform function.
+
+        The returned callable takes an extracted source row and returns an
+        output row, exactly as row_transform_and_convert(sd, row) would. Field
+        names, patterns, and the output key map are resolved here just once.
+    '''
+    c = sd["conform"]
+
+    if "advanced_merge" in c:
+        raise ValueError('Found unsupported "advanced_merge" option in conform')
+    if "split" in c:
+        raise ValueError('Found unsupported "split" option in conform')
+
+    steps = []
+
+    "Attribute tags can utilize processing fxns"
+    for k, v in c.items():
+        if k in attrib_types and type(v) is list:
+            "Lists are a concat shortcut to concat fields with spaces"
+            steps.append(_compile_merge(k, v))
+        if k in attrib_types and type(v) is dict:
+            "Dicts are custom processing functions"
+            steps.append(compile_row_function(sd, k, v))
+
+    # Output columns come from OA:* variables when present,
+    # otherwise from the source field named directly in the conform.
+    out_keys = [(k.upper(), attrib_types[k], c.get(k, False))
+                for k in ('unit', 'number', 'street', 'city', 'district', 'region', 'postcode', 'id')]
+
+    fingerprint = sd.get('fingerprint')
+
+    def transform(row):
+        # Some conform specs have fields named with a case different from the source
+        row = row_smash_case(sd, row)
+
+        for step in steps:
+            row = step(row)
+
+        out_row = {"LON": row.get(X_FIELDNAME, None), "LAT": row.get(Y_FIELDNAME, None)}
+
+        for (out_key, var_key, conform_key) in out_keys:
+            if var_key in row:
+                out_row[out_key] = row.get(var_key, None)
+            else:
+                out_row[out_key] = row.get(conform_key, None) if conform_key else None
+
+        # Make up a random fingerprint if none exists
+        cache_fingerprint = str(uuid4()) if fingerprint is None else fingerprint
+
+        row2 = row_canonicalize_unit_and_number(sd, out_row)
+        row3 = row_round_lat_lon(sd, row2)
+        return row_calculate_hash(cache_fingerprint, row3)
+
+    return transform
+
 ### File-level conform code. Inputs and outputs are filenames.
 
-def extract_to_source_csv(source_definition, source_path, extract_path):
-    """Extract arbitrary downloaded sources to an extracted CSV in the source schema.
+def iterate_source(source_definition, source_path):
+    """Read arbitrary downloaded sources as extracted rows in the source schema.
     source_definition: description of the source, containing the conform object
-    extract_path: file to write the extracted CSV file
 
-    The extracted file will be in UTF-8 and will have X and Y columns corresponding
-    to longitude and latitude in EPSG:4326.
+    Returns a list of field names and an iterator of row dictionaries, with
+    X and Y columns corresponding to longitude and latitude in EPSG:4326.
     """
     format_string = source_definition["conform"]['format']
     protocol_string = source_definition['protocol']
 
     if format_string in ("shapefile", "shapefile-polygon", "xml", "gdb"):
         ogr_source_path = normalize_ogr_filename_case(source_path)
-        ogr_source_to_csv(source_definition, ogr_source_path, extract_path)
+        return iterate_ogr_source(source_definition, ogr_source_path)
     elif format_string == "csv":
-        csv_source_to_csv(source_definition, source_path, extract_path)
+        return iterate_csv_source(source_definition, source_path)
     elif format_string == "geojson":
         # GeoJSON sources have some awkward legacy with ESRI, see issue #34
         if protocol_string == "ESRI":
             _L.info("ESRI GeoJSON source found; treating it as CSV")
-            csv_source_to_csv(source_definition, source_path, extract_path)
+            return iterate_csv_source(source_definition, source_path)
         else:
             _L.info("Non-ESRI GeoJSON source found; converting as a stream.")
             geojson_source_path = normalize_ogr_filename_case(source_path)
-            geojson_source_to_csv(geojson_source_path, extract_path)
+            return iterate_geojson_source(geojson_source_path)
     else:
         raise Exception("Unsupported source format %s" % format_string)
 
-def transform_to_out_csv(source_definition, extract_path, dest_path):
+def extract_to_source_csv(source_definition, source_path, extract_path):
+    """Extract arbitrary downloaded sources to an extracted CSV in the source schema.
+    source_definition: description of the source, containing the conform object
+    extract_path: file to write the extracted CSV file
+
+    The extracted file will be in UTF-8 and will have X and Y columns corresponding
+    to longitude and latitude in EPSG:4326.
+    """
+    write_extract_csv(extract_path, *iterate_source(source_definition, source_path))
+
+def transform_to_out_csv(source_definition, extract_path, dest_path, workers=1):
     ''' Transform an extracted source CSV to the OpenAddresses output CSV by applying conform rules.
 
         source_definition: description of the source, containing the conform object
         extract_path: extracted CSV file to process
         dest_path: path for output file in OpenAddress CSV
+        workers: number of processes to use; output is identical for any number
+
+        Returns ConformStats for the written rows.
+    '''
+    if workers > 1:
+        # Convert all field names in the conform spec to lower case
+        source_definition = conform_smash_case(source_definition)
+        return _transform_to_out_csv_parallel(source_definition, extract_path, dest_path, workers)
+
+    # Read through the extract CSV
+    with open(extract_path, 'r', encoding='utf-8') as extract_fp:
+        return transform_rows_to_out_csv(source_definition, csv.DictReader(extract_fp), dest_path)
+
+def transform_rows_to_out_csv(source_definition, rows, dest_path):
+    ''' Transform extracted source rows to the OpenAddresses output CSV by applying conform rules.
+
+        source_definition: description of the source, containing the conform object
+        rows: iterator of extracted row dictionaries, as read from an extract CSV
+        dest_path: path for output file in OpenAddress CSV
+
+        Returns ConformStats for the written rows.
     '''
     # Convert all field names in the conform spec to lower case
     source_definition = conform_smash_case(source_definition)
+    stats = ConformStats()
 
-    # Read through the extract CSV
+    # Write to the destination CSV
+    with open(dest_path, 'w', encoding='utf-8') as dest_fp:
+        writer = csv.DictWriter(dest_fp, OPENADDR_CSV_SCHEMA)
+        writer.writeheader()
+        transform = compile_conform_transform(source_definition)
+        # For every row in the extract
+        for extract_row in rows:
+            out_row = transform(extract_row)
+            stats.add_row(out_row)
+            writer.writerow(out_row)
+
+    return stats
+
+# Byte sizes for reading and for splitting extract CSV files in parallel conform.
+CSV_SCAN_BLOCKSIZE = 1024 * 1024
+CSV_RANGE_SIZE = 64 * 1024 * 1024
+
+def find_csv_row_boundaries(path, offsets):
+    ''' Return sorted byte offsets of the first CSV row start after each given offset.
+
+        Double-quote parity is tracked from the start of the file, so newlines
+        inside quoted fields are never mistaken for row boundaries. Offsets that
+        lead to the same row boundary are returned once.
+    '''
+    boundaries, offsets = [], sorted(offsets)
+
+    with open(path, 'rb') as file:
+        in_quotes, position = False, 0
+
+        while offsets:
+            block = file.read(CSV_SCAN_BLOCKSIZE)
+            if not block:
+                break
+
+            index = 0
+            while offsets:
+                start = max(index, offsets[0] - position)
+                newline = block.find(b'\n', start) if start < len(block) else -1
+                if newline == -1:
+                    break
+
+                in_quotes ^= bool(block.count(b'"', index, newline) % 2)
+                index = newline + 1
+
+                if not in_quotes:
+                    boundaries.append(position + index)
+                    while offsets and offsets[0] < position + index:
+                        offsets.pop(0)
+
+            in_quotes ^= bool(block.count(b'"', index) % 2)
+            position += len(block)
+
+    return boundaries
+
+def _transform_csv_range(args):
+    ''' Transform one byte range of an extracted CSV, return encoded output rows and stats.
+
+        Runs in a worker process for _transform_to_out_csv_parallel().
+    '''
+    source_definition, extract_path, fieldnames, start, end = args
+
+    with open(extract_path, 'rb') as file:
+        file.seek(start)
+        extract_fp = io.TextIOWrapper(io.BytesIO(file.read(end - start)), encoding='utf-8')
+
+    # Text wrappers match the newline handling of the files used by the serial path.
+    output = io.BytesIO()
+    dest_fp = io.TextIOWrapper(output, encoding='utf-8')
+
+    reader = csv.DictReader(extract_fp, fieldnames=fieldnames)
+    writer = csv.DictWriter(dest_fp, OPENADDR_CSV_SCHEMA)
+    transform = compile_conform_transform(source_definition)
+    stats = ConformStats()
+
+    for extract_row in reader:
+        out_row = transform(extract_row)
+        stats.add_row(out_row)
+        writer.writerow(out_row)
+
+    dest_fp.flush()
+    return output.getvalue(), stats
+
+def _transform_to_out_csv_parallel(source_definition, extract_path, dest_path, workers):
+    ''' Transform an extracted source CSV in byte ranges using a pool of processes.
+
+        Ranges are conformed independently and written out in their original
+        order, so the output is byte-identical to the serial path.
+    '''
     with open(extract_path, 'r', encoding='utf-8') as extract_fp:
-        reader = csv.DictReader(extract_fp)
-        # Write to the destination CSV
-        with open(dest_path, 'w', encoding='utf-8') as dest_fp:
-            writer = csv.DictWriter(dest_fp, OPENADDR_CSV_SCHEMA)
-            writer.writeheader()
-            # For every row in the extract
-            for extract_row in reader:
-                out_row = row_transform_and_convert(source_definition, extract_row)
-                writer.writerow(out_row)
-
-def conform_cli(source_definition, source_path, dest_path):
-    "Command line entry point for conforming a downloaded source to an output CSV."
+        fieldnames = csv.DictReader(extract_fp).fieldnames
+
+    size = os.stat(extract_path).st_size
+    count = max(workers, size // CSV_RANGE_SIZE)
+    offsets = [0] + [size * i // count for i in range(1, count)]
+
+    # The first boundary is the end of the header row.
+    boundaries = find_csv_row_boundaries(extract_path, offsets) + [size]
+    ranges = [(start, end) for (start, end) in zip(boundaries[:-1], boundaries[1:]) if end > start]
+    _L.debug('Transforming %d ranges of %s with %d workers', len(ranges), extract_path, workers)
+
+    tasks = [(source_definition, extract_path, fieldnames, start, end) for (start, end) in ranges]
+    stats = ConformStats()
+
+    with open(dest_path, 'w', encoding='utf-8') as dest_fp:
+        writer = csv.DictWriter(dest_fp, OPENADDR_CSV_SCHEMA)
+        writer.writeheader()
+        dest_fp.flush()
+
+        if not fieldnames:
+            return stats
+
+        with multiprocessing.Pool(workers) as pool:
+            for (chunk, chunk_stats) in pool.imap(_transform_csv_range, tasks):
+                dest_fp.buffer.write(chunk)
+                stats.update(chunk_stats)
+
+    return stats
+
+def conform_cli(source_definition, source_path, dest_path, workers=1, extract_path=None, stats=None):
+    ''' Command line entry point for conforming a downloaded source to an output CSV.
+
+        Extracted rows are streamed directly to the transform stage. An
+        intermediate extract CSV is written only for parallel conform with
+        more than one worker, or for debugging if extract_path is given.
+        An optional ConformStats is updated with counts of the output rows.
+    '''
     # TODO: this tool only works if the source creates a single output
 
     if "conform" not in source_definition:
@@ -1333,16 +2043,29 @@ def conform_cli(source_definition, source_path, dest_path):
         _L.warning("Skipping file with unknown conform: %s", source_path)
         return 1
 
-    # Create a temporary filename for the intermediate extracted source CSV
-    fd, extract_path = tempfile.mkstemp(prefix='openaddr-extracted-', suffix='.csv')
-    os.close(fd)
-    _L.debug('extract temp file %s', extract_path)
-
-    try:
+    if extract_path is not None:
+        _L.debug('extract file %s', extract_path)
         extract_to_source_csv(source_definition, source_path, extract_path)
-        transform_to_out_csv(source_definition, extract_path, dest_path)
-    finally:
-        os.remove(extract_path)
+        out_stats = transform_to_out_csv(source_definition, extract_path, dest_path, workers)
+
+    elif workers > 1:
+        # Create a temporary filename for the intermediate extracted source CSV
+        fd, extract_path = tempfile.mkstemp(prefix='openaddr-extracted-', suffix='.csv')
+        os.close(fd)
+        _L.debug('extract temp file %s', extract_path)
+
+        try:
+            extract_to_source_csv(source_definition, source_path, extract_path)
+            out_stats = transform_to_out_csv(source_definition, extract_path, dest_path, workers)
+        finally:
+            os.remove(extract_path)
+
+    else:
+        fieldnames, rows = iterate_source(source_definition, source_path)
+        out_stats = transform_rows_to_out_csv(source_definition, iterate_extract_rows(fieldnames, rows), dest_path)
+
+    if stats is not None:
+        stats.update(out_stats)
 
     return 0
 
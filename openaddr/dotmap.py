@@ -8,22 +8,32 @@ from itertools import product
 from os.path import splitext, basename
 from argparse import ArgumentParser
 from urllib.parse import urlparse, parse_qsl, urljoin
-from tempfile import mkstemp, gettempdir
-from os import environ, close, remove
-from shutil import copyfile
+from tempfile import mkstemp, mkdtemp, gettempdir
+from os import environ, close, remove, cpu_count
+from shutil import copyfile, move, rmtree
+from json.encoder import encode_basestring_ascii
+from collections import deque
+from threading import Thread
+from queue import Queue
 from time import sleep
 from io import TextIOWrapper
-import json, subprocess, csv, sqlite3
+import json, subprocess, csv, sqlite3, math, multiprocessing
 
 from uritemplate import expand
 import requests, boto3
 
 from .ci import db_connect, db_cursor, setup_logger
 from .ci.objects import read_latest_set, read_completed_runs_to_date
-from . import iterate_local_processed_files
+from . import iterate_local_processed_files, geoparquet, PREFETCH_FILES
+from .slippymap import tippecanoe_input_args, TIPPECANOE_INPUTS
+from .cache import DownloadCache, DOWNLOAD_CACHE_BYTES
 
 MAPBOX_API_BASE = 'https://api.mapbox.com/uploads/v1/'
 
+# Bytes of encoded features read at once, and chunks of them waiting for each pipe.
+FEATURE_CHUNK_SIZE = 1024 * 1024
+PIPE_QUEUE_SIZE = 64
+
 def connect_db(dsn):
     ''' Prepare old-style arguments to connect_db().
     '''
@@ -39,8 +49,8 @@ def connect_db(dsn):
 
     return db_connect(**kwargs)
 
-def call_tippecanoe(mbtiles_filename, include_properties=True):
-    '''
+def call_tippecanoe(mbtiles_filename, include_properties=True, input_filenames=()):
+    ''' Start tippecanoe reading GeoJSON from stdin, or from a list of input files.
     '''
     base_zoom = 15
 
@@ -65,6 +75,10 @@ def call_tippecanoe(mbtiles_filename, include_properties=True):
             '--exclude-all', '--maximum-zoom', str(base_zoom - 1), '--base-zoom', str(base_zoom)
             )
 
+    if input_filenames:
+        _L.info('Running tippcanoe: {} with {} input files'.format(' '.join(full_cmd), len(input_filenames)))
+        return subprocess.Popen(full_cmd + tippecanoe_input_args(input_filenames))
+
     _L.info('Running tippcanoe: {}'.format(' '.join(full_cmd)))
 
     return subprocess.Popen(full_cmd, stdin=subprocess.PIPE, bufsize=1)
@@ -240,10 +254,27 @@ parser.add_argument('-n', '--name-prefix', default='',
 parser.add_argument('--sns-arn', default=environ.get('AWS_SNS_ARN', None),
                     help='Optional AWS Simple Notification Service (SNS) resource. Defaults to value of AWS_SNS_ARN environment variable.')
 
+parser.add_argument('--processed-cache', help='Optional directory of processed files to reuse across runs. Defaults to PROCESSED_CACHE_DIR environment variable.',
+                    dest='processed_cache', default=environ.get('PROCESSED_CACHE_DIR', None))
+
+parser.add_argument('--workers', help='Number of processes to use for encoding features. Defaults to number of CPUs.',
+                    type=int, dest='workers', default=cpu_count() or 1)
+
+parser.add_argument('--tippecanoe-input', help='How to feed features to Tippecanoe, one of {}. File inputs are kept on disk until Tippecanoe finishes. Defaults to "stdin".'.format(', '.join(TIPPECANOE_INPUTS)),
+                    dest='tippecanoe_input', choices=TIPPECANOE_INPUTS, default='stdin')
+
+parser.add_argument('--processed-cache-size', help='Size in bytes of processed cache directory. Defaults to PROCESSED_CACHE_SIZE environment variable or {}.'.format(DOWNLOAD_CACHE_BYTES),
+                    type=int, dest='processed_cache_size', default=environ.get('PROCESSED_CACHE_SIZE', DOWNLOAD_CACHE_BYTES))
+
 def main():
     args = parser.parse_args()
     setup_logger(args.sns_arn, None)
 
+    if args.processed_cache:
+        processed_cache = DownloadCache(args.processed_cache, args.processed_cache_size)
+    else:
+        processed_cache = None
+
     _L.info("Fetching runs from database...")
     with connect_db(args.database_url) as conn:
         with db_cursor(conn) as db:
@@ -261,24 +292,38 @@ def main():
         mbtiles_filenames.append(mbtiles_filename)
         close(handle)
 
-    # Stream all features to two tilesets: high-zoom and low-zoom.
-    _L.info("Instantiating tippecanoes")
-    tippecanoe_hi = call_tippecanoe(mbtiles_filenames[0], True)
-    tippecanoe_lo = call_tippecanoe(mbtiles_filenames[1], False)
-    results = iterate_local_processed_files(runs)
-
-    _L.info("Streaming all features")
-    for feature in stream_all_features(results):
-        line = json.dumps(feature).encode('utf8') + b'\n'
-        tippecanoe_hi.stdin.write(line)
-        tippecanoe_lo.stdin.write(line)
-
-    _L.info("Finished streaming features")
-    tippecanoe_hi.stdin.close()
-    tippecanoe_lo.stdin.close()
+    results = iterate_local_processed_files(runs, processed_cache=processed_cache, prefetch=PREFETCH_FILES)
+    input_dirname = None
+
+    if args.tippecanoe_input == 'stdin':
+        # Stream all features to two tilesets: high-zoom and low-zoom.
+        _L.info("Instantiating tippecanoes")
+        tippecanoe_hi = call_tippecanoe(mbtiles_filenames[0], True)
+        tippecanoe_lo = call_tippecanoe(mbtiles_filenames[1], False)
+
+        _L.info("Streaming all features")
+        chunks = stream_all_feature_bytes(results, args.workers)
+        write_to_pipes(chunks, [tippecanoe_hi.stdin, tippecanoe_lo.stdin])
+
+        _L.info("Finished streaming features")
+        tippecanoe_hi.stdin.close()
+        tippecanoe_lo.stdin.close()
+    else:
+        # Write all features to input files shared by both tilesets.
+        _L.info("Writing all features to {} files".format(args.tippecanoe_input))
+        input_dirname = mkdtemp(prefix='dotmap-')
+        input_filenames = list(iterate_encoded_files(results, args.workers, input_dirname, args.tippecanoe_input))
+
+        _L.info("Instantiating tippecanoes")
+        tippecanoe_hi = call_tippecanoe(mbtiles_filenames[0], True, input_filenames)
+        tippecanoe_lo = call_tippecanoe(mbtiles_filenames[1], False, input_filenames)
+
     tippecanoe_hi.wait()
     tippecanoe_lo.wait()
 
+    if input_dirname:
+        rmtree(input_dirname)
+
     status_hi, status_lo = tippecanoe_hi.returncode, tippecanoe_lo.returncode
     _L.info("Tippecanoes are finished. Highzoom status: %s, Lowzoom status: %s", status_hi, status_lo)
 
@@ -305,6 +350,19 @@ def stream_all_features(results):
         _L.debug(u'Opening {} ({})'.format(result.filename, result.source_base))
 
         zipfile = ZipFile(result.filename, mode='r')
+        _, parquet_file = geoparquet.open_zipped_parquet(zipfile) or (None, None)
+
+        if parquet_file is not None:
+            # Yield GeoJSON point objects from typed GeoParquet columns.
+            for (lon, lat, row) in geoparquet.iterate_rows(parquet_file):
+                if lon is not None and lat is not None:
+                    properties = {k: v for (k, v) in row.items() if k not in ('LON', 'LAT')}
+                    yield {"type": "Feature", "properties": properties,
+                        "geometry": {"type": "Point", "coordinates": (lon, lat)}}
+
+            zipfile.close()
+            continue
+
         for filename in zipfile.namelist():
             # Look for the one expected .csv file in the zip archive.
             _, ext = splitext(filename)
@@ -327,5 +385,187 @@ def stream_all_features(results):
                 zipfile.close()
                 break
 
+def _make_feature_template(fieldnames):
+    ''' Return a line template for GeoJSON features, and its property names.
+
+        Lines match json.dumps() output for the same feature dictionaries.
+    '''
+    names = [name for name in fieldnames if name not in ('LON', 'LAT')]
+    properties = ', '.join(['{}: %s'.format(encode_basestring_ascii(name).replace('%', '%%'))
+                            for name in names])
+    template = '{"type": "Feature", "properties": {' + properties + '}, ' \
+               '"geometry": {"type": "Point", "coordinates": [%s, %s]}}\n'
+
+    return template, names
+
+def _encode_value(value):
+    return 'null' if value is None else encode_basestring_ascii(value)
+
+def _iterate_zipfile_points(zipfile):
+    ''' Return property names and a generator of (lon, lat, row) points from a processed zip file.
+
+        Rows are read from GeoParquet data when it's available, and points
+        without finite coordinates are skipped.
+    '''
+    _, parquet_file = geoparquet.open_zipped_parquet(zipfile) or (None, None)
+
+    if parquet_file is not None:
+        rows = geoparquet.iterate_rows(parquet_file)
+        fieldnames = [name for name in parquet_file.schema_arrow.names
+                      if name != geoparquet.GEOMETRY_COLUMN]
+    else:
+        names = [name for name in zipfile.namelist() if splitext(name)[1] == '.csv']
+        if not names:
+            return [], iter([])
+        reader = csv.DictReader(TextIOWrapper(zipfile.open(names[0]), encoding='utf8'))
+        rows = ((row['LON'], row['LAT'], row) for row in reader)
+        fieldnames = reader.fieldnames or []
+
+    def iterate_points():
+        for (lon, lat, row) in rows:
+            try:
+                lon, lat = float(lon), float(lat)
+            except (TypeError, ValueError):
+                continue
+
+            if math.isfinite(lon) and math.isfinite(lat):
+                yield lon, lat, row
+
+    return [name for name in fieldnames if name not in ('LON', 'LAT')], iterate_points()
+
+def iterate_feature_lines(zipfile):
+    ''' Generate newline-delimited GeoJSON feature strings from a processed zip file.
+
+        Features are formatted from a template instead of built as dictionaries,
+        and points without finite coordinates are skipped.
+    '''
+    names, points = _iterate_zipfile_points(zipfile)
+    template, names = _make_feature_template(names)
+
+    for (lon, lat, row) in points:
+        values = [_encode_value(row.get(name)) for name in names]
+        yield template % (*values, repr(lon), repr(lat))
+
+def encode_features(filename, input_format='geojson'):
+    ''' Write features from a processed zip file to a new tippecanoe input file.
+
+        Runs in a worker process. Removes the processed file, and returns the
+        name of a file with newline-delimited GeoJSON, or CSV with LON and LAT
+        columns followed by feature properties.
+    '''
+    with ZipFile(filename, mode='r') as zipfile:
+        if input_format == 'csv':
+            features_filename = splitext(filename)[0] + '.csv'
+            names, points = _iterate_zipfile_points(zipfile)
+
+            with open(features_filename, 'w', encoding='utf8', newline='') as file:
+                rows = csv.writer(file)
+                rows.writerow(['LON', 'LAT'] + names)
+                rows.writerows([repr(lon), repr(lat)] + [row.get(name) for name in names]
+                               for (lon, lat, row) in points)
+        else:
+            features_filename = splitext(filename)[0] + '.geojson'
+
+            with open(features_filename, 'w', encoding='ascii') as file:
+                file.writelines(iterate_feature_lines(zipfile))
+
+    remove(filename)
+    return features_filename
+
+def _read_encoded_features(features_filename):
+    ''' Generate chunks of bytes from an encode_features() file, then remove it.
+    '''
+    with open(features_filename, 'rb') as file:
+        while True:
+            chunk = file.read(FEATURE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    remove(features_filename)
+
+def iterate_encoded_files(results, workers, dirname, input_format='geojson'):
+    ''' Generate names of encode_features() files in dirname for processed results.
+
+        Processed files are encoded in a pool of worker processes, and their
+        file names are generated in the same order as the results.
+    '''
+    pending = deque()
+
+    with multiprocessing.Pool(workers) as pool:
+        for result in results:
+            _L.debug(u'Encoding {} ({})'.format(result.filename, result.source_base))
+
+            # iterate_local_processed_files() removes each file once we move
+            # on to the next, so hold on to it until a worker has encoded it.
+            handle, filename = mkstemp(prefix='processed-', suffix='.zip', dir=dirname)
+            close(handle)
+            move(result.filename, filename)
+            pending.append(pool.apply_async(encode_features, (filename, input_format)))
+
+            # Keep a bounded number of processed sources on disk.
+            while len(pending) > workers * 2:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+def stream_all_feature_bytes(results, workers):
+    ''' Generate chunks of newline-delimited GeoJSON bytes for all locations.
+
+        Features are generated in the same order as stream_all_features().
+    '''
+    dirname = mkdtemp(prefix='dotmap-')
+
+    try:
+        for features_filename in iterate_encoded_files(results, workers, dirname):
+            yield from _read_encoded_features(features_filename)
+    finally:
+        rmtree(dirname)
+
+def _drain_queue(queue, pipe, errors):
+    ''' Write chunks from a queue to a pipe until None arrives.
+
+        After an error, chunks are still taken from the queue so that
+        write_to_pipes() does not block.
+    '''
+    while True:
+        chunk = queue.get()
+        if chunk is None:
+            break
+        if errors:
+            continue
+        try:
+            pipe.write(chunk)
+        except Exception as e:
+            errors.append(e)
+
+def write_to_pipes(chunks, pipes):
+    ''' Write every chunk of bytes to each pipe, with a writer thread per pipe.
+
+        Each pipe gets up to PIPE_QUEUE_SIZE chunks ahead of the slowest.
+    '''
+    queues = [Queue(PIPE_QUEUE_SIZE) for pipe in pipes]
+    errors = [list() for pipe in pipes]
+    threads = [Thread(target=_drain_queue, args=args) for args in zip(queues, pipes, errors)]
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        for chunk in chunks:
+            for queue in queues:
+                queue.put(chunk)
+    finally:
+        for queue in queues:
+            queue.put(None)
+
+        for thread in threads:
+            thread.join()
+
+    for pipe_errors in errors:
+        if pipe_errors:
+            raise pipe_errors[0]
+
 if __name__ == '__main__':
     exit(main())
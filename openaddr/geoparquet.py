@@ -0,0 +1,171 @@
+''' Columnar GeoParquet copies of processed output CSV files.
+
+Downstream tools read locations from these files instead of parsing the
+same CSV again. This is opt-in: pyarrow 3.0 or newer is needed, which is
+not in the Python 3.5 machine image, so install it with the "geoparquet"
+extra. Without it no files are written, and readers here return None so
+callers fall back to the CSV.
+'''
+import logging; _L = logging.getLogger('openaddr.geoparquet')
+
+from os.path import splitext, exists
+from csv import DictReader
+import zipfile
+import struct
+import json
+import math
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+else:
+    if not hasattr(pyarrow.parquet.ParquetFile, 'iter_batches'):
+        # Added in pyarrow 3.0
+        pyarrow = None
+
+# Rows per row group, small enough to stream one group at a time.
+ROW_GROUP_SIZE = 64 * 1024
+
+# Matches conform.row_round_lat_lon(), so values read back as in the CSV.
+COORDINATE_FORMAT = '%.12g'
+
+GEOMETRY_COLUMN = 'geometry'
+
+def get_parquet_path(csv_path):
+    ''' Return the path of a GeoParquet file alongside a processed CSV file.
+    '''
+    return splitext(csv_path)[0] + '.parquet'
+
+def _parse_coordinate(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _point_wkb(lon, lat):
+    if lon is None or lat is None or not (math.isfinite(lon) and math.isfinite(lat)):
+        return None
+
+    # Little-endian WKB Point
+    return struct.pack('<BIdd', 1, 1, lon, lat)
+
+def _make_schema(fieldnames):
+    fields = [(name, pyarrow.float64() if name in ('LON', 'LAT') else pyarrow.string())
+              for name in fieldnames]
+    fields.append((GEOMETRY_COLUMN, pyarrow.binary()))
+
+    # https://github.com/opengeospatial/geoparquet/blob/v1.0.0/format-specs/geoparquet.md
+    geo = {'version': '1.0.0', 'primary_column': GEOMETRY_COLUMN,
+           'columns': {GEOMETRY_COLUMN: {'encoding': 'WKB', 'geometry_types': ['Point']}}}
+
+    return pyarrow.schema(fields, metadata={'geo': json.dumps(geo)})
+
+def _make_table(schema, fieldnames, rows):
+    columns = {name: [row.get(name) for row in rows] for name in fieldnames}
+
+    for name in ('LON', 'LAT'):
+        if name in columns:
+            columns[name] = [_parse_coordinate(value) for value in columns[name]]
+
+    columns[GEOMETRY_COLUMN] = [_point_wkb(lon, lat) for (lon, lat)
+                                in zip(columns.get('LON', []), columns.get('LAT', []))]
+
+    return pyarrow.table(columns, schema=schema)
+
+def write_parquet(csv_path, parquet_path):
+    ''' Write a compressed GeoParquet copy of a processed CSV file.
+
+        LON and LAT are float64 columns, null where the CSV has no number,
+        and a WKB point geometry column is added. Return parquet_path, or
+        None if pyarrow is not available.
+    '''
+    if pyarrow is None:
+        _L.debug('Skipping GeoParquet output without pyarrow')
+        return None
+
+    with open(csv_path, 'r', encoding='utf8') as file:
+        rows = DictReader(file)
+        fieldnames = rows.fieldnames or []
+        schema = _make_schema(fieldnames)
+
+        with pyarrow.parquet.ParquetWriter(parquet_path, schema, compression='zstd') as writer:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == ROW_GROUP_SIZE:
+                    writer.write_table(_make_table(schema, fieldnames, batch))
+                    batch = []
+
+            if batch:
+                writer.write_table(_make_table(schema, fieldnames, batch))
+
+    return parquet_path
+
+def open_parquet(path):
+    ''' Open a local GeoParquet file, or return None if it can't be read.
+    '''
+    if pyarrow is None or not exists(path):
+        return None
+
+    return pyarrow.parquet.ParquetFile(path)
+
+def open_zipped_parquet(zip_file):
+    ''' Open the GeoParquet file in a processed zip archive.
+
+        Return a tuple with the member name and a pyarrow ParquetFile, or
+        None if there's no such member or it can't be read. Members stored
+        without compression are memory-mapped in place instead of copied.
+    '''
+    if pyarrow is None:
+        return None
+
+    infos = [info for info in zip_file.infolist() if splitext(info.filename)[1] == '.parquet']
+
+    if not infos:
+        return None
+
+    info = infos[0]
+
+    if info.compress_type == zipfile.ZIP_STORED and zip_file.filename and exists(zip_file.filename):
+        with open(zip_file.filename, 'rb') as file:
+            # Skip the local file header to find the start of member data.
+            file.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', file.read(30)[26:30])
+
+        offset = info.header_offset + 30 + name_length + extra_length
+        mapped = pyarrow.memory_map(zip_file.filename)
+        buffer = mapped.read_at(info.file_size, offset)
+    else:
+        buffer = pyarrow.py_buffer(zip_file.read(info.filename))
+
+    return info.filename, pyarrow.parquet.ParquetFile(pyarrow.BufferReader(buffer))
+
+def iterate_lonlats(parquet_file):
+    ''' Generate (lon, lat) tuples from a GeoParquet file, None where missing.
+    '''
+    for batch in parquet_file.iter_batches(batch_size=ROW_GROUP_SIZE, columns=['LON', 'LAT']):
+        yield from zip(batch.column(0).to_pylist(), batch.column(1).to_pylist())
+
+def iterate_rows(parquet_file):
+    ''' Generate (lon, lat, row) tuples from a GeoParquet file.
+
+        Lon and lat are floats or None, and row is a dictionary of strings
+        exactly as it would be read from the processed CSV file.
+    '''
+    names = [name for name in parquet_file.schema_arrow.names if name != GEOMETRY_COLUMN]
+
+    for batch in parquet_file.iter_batches(batch_size=ROW_GROUP_SIZE, columns=names):
+        columns = [batch.column(name).to_pylist() for name in names]
+
+        for values in zip(*columns):
+            row = dict(zip(names, values))
+            lon, lat = row.get('LON'), row.get('LAT')
+
+            for name in ('LON', 'LAT'):
+                if name in row:
+                    value = row[name]
+                    row[name] = '' if value is None else COORDINATE_FORMAT % value
+
+            yield lon, lat, row
@@ -12,7 +12,7 @@ from . import config
 
 from shapely.geometry import shape
 from shapely.wkt import loads, dumps
-from openaddr.conform import conform_smash_case, row_transform_and_convert
+from openaddr.conform import conform_smash_case, compile_conform_transform
 
 _L = logging.getLogger('openaddr.parcels')
 
@@ -66,16 +66,30 @@ def to_shapely_obj(data):
     return None
 
 
+_conform_transform_cache = {}
+def get_conform_transform(source):
+    """
+    Return a compiled conform transform for a source, reading it just once.
+    """
+    path = '{}/sources/{}'.format(config.openaddr_dir, source)
+
+    if path not in _conform_transform_cache:
+        with open(path) as file:
+            source_json = json.load(file)
+        cleaned_json = conform_smash_case(source_json)
+        _conform_transform_cache[path] = compile_conform_transform(cleaned_json)
+
+    return _conform_transform_cache[path]
+
+
 def scrape_fiona_metadata(obj, source):
     """
     Uses openaddress machine code to scrape metadata from a fiona object.
     """
-    with open('{}/sources/{}'.format(config.openaddr_dir, source)) as file:
-        source_json = json.load(file)
-    cleaned_json = conform_smash_case(source_json)
+    transform = get_conform_transform(source)
     cleaned_prop = {k: str(v or '') for (k, v) in  obj['properties'].items()}
 
-    metadata = row_transform_and_convert(cleaned_json, cleaned_prop)
+    metadata = transform(cleaned_prop)
 
     return metadata
 
@@ -86,15 +100,13 @@ def scrape_csv_metadata(row, header, source):
     """
     props = {}
 
-    with open('{}/sources/{}'.format(config.openaddr_dir, source)) as file:
-        source_json = json.load(file)
-    cleaned_json = conform_smash_case(source_json)
+    transform = get_conform_transform(source)
     for key in header:
         if key != 'OA:geom':
             props[key] = row[header.index(key)]
 
     cleaned_prop = {k: str(v or '') for (k, v) in  props.items()}
-    metadata = row_transform_and_convert(cleaned_json, cleaned_prop)
+    metadata = transform(cleaned_prop)
 
     return metadata
 
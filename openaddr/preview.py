@@ -14,6 +14,8 @@ import requests, uritemplate, mapbox_vector_tile
 
 from osgeo import osr, ogr
 
+from . import geoparquet
+
 try:
     import cairo
 except ImportError:
@@ -115,9 +117,23 @@ def get_local_filename(filename_or_url):
 
 def iterate_file_lonlats(filename):
     ''' Stream (lon, lat) coordinates from an input .csv or .zip file.
+
+        Typed coordinates are read from GeoParquet data when it's available.
     '''
     suffix = os.path.splitext(filename)[1].lower()
 
+    if suffix == '.csv':
+        parquet_file = geoparquet.open_parquet(geoparquet.get_parquet_path(filename))
+    elif suffix == '.zip':
+        with ZipFile(filename) as zip:
+            _, parquet_file = geoparquet.open_zipped_parquet(zip) or (None, None)
+
+    if parquet_file is not None:
+        for (lon, lat) in geoparquet.iterate_lonlats(parquet_file):
+            if lon is not None and lat is not None and -180 <= lon <= 180 and -90 <= lat <= 90:
+                yield (lon, lat)
+        return
+
     if suffix == '.csv':
         open_file = open(filename, 'r')
     elif suffix == '.zip':
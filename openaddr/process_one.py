@@ -5,13 +5,13 @@ from urllib.parse import urlparse
 from os.path import join, basename, dirname, exists, splitext, relpath
 from shutil import copy, move, rmtree
 from argparse import ArgumentParser
-from os import mkdir, rmdir, close, chmod
+from os import mkdir, rmdir, close, chmod, environ
 from _thread import get_ident
 import tempfile, json, csv, sys, enum
 import threading
 
-from . import util, cache, conform, preview, slippymap, CacheResult, ConformResult, __version__
-from .cache import DownloadError
+from . import util, cache, conform, preview, slippymap, geoparquet, CacheResult, ConformResult, __version__
+from .cache import DownloadError, DownloadCache, DOWNLOAD_CACHE_BYTES
 from .conform import check_source_tests
 
 from esridump.errors import EsriDownloadError
@@ -51,7 +51,7 @@ def boolstr(value):
 
     raise ValueError(repr(value))
 
-def process(source, destination, layer, layersource, do_preview, mapbox_key=None, extras=dict()):
+def process(source, destination, layer, layersource, do_preview, mapbox_key=None, extras=dict(), workers=1, download_cache=None, extract_path=None):
     ''' Process a single source and destination, return path to JSON state file.
 
         Creates a new directory and files under destination.
@@ -115,7 +115,7 @@ def process(source, destination, layer, layersource, do_preview, mapbox_key=None
 
                 # Cache source data.
                 try:
-                    cache_result = cache(layer + '-' + data_source['name'], data_source, temp_dir, extras)
+                    cache_result = cache(layer + '-' + data_source['name'], data_source, temp_dir, extras, download_cache, workers)
                 except EsriDownloadError as e:
                     _L.warning('Could not download ESRI source data: {}'.format(e))
                     raise
@@ -129,13 +129,17 @@ def process(source, destination, layer, layersource, do_preview, mapbox_key=None
                     _L.info(u'Cached data in {}'.format(cache_result.cache))
 
                     # Conform cached source data.
-                    conform_result = conform(layer + '-' + data_source['name'], data_source, temp_dir, cache_result.todict())
+                    conform_result = conform(layer + '-' + data_source['name'], data_source, temp_dir, cache_result.todict(), workers, extract_path)
 
                     if not conform_result.path:
                         _L.warning('Nothing processed')
                     else:
                         _L.info('Processed data in {}'.format(conform_result.path))
 
+                        parquet_path = render_parquet(conform_result.path)
+                        if parquet_path:
+                            _L.info('GeoParquet data in {}'.format(parquet_path))
+
                         if do_preview and mapbox_key:
                             preview_path = render_preview(conform_result.path, temp_dir, mapbox_key)
 
@@ -194,12 +198,22 @@ def render_preview(csv_filename, temp_dir, mapbox_key):
 
     return png_filename
 
+def render_parquet(csv_filename):
+    ''' Write GeoParquet data alongside csv_filename, if pyarrow is available.
+    '''
+    try:
+        parquet_filename = geoparquet.get_parquet_path(csv_filename)
+        return geoparquet.write_parquet(csv_filename, parquet_filename)
+    except Exception as e:
+        _L.error('%s in render_parquet: %s', type(e), e)
+        return None
+
 def render_slippymap(csv_filename, temp_dir):
     '''
     '''
     try:
         mbtiles_filename = join(temp_dir, 'slippymap.mbtiles')
-        slippymap.generate(mbtiles_filename, csv_filename)
+        slippymap.generate(mbtiles_filename, csv_filename, input_format='geojson', temp_dir=temp_dir)
     except Exception as e:
         _L.error('%s in render_slippymap: %s', type(e), e)
         return None
@@ -296,7 +310,7 @@ def write_state(source, layer, data_source_name, skipped, destination, log_handl
         scheme, _, cache_path1, _, _, _ = urlparse(cache_result.cache)
         if scheme in ('file', ''):
             cache_path2 = join(statedir, 'cache{1}'.format(*splitext(cache_path1)))
-            copy(cache_path1, cache_path2)
+            util.link_or_copy(cache_path1, cache_path2)
             state_cache = relpath(cache_path2, statedir)
         else:
             state_cache = cache_result.cache
@@ -306,7 +320,11 @@ def write_state(source, layer, data_source_name, skipped, destination, log_handl
     if conform_result.path:
         _, _, processed_path1, _, _, _ = urlparse(conform_result.path)
         processed_path2 = join(statedir, 'out{1}'.format(*splitext(processed_path1)))
-        copy(processed_path1, processed_path2)
+        util.link_or_copy(processed_path1, processed_path2)
+
+        parquet_path1 = geoparquet.get_parquet_path(processed_path1)
+        if exists(parquet_path1):
+            util.link_or_copy(parquet_path1, geoparquet.get_parquet_path(processed_path2))
 
     # Write the sample data to a sample.json file
     if conform_result.sample:
@@ -348,6 +366,7 @@ def write_state(source, layer, data_source_name, skipped, destination, log_handl
         ('license', conform_result.license),
         ('geometry type', conform_result.geometry_type),
         ('address count', conform_result.address_count),
+        ('address stats', conform_result.stats and conform_result.stats.todict()),
         ('version', cache_result.version),
         ('fingerprint', cache_result.fingerprint),
         ('cache time', cache_result.elapsed and str(cache_result.elapsed)),
@@ -366,7 +385,10 @@ def write_state(source, layer, data_source_name, skipped, destination, log_handl
 
     with open(join(statedir, 'index.txt'), 'w', encoding='utf8') as file:
         out = csv.writer(file, dialect='excel-tab')
-        for row in zip(*state):
+        # Nested values like address stats are written as JSON.
+        txt_state = [(key, json.dumps(value) if isinstance(value, dict) else value)
+                     for (key, value) in state]
+        for row in zip(*txt_state):
             out.writerow(row)
 
     with open(join(statedir, 'index.json'), 'w') as file:
@@ -396,6 +418,18 @@ parser.add_argument('--skip-preview', help="Don't render a map preview",
 parser.add_argument('--mapbox-key', dest='mapbox_key',
                     help='Mapbox API Key. See: https://mapbox.com/')
 
+parser.add_argument('--workers', help='Number of processes to use for converting ESRI features and conforming rows. Default 1.',
+                    type=int, dest='workers', default=1)
+
+parser.add_argument('--extract-path', help='Optional file name to keep extracted source rows in as CSV, for debugging conform.',
+                    dest='extract_path', default=None)
+
+parser.add_argument('--download-cache', help='Optional directory of downloaded files to reuse across runs. Defaults to DOWNLOAD_CACHE_DIR environment variable.',
+                    dest='download_cache', default=environ.get('DOWNLOAD_CACHE_DIR', None))
+
+parser.add_argument('--download-cache-size', help='Size in bytes of download cache directory. Defaults to DOWNLOAD_CACHE_SIZE environment variable or {}.'.format(DOWNLOAD_CACHE_BYTES),
+                    type=int, dest='download_cache_size', default=environ.get('DOWNLOAD_CACHE_SIZE', DOWNLOAD_CACHE_BYTES))
+
 parser.add_argument('-l', '--logfile', help='Optional log file name.')
 
 parser.add_argument('-v', '--verbose', help='Turn on verbose logging',
@@ -417,8 +451,13 @@ def main():
     # Allow CSV files with very long fields
     csv.field_size_limit(sys.maxsize)
 
+    if args.download_cache:
+        download_cache = DownloadCache(args.download_cache, args.download_cache_size)
+    else:
+        download_cache = None
+
     try:
-        processed_path = process(args.source, args.destination, args.layer, args.layersource, args.render_preview, mapbox_key=args.mapbox_key)
+        processed_path = process(args.source, args.destination, args.layer, args.layersource, args.render_preview, mapbox_key=args.mapbox_key, workers=args.workers, download_cache=download_cache, extract_path=args.extract_path)
     except Exception as e:
         _L.error(e, exc_info=True)
         return 1
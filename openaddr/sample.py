@@ -1,65 +1,91 @@
 from __future__ import absolute_import, division, print_function
 
 import json, ijson
-from itertools import chain
+from decimal import Decimal
+from importlib import import_module
 
-def _build_value(data):
-    ''' Build a value (number, array, whatever) from an ijson stream.
-    '''
-    for (prefix, event, value) in data:
-        if event in ('string', 'null', 'boolean'):
-            return value
+def _load_ijson_backend():
+    ''' Return the fastest available ijson backend.
 
-        elif event == 'number':
-            return int(value) if (int(value) == float(value)) else float(value)
+        The C and YAJL backends build whole items natively, and are many times
+        faster than the pure-Python backend used by default in older ijson.
+    '''
+    for name in ('yajl2_c', 'yajl2_cffi', 'yajl2'):
+        try:
+            return import_module('ijson.backends.{}'.format(name))
+        except ImportError:
+            continue
 
-        elif event == 'start_array':
-            return _build_list(data)
+    return ijson
 
-        elif event == 'start_map':
-            return _build_map(data)
+ijson_backend = _load_ijson_backend()
 
-        else:
-            # MOOP.
-            raise ValueError((prefix, event, value))
+class _EncodedStream:
+    ''' Wrap a text stream so it reads as UTF-8 bytes for ijson.
+    '''
+    def __init__(self, stream):
+        self.stream = stream
 
-def _build_list(data):
-    ''' Build a list from an ijson stream.
+    def read(self, size=-1):
+        return self.stream.read(size).encode('utf8')
 
-        Stop when 'end_array' is reached.
+class _PeekedStream:
+    ''' Wrap a binary stream to replay bytes already read from its start.
     '''
-    output = list()
+    def __init__(self, head, stream):
+        self.head, self.stream = head, stream
 
-    for (prefix, event, value) in data:
-        if event == 'end_array':
-            break
+    def read(self, size=-1):
+        if not self.head:
+            return self.stream.read(size)
 
+        if size < 0:
+            data, self.head = self.head + self.stream.read(), b''
         else:
-            # let _build_value() handle the array item.
-            _data = chain([(prefix, event, value)], data)
-            output.append(_build_value(_data))
+            data, self.head = self.head[:size], self.head[size:]
+
+        return data
 
-    return output
+def _binary_stream(stream):
+    if isinstance(stream.read(0), bytes):
+        return stream
 
-def _build_map(data):
-    ''' Build a dictionary from an ijson stream.
+    return _EncodedStream(stream)
 
-        Stop when 'end_map' is reached.
+def _object_stream(stream):
+    ''' Return a binary stream after checking that its root JSON value is an object.
+
+        Only leading whitespace and the first byte are read, so this is as
+        cheap as peeking at the first parse event for "start_map".
     '''
-    output = dict()
+    stream, head = _binary_stream(stream), b''
+
+    while True:
+        byte = stream.read(1)
+        head += byte
 
-    for (prefix, event, value) in data:
-        if event == 'end_map':
+        if not byte.isspace():
             break
 
-        elif event == 'map_key':
-            output[value] = _build_value(data)
+    if byte != b'{':
+        # A root GeoJSON object is a map.
+        raise ValueError('Expected a GeoJSON object, found {}'.format(repr(byte) if byte else 'nothing'))
 
-        else:
-            # MOOP.
-            raise ValueError((prefix, event, value))
+    return _PeekedStream(head, stream)
+
+def _convert_value(value):
+    ''' Convert ijson Decimal numbers in a value to int or float.
+    '''
+    if isinstance(value, dict):
+        return {key: _convert_value(item) for (key, item) in value.items()}
 
-    return output
+    elif isinstance(value, list):
+        return [_convert_value(item) for item in value]
+
+    elif isinstance(value, Decimal):
+        return int(value) if (int(value) == float(value)) else float(value)
+
+    return value
 
 def sample_geojson(stream, max_features):
     ''' Read a stream of input GeoJSON and return a string with a limited feature count.
@@ -76,35 +102,11 @@ def sample_geojson(stream, max_features):
     return json.dumps(geojson)
 
 def stream_geojson(stream):
-    '''
-    '''
-    data = ijson.parse(stream)
-
-    for (prefix1, event1, value1) in data:
-        if event1 != 'start_map':
-            # A root GeoJSON object is a map.
-            raise ValueError((prefix1, event1, value1))
-
-        for (prefix2, event2, value2) in data:
-            if event2 == 'map_key' and value2 == 'type':
-                prefix3, event3, value3 = next(data)
+    ''' Yield each feature of a GeoJSON feature collection in a stream.
 
-                if event3 != 'string' and value3 != 'FeatureCollection':
-                    # We only want GeoJSON feature collections
-                    raise ValueError((prefix3, event3, value3))
-
-            elif event2 == 'map_key' and value2 == 'features':
-                prefix4, event4, value4 = next(data)
-
-                if event4 != 'start_array':
-                    # We only want lists of features here.
-                    raise ValueError((prefix4, event4, value4))
-
-                for (prefix5, event5, value5) in data:
-                    if event5 == 'end_array':
-                        break
-
-                    # let _build_value() handle the feature.
-                    _data = chain([(prefix5, event5, value5)], data)
-                    feature = _build_value(_data)
-                    yield feature
+        Features are built whole by ijson and numbers are converted
+        to int or float, so each one is ready for json.dumps(). Raises
+        ValueError if the stream doesn't hold a JSON object.
+    '''
+    for feature in ijson_backend.items(_object_stream(stream), 'features.item'):
+        yield _convert_value(feature)
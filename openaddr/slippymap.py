@@ -4,18 +4,44 @@ import logging; _L = logging.getLogger('openaddr.slippymap')
 from zipfile import ZipFile
 from io import TextIOWrapper
 from csv import DictReader
-from tempfile import gettempdir, mkstemp
+from tempfile import gettempdir, mkstemp, mkdtemp
 from argparse import ArgumentParser
 from urllib.parse import urlparse
-import os, subprocess, json
+from shutil import rmtree
+import os, subprocess, json, csv
 import requests
 
-def generate(mbtiles_filename, *filenames_or_urls):
+from . import geoparquet
+
+# Ways to feed tippecanoe: GeoJSON text over stdin, or input files of
+# line-delimited GeoJSON read in parallel, or of CSV with no JSON to parse.
+TIPPECANOE_INPUTS = 'stdin', 'geojson', 'csv'
+
+def generate(mbtiles_filename, *filenames_or_urls, input_format='stdin', temp_dir=None):
     '''
     '''
+    if input_format not in TIPPECANOE_INPUTS:
+        raise ValueError('Unknown tippecanoe input: {}'.format(input_format))
+
     cmd = 'tippecanoe', '-l', 'dots', '-r', '3', \
           '-n', 'OpenAddresses Dots', '-f', \
-          '-t', gettempdir(), '-o', mbtiles_filename
+          '-t', temp_dir or gettempdir(), '-o', mbtiles_filename
+
+    if input_format != 'stdin':
+        dirname = mkdtemp(prefix='slippymap-', dir=temp_dir)
+
+        try:
+            input_filenames = [
+                write_input_file(iterate_file_features(get_local_filename(filename_or_url)), dirname, input_format)
+                for filename_or_url in filenames_or_urls
+                ]
+
+            tippecanoe = subprocess.Popen(cmd + tippecanoe_input_args(input_filenames))
+            tippecanoe.wait()
+        finally:
+            rmtree(dirname)
+
+        return
 
     tippecanoe = subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=1)
 
@@ -29,6 +55,47 @@ def generate(mbtiles_filename, *filenames_or_urls):
     tippecanoe.stdin.close()
     tippecanoe.wait()
 
+def tippecanoe_input_args(input_filenames):
+    ''' Return tippecanoe arguments to read a list of input files.
+
+        Line-delimited GeoJSON files are read in parallel with --read-parallel.
+    '''
+    if input_filenames and all(name.endswith('.geojson') for name in input_filenames):
+        return ('--read-parallel', ) + tuple(input_filenames)
+
+    return tuple(input_filenames)
+
+def write_input_file(features, dirname, input_format):
+    ''' Write GeoJSON features to a new tippecanoe input file, return its name.
+
+        CSV files have LON and LAT columns, followed by feature properties.
+    '''
+    suffix = '.csv' if input_format == 'csv' else '.geojson'
+    handle, filename = mkstemp(prefix='input-', suffix=suffix, dir=dirname)
+    os.close(handle)
+
+    with open(filename, 'w', encoding='utf8', newline='') as file:
+        if input_format != 'csv':
+            for feature in features:
+                file.write(json.dumps(feature) + '\n')
+            return filename
+
+        rows = None
+
+        for feature in features:
+            if rows is None:
+                fieldnames = ['LON', 'LAT'] + list(feature['properties'].keys())
+                rows = csv.DictWriter(file, fieldnames, extrasaction='ignore')
+                rows.writeheader()
+
+            lon, lat = feature['geometry']['coordinates']
+            rows.writerow(dict(feature['properties'], LON=repr(lon), LAT=repr(lat)))
+
+        if rows is None:
+            csv.writer(file).writerow(['LON', 'LAT'])
+
+    return filename
+
 def get_local_filename(filename_or_url):
     '''
     '''
@@ -54,9 +121,25 @@ def get_local_filename(filename_or_url):
 
 def iterate_file_features(filename):
     ''' Stream GeoJSON features from an input .csv or .zip file.
+
+        Rows are read from GeoParquet data when it's available.
     '''
     suffix = os.path.splitext(filename)[1].lower()
 
+    if suffix == '.csv':
+        parquet_file = geoparquet.open_parquet(geoparquet.get_parquet_path(filename))
+    elif suffix == '.zip':
+        with ZipFile(filename) as zip:
+            _, parquet_file = geoparquet.open_zipped_parquet(zip) or (None, None)
+
+    if parquet_file is not None:
+        for (lon, lat, row) in geoparquet.iterate_rows(parquet_file):
+            if lon is not None and lat is not None and -180 <= lon <= 180 and -90 <= lat <= 90:
+                geometry = dict(type='Point', coordinates=[lon, lat])
+                properties = {k: v for (k, v) in row.items() if k not in ('LON', 'LAT')}
+                yield dict(type='Feature', geometry=geometry, properties=properties)
+        return
+
     if suffix == '.csv':
         open_file = open(filename, 'r')
     elif suffix == '.zip':
@@ -95,11 +178,14 @@ parser.add_argument('-q', '--quiet', help='Turn off most logging',
                     action='store_const', dest='loglevel',
                     const=logging.WARNING, default=logging.INFO)
 
+parser.add_argument('--tippecanoe-input', help='How to feed features to Tippecanoe, one of {}. Defaults to "stdin".'.format(', '.join(TIPPECANOE_INPUTS)),
+                    dest='tippecanoe_input', choices=TIPPECANOE_INPUTS, default='stdin')
+
 def main():
     args = parser.parse_args()
     from .ci import setup_logger
     setup_logger(None, None, log_level=args.loglevel)
-    generate(args.mbtiles_filename, *args.src_filenames)
+    generate(args.mbtiles_filename, *args.src_filenames, input_format=args.tippecanoe_input)
 
 if __name__ == '__main__':
     exit(main())
@@ -23,6 +23,7 @@ import sys
 import os
 import csv
 import logging
+import hashlib
 from os import close, environ, mkdir, remove
 from io import BytesIO
 from csv import DictReader
@@ -53,8 +54,8 @@ from .. import (
 
 from ..util import package_output
 from ..ci.objects import Run, RunState
-from ..cache import CacheResult
-from ..conform import ConformResult
+from ..cache import CacheResult, DownloadCache
+from ..conform import ConformResult, ConformStats
 from ..process_one import find_source_problem, SourceProblem
 
 def touch_first_arg_file(path, *args, **kwargs):
@@ -1773,12 +1774,15 @@ class TestState (unittest.TestCase):
         with open(join(self.output_dir, 'slippymap.mbtiles'), 'w') as file:
             slippymap_path = file.name
 
+        conform_stats = ConformStats()
+        conform_stats.add_row({'LON': '-122.25', 'LAT': '37.8', 'NUMBER': '', 'STREET': 'Main St'})
+
         conform_result = ConformResult(processed=None, sample='/tmp/sample.json',
                                        website='http://example.com', license='ODbL',
                                        geometry_type='Point', address_count=999,
                                        path=processed_path, elapsed=timedelta(seconds=1),
                                        attribution_flag=True, attribution_name='Example',
-                                       sharealike_flag=True)
+                                       sharealike_flag=True, stats=conform_stats)
 
         cache_result = CacheResult(cache='http://example.com/cache.csv',
                                    fingerprint='ff9900', version='0.0.0',
@@ -1807,6 +1811,13 @@ class TestState (unittest.TestCase):
         self.assertEqual(state1['license'], 'ODbL')
         self.assertEqual(state1['geometry type'], 'Point')
         self.assertEqual(state1['address count'], 999)
+        self.assertEqual(state1['address stats'], dict(row_count=1, invalid_latlon_count=0,
+                         missing_number_count=1, missing_street_count=0, bbox=[-122.25, 37.8, -122.25, 37.8]))
+
+        with open(join(dirname(path1), 'index.txt'), encoding='utf8') as file:
+            state1_txt = dict(zip(*csv.reader(file, dialect='excel-tab')))
+
+        self.assertEqual(json.loads(state1_txt['address stats']), state1['address stats'])
         self.assertEqual(state1['version'], '0.0.0')
         self.assertEqual(state1['fingerprint'], 'ff9900')
         self.assertEqual(state1['cache time'], '0:00:02')
@@ -1852,6 +1863,18 @@ class TestState (unittest.TestCase):
         self.assertIs(RunState({'source problem': find_source_problem('WARNING: A source test failed', {})}).source_problem, SourceProblem.test_failed)
         self.assertIs(RunState({'source problem': find_source_problem('WARNING: Found no addresses in source data', {})}).source_problem, SourceProblem.no_addresses_found)
 
+    def test_process_one_extract_path(self):
+        '''
+        '''
+        argv = ['openaddr-process-one', 'source.json', 'destination', '--extract-path', 'extracted.csv']
+
+        with mock.patch('openaddr.process_one.process') as process, \
+             mock.patch('openaddr.jobs.setup_logger'), mock.patch('sys.argv', argv):
+            process.return_value = 'destination/index.json'
+            self.assertEqual(process_one.main(), 0)
+
+        self.assertEqual(process.mock_calls[0][2]['extract_path'], 'extracted.csv')
+
 class TestPackage (unittest.TestCase):
 
     def test_package_output_csv(self):
@@ -1947,6 +1970,116 @@ class TestPackage (unittest.TestCase):
             self.assertEqual(local_processed_result2.run_state.processed, state3['processed'])
             self.assertEqual(local_processed_result2.run_state.license, state3['license'])
 
+    def test_iterate_local_processed_files_cache(self):
+        contents = {'http://s3.amazonaws.com/openaddresses/123.zip': b'123' * 100,
+                    'http://s3.amazonaws.com/openaddresses/456.zip': b'456' * 100,
+                    'http://s3.amazonaws.com/openaddresses/789.zip': b'789' * 100}
+
+        state1 = {'processed': 'http://s3.amazonaws.com/openaddresses/123.zip', 'process hash': hashlib.md5(b'123' * 100).hexdigest()}
+        state2 = {'processed': 'http://s3.amazonaws.com/openaddresses/456.zip', 'process hash': 'not the hash'}
+        state3 = {'processed': 'http://s3.amazonaws.com/openaddresses/789.zip'}
+
+        runs = [
+            Run(123, 'sources/123.json', 'abc', b'', None,
+                RunState(state1), None, None, None, None, None, None, None, None),
+            Run(456, 'sources/456.json', 'def', b'', None,
+                RunState(state2), None, None, None, None, None, None, None, None),
+            Run(789, 'sources/789.json', 'ghi', b'', None,
+                RunState(state3), None, None, None, None, None, None, None, None),
+            ]
+
+        downloaded_urls = list()
+
+        def _download_processed_file(url):
+            downloaded_urls.append(url)
+            handle, filename = tempfile.mkstemp(prefix='processed-', suffix='.zip')
+            with open(handle, 'wb') as file:
+                file.write(contents[url])
+            return filename
+
+        cache_dir = tempfile.mkdtemp(prefix='test_iterate_local_processed_files_cache-')
+
+        try:
+            for i in range(2):
+                # Each pass uses a new cache object, as a new process would.
+                processed_cache = DownloadCache(cache_dir)
+
+                with mock.patch('openaddr.download_processed_file') as download_processed_file:
+                    download_processed_file.side_effect = _download_processed_file
+
+                    for result in iterate_local_processed_files(runs, 'source_path', processed_cache):
+                        self.assertEqual(splitext(result.filename)[1], '.zip')
+                        with open(result.filename, 'rb') as file:
+                            self.assertEqual(file.read(), contents[result.run_state.processed])
+
+            # Only the file matching its process hash was cached.
+            self.assertEqual(downloaded_urls, [state1['processed'], state2['processed'], state3['processed'],
+                                               state2['processed'], state3['processed']])
+            self.assertEqual(os.listdir(join(cache_dir, 'objects')), [state1['process hash']])
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_iterate_local_processed_files_prefetch(self):
+        import requests, time
+        runs = [Run(id, 'sources/{}.json'.format(id), None, b'', None,
+                    RunState({'processed': 'http://s3.amazonaws.com/openaddresses/{}.zip'.format(id)}),
+                    None, None, None, None, None, None, None, None)
+                for id in range(100, 108)]
+
+        lock, downloading, filenames = Lock(), [0, 0], list()
+
+        def _download_processed_file(url):
+            with lock:
+                downloading[0] += 1
+                downloading[1] = max(downloading)
+
+            time.sleep(.05)
+
+            with lock:
+                downloading[0] -= 1
+
+            if url.endswith('/101.zip'):
+                raise requests.exceptions.HTTPError('HTTP 404 Not Found', response=FakeResponse(404))
+            elif url.endswith('/102.zip'):
+                raise IOError('Bad news')
+
+            handle, filename = tempfile.mkstemp(prefix='processed-', suffix='.zip')
+            with open(handle, 'w') as file:
+                file.write(url)
+            filenames.append(filename)
+            return filename
+
+        with mock.patch('openaddr.download_processed_file') as download_processed_file:
+            download_processed_file.side_effect = _download_processed_file
+
+            # Order and skipped files are the same as downloading one at a time.
+            for prefetch in (1, 3):
+                downloading[1], results = 0, list()
+
+                for result in iterate_local_processed_files(runs, 'source_path', prefetch=prefetch):
+                    with open(result.filename) as file:
+                        self.assertEqual(file.read(), result.run_state.processed)
+                    results.append(result.source_base)
+
+                self.assertEqual(results, ['100', '103', '104', '105', '106', '107'])
+                self.assertLessEqual(downloading[1], prefetch)
+                self.assertEqual(downloading[1] > 1, prefetch > 1)
+
+            # Files waiting on disk are limited by size.
+            downloading[1] = 0
+            results = list(iterate_local_processed_files(runs, 'source_path', prefetch=3, prefetch_bytes=1))
+            self.assertEqual(len(results), 6)
+            self.assertLessEqual(downloading[1], 3)
+
+            # Downloaded files are removed when iteration stops early.
+            del filenames[:]
+            local_processed_files = iterate_local_processed_files(runs, 'source_path', prefetch=4)
+            self.assertEqual(next(local_processed_files).source_base, '100')
+            local_processed_files.close()
+
+            self.assertEqual(len(filenames), 2)
+            self.assertEqual([filename for filename in filenames if exists(filename)], [])
+
     def test_download_processed_file_csv(self):
         with mock.patch('openaddr.S3') as s3:
             fake_s3 = mock.MagicMock()
@@ -2,17 +2,28 @@ from __future__ import absolute_import, division, print_function
 
 from urllib.parse import urlparse, parse_qs
 from os.path import join, dirname
+from io import BytesIO
+from hashlib import md5
 
+import os
+import csv
+import json
+import time
 import shutil
 import mimetypes
 
 from mock import patch
 from esridump.errors import EsriDownloadError
+from urllib3.exceptions import ProtocolError
 import unittest
 import httmock
 import tempfile
 
-from ..cache import guess_url_file_extension, EsriRestDownloadTask
+from ..cache import (
+    guess_url_file_extension, EsriRestDownloadTask, URLDownloadTask,
+    DownloadError, DownloadCache, compare_cache_details, plan_esri_pages,
+    fetch_esri_page
+    )
 
 class TestCacheExtensionGuessing (unittest.TestCase):
 
@@ -93,6 +104,133 @@ class TestCacheEsriDownload (unittest.TestCase):
                     # This is the expected exception at this point
                     self.assertEqual(e.message, "Could not find object ID field name for deduplication")
 
+    def test_download_concurrent_pages(self):
+        """ ESRI Caching Will Write Concurrently-Fetched Pages In Order """
+        data_dirname = join(dirname(__file__), 'data')
+
+        with open(join(data_dirname, 'us-ca-carson-metadata.json')) as file:
+            metadata = json.load(file)
+            metadata.update(supportsPagination=True, maxRecordCount=2)
+
+        with open(join(data_dirname, 'us-ca-carson-0.json')) as file:
+            page = json.load(file)
+            features = page['features']
+
+        def response_content(url, request):
+            ''' Recorded ArcGIS responses, with later pages returned sooner.
+            '''
+            if url.path == '/arcgis/rest/services/Carson/MapServer/1':
+                return httmock.response(200, metadata)
+
+            if parse_qs(url.query).get('returnCountOnly') == ['true']:
+                return httmock.response(200, {'count': len(features)})
+
+            offset = int(parse_qs(request.body)['resultOffset'][0])
+            time.sleep(.02 * (len(features) - offset))
+            return httmock.response(200, dict(page, features=features[offset:offset + 2]))
+
+        contents = []
+
+        for workers in (1, 2):
+            workdir = tempfile.mkdtemp(dir=self.workdir)
+            task = EsriRestDownloadTask('us-ca-carson', workers=workers)
+
+            with httmock.HTTMock(response_content):
+                (path, ) = task.download(['http://fake-esri.local/arcgis/rest/services/Carson/MapServer/1'], workdir)
+
+            with open(path) as file:
+                contents.append(file.read())
+
+        self.assertEqual(contents[0], contents[1])
+
+        with open(path) as file:
+            addresses = [row['ADDRESS'] for row in csv.DictReader(file)]
+
+        # One recorded feature without a geometry is skipped.
+        self.assertEqual(addresses, [feature['attributes']['ADDRESS'] for feature in features if 'geometry' in feature])
+
+    def test_plan_esri_pages(self):
+        """ ESRI Pages Are Sized By The Layer maxRecordCount, Up To A Limit """
+        layer_url = 'http://fake-esri.local/arcgis/rest/services/Fake/MapServer/0'
+
+        def response_content(url, request):
+            ''' Fake ArcGIS object ID queries.
+            '''
+            self.assertEqual(url.path, '/arcgis/rest/services/Fake/MapServer/0/query')
+            query = parse_qs(url.query)
+
+            if 'outStatistics' in query:
+                return httmock.response(200, {'features': [{'attributes': {'THE_MIN': 1, 'THE_MAX': 4500}}]})
+
+            if query['where'] == ['OBJECTID = 1 OR OBJECTID = 4500']:
+                return httmock.response(200, {'objectIds': [1, 4500]})
+
+            if query['where'] == ['1=1'] and query['returnIdsOnly'] == ['true']:
+                return httmock.response(200, {'objectIds': list(range(1200, 0, -1))})
+
+            raise NotImplementedError(url.geturl())
+
+        with httmock.HTTMock(response_content):
+            pages1 = plan_esri_pages(layer_url, {'supportsPagination': True, 'maxRecordCount': 2000}, 5000)
+            pages2 = plan_esri_pages(layer_url, {'advancedQueryCapabilities': {'supportsPagination': True}}, 5000)
+            pages3 = plan_esri_pages(layer_url, {'objectIdField': 'OBJECTID', 'supportsStatistics': True, 'maxRecordCount': 2000}, None)
+            pages4 = plan_esri_pages(layer_url, {'fields': [{'name': 'FID', 'type': 'esriFieldTypeOID'}], 'maxRecordCount': 1000}, None)
+
+        # Large maxRecordCount values are capped like EsriDumper.
+        self.assertEqual([(page['resultOffset'], page['resultRecordCount']) for page in pages1],
+                         [(0, 1000), (1000, 1000), (2000, 1000), (3000, 1000), (4000, 1000)])
+        self.assertEqual(pages1[0]['outFields'], '*')
+        self.assertEqual(pages1[0]['f'], 'json')
+
+        # Layers without maxRecordCount get EsriDumper's default page size.
+        self.assertEqual(len(pages2), 10)
+        self.assertEqual(pages2[-1]['resultOffset'], 4500)
+
+        self.assertEqual([page['where'] for page in pages3], ['OBJECTID > 0 AND OBJECTID <= 1000',
+            'OBJECTID > 1000 AND OBJECTID <= 2000', 'OBJECTID > 2000 AND OBJECTID <= 3000',
+            'OBJECTID > 3000 AND OBJECTID <= 4000', 'OBJECTID > 4000 AND OBJECTID <= 4500'])
+
+        self.assertEqual([page['where'] for page in pages4], ['FID >= 1 AND FID <= 1000', 'FID >= 1001 AND FID <= 1200'])
+        self.assertEqual(plan_esri_pages(layer_url, {'supportsPagination': True}, 0), [])
+
+    def test_fetch_truncated_esri_page(self):
+        """ ESRI Pages Truncated By The Server Are Completed Or Rejected """
+        layer_url = 'http://fake-esri.local/arcgis/rest/services/Fake/MapServer/0'
+        features = [{'attributes': {'OBJECTID': oid}} for oid in range(1, 11)]
+        queries = []
+
+        def response_content(url, request):
+            ''' Fake ArcGIS server returning at most three features per request.
+            '''
+            query = parse_qs(request.body)
+            queries.append(query)
+
+            if 'resultOffset' in query:
+                offset, count = int(query['resultOffset'][0]), int(query['resultRecordCount'][0])
+                page = features[offset:offset + min(count, 3)]
+                limited = offset + len(page) < len(features)
+            else:
+                page = features[:3]
+                limited = True
+
+            return httmock.response(200, {'features': page, 'exceededTransferLimit': limited})
+
+        with httmock.HTTMock(response_content):
+            page1 = fetch_esri_page(layer_url, dict(resultOffset=2, resultRecordCount=5, where='1=1', f='json'))
+            page2 = fetch_esri_page(layer_url, dict(resultOffset=8, resultRecordCount=5, where='1=1', f='json'))
+
+            with self.assertRaises(EsriDownloadError):
+                fetch_esri_page(layer_url, dict(where='OBJECTID > 0 AND OBJECTID <= 5', f='json'))
+
+        # Truncated offset pages are continued from where they stopped.
+        self.assertEqual([feature['attributes']['OBJECTID'] for feature in page1], [3, 4, 5, 6, 7])
+        self.assertEqual([(query['resultOffset'], query['resultRecordCount']) for query in queries[:2]],
+                         [(['2'], ['5']), (['5'], ['2'])])
+
+        # The last page is short without being truncated.
+        self.assertEqual([feature['attributes']['OBJECTID'] for feature in page2], [9, 10])
+        self.assertEqual(len(queries), 4)
+
     def test_field_names_to_request(self):
         '''
         '''
@@ -135,3 +273,232 @@ class TestCacheEsriDownload (unittest.TestCase):
         conform10 = dict(street=dict(function='chain', variable='foo', functions=[dict(function='postfixed_street', field='Street'), dict(function='remove_postfix', field='foo')]))
         fields10 = EsriRestDownloadTask.field_names_to_request(conform10)
         self.assertEqual(fields10, ['Street'])
+
+class DroppedStream (BytesIO):
+    ''' Raw response body that loses its connection after the first read.
+    '''
+    def stream(self, amt, decode_content=None):
+        yield self.read(amt)
+        raise ProtocolError('Connection broken: fake')
+
+class TestCacheURLDownload (unittest.TestCase):
+
+    def setUp(self):
+        ''' Prepare a clean temporary directory, and a fake server file.
+        '''
+        self.workdir = tempfile.mkdtemp(prefix='testCache-')
+        self.content = bytes(bytearray(range(256))) * 40
+        self.ranges, self.drops = [], set()
+        self.etag = '"fake"'
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def response_content(self, url, request):
+        ''' Fake HTTP responses with byte range support for use with HTTMock.
+        '''
+        headers = {'Content-Type': 'application/zip', 'Accept-Ranges': 'bytes'}
+
+        if self.etag:
+            headers['ETag'] = self.etag
+
+        if 'Range' not in request.headers:
+            headers['Content-Length'] = str(len(self.content))
+            return httmock.response(200, self.content, headers=headers, stream=True)
+
+        self.assertEqual(request.headers.get('If-Range'), self.etag)
+        start, end = map(int, request.headers['Range'][len('bytes='):].split('-'))
+        self.ranges.append((start, end))
+
+        body = self.content[start:end + 1]
+        headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, len(self.content))
+        response = httmock.response(206, body, headers=headers, stream=True)
+
+        if start in self.drops:
+            # Lose the connection halfway through the first try.
+            self.drops.remove(start)
+            response._content, response._content_consumed = False, False
+            response.raw = DroppedStream(body[:len(body)//2])
+
+        return response
+
+    def download(self, task, workdir=None):
+        with httmock.HTTMock(self.response_content):
+            (path, ) = task.download(['http://fake-range.local/file.zip'], workdir or self.workdir)
+
+        with open(path, 'rb') as file:
+            return file.read()
+
+    def test_download_segments(self):
+        task = URLDownloadTask(None)
+        task.SEGMENT, task.RETRY_DELAY = 1000, 0
+        self.drops.update((3000, 9000))
+
+        self.assertEqual(self.download(task), self.content)
+        self.assertEqual(sorted(self.ranges), [(1000, 1999), (2000, 2999), (3000, 3999),
+            (3500, 3999), (4000, 4999), (5000, 5999), (6000, 6999), (7000, 7999),
+            (8000, 8999), (9000, 9999), (9500, 9999), (10000, 10239)])
+        self.assertEqual(os.listdir(join(self.workdir, 'http')), ['file.zip'])
+
+    def test_download_resume(self):
+        download_cache = DownloadCache(join(self.workdir, 'download-cache'))
+        task = URLDownloadTask(None, download_cache=download_cache)
+        task.SEGMENT, task.RETRIES, task.RETRY_DELAY = 4000, 0, 0
+        self.drops.update((4000, ))
+
+        with self.assertRaises(DownloadError):
+            self.download(task, tempfile.mkdtemp(dir=self.workdir))
+
+        (state_name, ) = [name for name in os.listdir(join(download_cache.path, 'partial')) if name.endswith('.json')]
+        with open(join(download_cache.path, 'partial', state_name)) as file:
+            remaining = json.load(file)['ranges']
+
+        # The last segment may have been cancelled before it started.
+        self.assertEqual(remaining[0], [6000, 7999])
+        self.assertIn(remaining[1:], ([], [[8000, 10239]]))
+
+        # A second run in a new work directory only asks for what is still missing.
+        self.ranges[:] = []
+        self.assertEqual(self.download(task, tempfile.mkdtemp(dir=self.workdir)), self.content)
+        self.assertEqual(sorted(self.ranges), [tuple(span) for span in remaining])
+        self.assertEqual([name for name in os.listdir(join(download_cache.path, 'partial'))
+                          if not name.endswith('.lock')], [])
+
+    def test_download_no_resume_without_cache(self):
+        task = URLDownloadTask(None)
+        task.SEGMENT, task.RETRIES, task.RETRY_DELAY = 4000, 0, 0
+        self.drops.update((4000, ))
+
+        with self.assertRaises(DownloadError):
+            self.download(task, tempfile.mkdtemp(dir=self.workdir))
+
+        # Without a download cache, a new work directory starts over.
+        self.ranges[:] = []
+        self.assertEqual(self.download(task, tempfile.mkdtemp(dir=self.workdir)), self.content)
+        self.assertEqual(sorted(self.ranges), [(4000, 7999), (8000, 10239)])
+
+    def test_download_no_resume_without_validator(self):
+        download_cache = DownloadCache(join(self.workdir, 'download-cache'))
+        task = URLDownloadTask(None, download_cache=download_cache)
+        task.SEGMENT, task.RETRIES, task.RETRY_DELAY = 4000, 0, 0
+        self.drops.update((4000, ))
+        self.etag = None
+
+        with self.assertRaises(DownloadError):
+            self.download(task, tempfile.mkdtemp(dir=self.workdir))
+
+        self.assertTrue(any([name.endswith('.json') for name in os.listdir(join(download_cache.path, 'partial'))]))
+
+        # The file changes, and nothing tells us so it must be fetched again.
+        self.content = bytes(bytearray(reversed(range(256)))) * 40
+        self.ranges[:] = []
+        self.assertEqual(self.download(task, tempfile.mkdtemp(dir=self.workdir)), self.content)
+        self.assertEqual(sorted(self.ranges), [(4000, 7999), (8000, 10239)])
+
+    def test_download_fingerprint(self):
+        task = URLDownloadTask(None)
+        self.content = b'\xff' * 3000000
+
+        def plain_content(url, request):
+            return httmock.response(200, self.content, headers={'Content-Type': 'application/zip'}, stream=True)
+
+        with httmock.HTTMock(plain_content):
+            (path, ) = task.download(['http://fake-range.local/file.zip'], self.workdir)
+
+        fingerprint = md5(self.content).hexdigest()
+        self.assertEqual(task.fingerprints[path], fingerprint)
+
+        # Fingerprints are the same whether streamed or read back in blocks.
+        resultdir = join(self.workdir, 'cached')
+        _, fingerprint2 = compare_cache_details(path, resultdir, {})
+        self.assertEqual(fingerprint2, fingerprint)
+
+    def test_download_truncated(self):
+        task = URLDownloadTask(None)
+        self.content = b'FAKE' * 99
+
+        def truncated_content(url, request):
+            headers = {'Content-Type': 'application/zip', 'Content-Length': '999'}
+            return httmock.response(200, self.content, headers=headers, stream=True)
+
+        with httmock.HTTMock(truncated_content):
+            with self.assertRaises(DownloadError):
+                task.download(['http://fake-range.local/file.zip'], self.workdir)
+
+class TestCacheDownloadCache (unittest.TestCase):
+
+    def setUp(self):
+        ''' Prepare clean temporary directories for downloads and the cache.
+        '''
+        self.workdir = tempfile.mkdtemp(prefix='testCache-')
+        self.cache = DownloadCache(join(self.workdir, 'cache'), max_bytes=1000)
+        self.requests = []
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir)
+
+    def response_content(self, url, request):
+        ''' Fake HTTP responses with ETags for use with HTTMock.
+        '''
+        self.requests.append((url.path, request.headers.get('If-None-Match')))
+        etag = '"{}"'.format(url.path)
+
+        if request.headers.get('If-None-Match') == etag:
+            return httmock.response(304, b'')
+
+        headers = {'Content-Type': 'application/zip', 'ETag': etag}
+        return httmock.response(200, url.path.encode('utf8') * 100, headers=headers)
+
+    def download(self, url):
+        workdir = tempfile.mkdtemp(dir=self.workdir)
+        task = URLDownloadTask('source', download_cache=self.cache)
+
+        with httmock.HTTMock(self.response_content):
+            (path, ) = task.download([url], workdir)
+
+        with open(path, 'rb') as file:
+            return file.read(), task.fingerprints.get(path)
+
+    def test_conditional_download(self):
+        content1, fingerprint1 = self.download('http://fake-cache.local/a.zip')
+        content2, fingerprint2 = self.download('http://fake-cache.local/a.zip')
+
+        self.assertEqual(content1, b'/a.zip' * 100)
+        self.assertEqual(content2, content1)
+        self.assertEqual(fingerprint2, fingerprint1)
+        self.assertEqual(fingerprint1, md5(content1).hexdigest())
+        self.assertEqual(self.requests, [('/a.zip', None), ('/a.zip', '"/a.zip"')])
+
+    def test_evicted_download(self):
+        self.download('http://fake-cache.local/a.zip')
+        os.utime(join(self.workdir, 'cache', 'objects', md5(b'/a.zip' * 100).hexdigest()), (0, 0))
+
+        # Only one 600-byte file fits in the cache, so the older one is evicted.
+        self.download('http://fake-cache.local/b.zip')
+        self.assertEqual(os.listdir(join(self.workdir, 'cache', 'objects')), [md5(b'/b.zip' * 100).hexdigest()])
+
+        self.requests[:] = []
+        content, _ = self.download('http://fake-cache.local/a.zip')
+        self.assertEqual(content, b'/a.zip' * 100)
+        self.assertEqual(self.requests, [('/a.zip', None)])
+
+    def test_partial_download(self):
+        with self.cache.partial('http://fake-cache.local/a.zip') as part_path1:
+            # Only one worker at a time gets the part file for a URL.
+            with self.cache.partial('http://fake-cache.local/a.zip') as part_path2:
+                self.assertIsNone(part_path2)
+
+            with open(part_path1, 'wb') as file:
+                file.write(b'/a.zip')
+
+        with self.cache.partial('http://fake-cache.local/b.zip') as part_path3:
+            with open(part_path3, 'wb') as file:
+                file.write(b'/b.zip')
+
+        for path in (part_path1, part_path1 + '.lock'):
+            os.utime(path, (0, 0))
+
+        # Only abandoned partial downloads are evicted.
+        self.download('http://fake-cache.local/c.zip')
+        self.assertFalse(os.path.exists(part_path1))
+        self.assertTrue(os.path.exists(part_path3))
@@ -2,19 +2,23 @@
 from __future__ import print_function
 
 from os import environ, remove, stat, close, utime
-from os.path import join, splitext
+from os.path import join, splitext, basename, relpath
 from shutil import rmtree
 from tempfile import mkdtemp, mkstemp
 from urllib.parse import parse_qsl, urlparse, urljoin
 from base64 import b64decode, b64encode
 from datetime import timedelta, datetime
-from zipfile import ZipFile
-from io import BytesIO, StringIO
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from io import BytesIO, StringIO, TextIOWrapper
 from mock import patch
 from time import sleep
 from uuid import uuid4
+from threading import Lock
+from collections import defaultdict
+from csv import DictReader
+from zlib import crc32
 
-import hmac, hashlib, mock, subprocess, gzip
+import hmac, hashlib, mock, subprocess, gzip, shutil
 import unittest, json, os, sys, itertools, logging
 
 from flask import Flask
@@ -30,7 +34,7 @@ from ..ci import (
     create_queued_job, TASK_QUEUE, DONE_QUEUE, DUE_QUEUE,
     enqueue_sources, find_batch_sources, render_set_maps, render_index_maps,
     is_merged_to_master, get_commit_info, HEARTBEAT_QUEUE, flush_heartbeat_queue,
-    get_recent_workers, load_config, get_batch_run_times, webauth, webcoverage,
+    get_recent_workers, load_config, get_batch_run_times, webauth, webcoverage, webapi,
     process_github_payload, skip_payload, is_rerun_payload, update_job_comments,
     reset_logger, CloudwatchHandler
     )
@@ -48,15 +52,18 @@ from ..ci.objects import (
 from ..ci.collect import (
     is_us_northeast, is_us_midwest, is_us_south, is_us_west, is_europe, is_asia,
     is_south_america, is_north_america, add_source_to_zipfile, CollectorPublisher,
-    prepare_collections, add_csv_to_zipfile, write_to_s3, MULTIPART_CHUNK_SIZE
+    prepare_collections, add_csv_to_zipfile, write_to_s3, MULTIPART_CHUNK_SIZE,
+    build_collections, copy_zipfile_members, collect_unchanged_sources,
+    upload_to_s3, get_s3_etag, add_manifest_column
     )
 
 from ..ci.tileindex import (
-    iterate_runs_points, iterate_point_blocks, populate_tiles, lonlat_key, Tile, Point
+    iterate_runs_points, populate_tiles, publish_tiles, index_tiles, lonlat_key, Tile,
+    split_tile, make_tile_index, lookup_tile_keyname, INDEX_TTL as TILE_INDEX_TTL
     )
 
 from ..jobs import JOB_TIMEOUT
-from ..ci.work import make_source_filename, assemble_runstate, MAGIC_OK_MESSAGE
+from ..ci.work import make_source_filename, assemble_runstate, upload_file, MAGIC_OK_MESSAGE
 from ..ci.webhooks import apply_webhooks_blueprint
 from ..ci.webdotmap import apply_dotmap_blueprint
 from ..ci.webapi import apply_webapi_blueprint
@@ -1021,7 +1028,24 @@ class TestAPI (unittest.TestCase):
     def test_tile_redirects(self):
         '''
         '''
-        got1 = self.client.get('tiles/-123/37.zip')
+        def response_content(url, request):
+            if (request.method, url.hostname, url.path) == ('GET', 'data.openaddresses.io', '/tiles/index.json'):
+                index = dict(tile_size=1.0, tiles={'-122,37': ['0', '1', '2', '30', '31', '32', '33']})
+                return response(200, json.dumps(index).encode('utf8'), headers={'Content-Type': 'application/json'})
+            raise Exception()
+
+        webapi._tile_indexes.clear()
+
+        with HTTMock(response_content):
+            got1 = self.client.get('tiles/-123/37.zip')
+            got8 = self.client.get('tiles/-121.25/37.75.zip')
+            got9 = self.client.get('tiles/-121.75/37.25.zip')
+
+        self.assertEqual(got8.status_code, 302)
+        self.assertIn('tiles/-122.0/37.0/33.zip', got8.headers['location'])
+        self.assertEqual(got9.status_code, 302)
+        self.assertIn('tiles/-122.0/37.0/0.zip', got9.headers['location'])
+
         self.assertEqual(got1.status_code, 302)
         self.assertIn('tiles/-123.0/37.0.zip', got1.headers['location'])
 
@@ -2946,6 +2970,7 @@ class TestWorker (unittest.TestCase):
         self.assertEqual(make_source_filename(u'yo/yo'), u'yo--yo.txt')
         self.assertEqual(make_source_filename(u'yó/yó'), u'yó--yó.txt')
 
+    @patch('openaddr.ci.work.os.path.getsize', mock.Mock(return_value=0))
     def test_assemble_runstate(self):
         ''' Test that assemble_runstate() puts the right values in RunState.
         '''
@@ -3812,6 +3837,79 @@ class TestQueue (unittest.TestCase):
         for key in ('set_id', 'rerun'):
             self.assertIsNone(done_data.get(key, None))
 
+class FakeMultipartBucket:
+    ''' Just enough of a boto S3 bucket for multipart uploads.
+
+        Parts are checked against their MD5 hash like S3 does, and parts
+        listed in corrupt_parts arrive damaged the first time they're sent.
+    '''
+    def __init__(self, corrupt_parts=()):
+        self.corrupt_parts = set(corrupt_parts)
+        self.attempts, self.parts, self.keys = defaultdict(int), dict(), dict()
+        self.etags, self.puts = dict(), list()
+        self.cancelled, self.lock = False, Lock()
+
+    def initiate_multipart_upload(self, keyname, headers):
+        self.keyname, self.headers = keyname, headers
+        return self
+
+    def upload_part_from_file(self, fp, part_num, md5, size):
+        data = fp.read(size)
+
+        with self.lock:
+            self.attempts[part_num] += 1
+            if part_num in self.corrupt_parts:
+                self.corrupt_parts.remove(part_num)
+                data = data[:-1] + b'?'
+
+        if hashlib.md5(data).hexdigest() != md5[0] or b64encode(hashlib.md5(data).digest()).decode('ascii') != md5[1]:
+            raise boto.exception.S3ResponseError(400, 'BadDigest')
+
+        self.parts[part_num] = data
+
+    def get_all_parts(self):
+        return list(self.parts.keys())
+
+    def complete_upload(self):
+        parts = [data for (_, data) in sorted(self.parts.items())]
+        part_hashes = b''.join(hashlib.md5(data).digest() for data in parts)
+        self.keys[self.keyname] = b''.join(parts)
+        self.etags[self.keyname] = '"{}-{}"'.format(hashlib.md5(part_hashes).hexdigest(), len(parts))
+
+    def cancel_upload(self):
+        self.cancelled = True
+
+    def new_key(self, keyname):
+        def set_contents_from_file(fp, headers, md5, policy):
+            data = fp.read()
+            if hashlib.md5(data).hexdigest() != md5[0]:
+                raise boto.exception.S3ResponseError(400, 'BadDigest')
+            with self.lock:
+                self.puts.append(keyname)
+                self.keys[keyname], self.etags[keyname] = data, '"{}"'.format(md5[0])
+
+        key = mock.Mock()
+        key.set_contents_from_file.side_effect = set_contents_from_file
+        return key
+
+    def get_key(self, keyname):
+        if keyname not in self.keys:
+            return None
+
+        def get_contents_to_filename(filename):
+            with open(filename, 'wb') as file:
+                file.write(self.keys[keyname])
+
+        key = mock.Mock()
+        key.name, key.bucket.name, key.etag = keyname, 'a-bucket', self.etags[keyname]
+        key.get_contents_as_string.return_value = self.keys[keyname]
+        key.get_contents_to_filename.side_effect = get_contents_to_filename
+        return key
+
+    def delete_key(self, keyname):
+        self.keys.pop(keyname, None)
+        self.etags.pop(keyname, None)
+
 class TestCollect (unittest.TestCase):
 
     def setUp(self):
@@ -3850,6 +3948,7 @@ class TestCollect (unittest.TestCase):
         '''
         S3, db, collected_zip = mock.Mock(), mock.Mock(), mock.Mock()
         collected_zip.filename = 'collected-local.zip'
+        collected_zip.namelist.return_value = []
 
         with patch('openaddr.ci.collect.add_source_to_zipfile') as add_source_to_zipfile:
             collector_publisher = CollectorPublisher(S3, collected_zip, 'everywhere', 'yo')
@@ -3885,20 +3984,114 @@ class TestCollect (unittest.TestCase):
                 mock.call(collected_zip, r3)
                 ])
 
-        self.assertEqual(len(collected_zip.writestr.mock_calls), 1)
+        self.assertEqual(len(collected_zip.writestr.mock_calls), 2)
         filename, content = collected_zip.writestr.mock_calls[0][1]
         self.assertEqual(filename, 'LICENSE.txt')
         self.assertTrue(content.decode('utf8'), summarize_result_licenses.return_value)
 
+        filename, manifest_content = collected_zip.writestr.mock_calls[1][1]
+        self.assertEqual(filename, 'manifest.json')
+        self.assertEqual(json.loads(manifest_content.decode('utf8')), {
+            'abc': {'processed': None, 'process hash': None, 'members': []},
+            'def': {'processed': None, 'process hash': None, 'members': []},
+            'ghi': {'processed': None, 'process hash': None, 'members': []}
+            })
+
         collected_zip.close.assert_called_once_with()
 
         self.assertEqual(db.execute.mock_calls, [
             mock.call('DELETE FROM zips WHERE url = %s',
                       ('https://s3.amazonaws.com/a-bucket/collected-local.zip',)),
             mock.call('''INSERT INTO zips
-                      (url, datetime, is_current, content_length, collection, license_attr)
-                      VALUES (%s, NOW(), true, %s, %s, %s)''',
-                      ('https://s3.amazonaws.com/a-bucket/collected-local.zip', None, 'everywhere', 'yo'))])
+                      (url, datetime, is_current, content_length, collection, license_attr, manifest)
+                      VALUES (%s, NOW(), true, %s, %s, %s, %s)''',
+                      ('https://s3.amazonaws.com/a-bucket/collected-local.zip', None, 'everywhere', 'yo',
+                       manifest_content.decode('utf8')))])
+
+    def test_incremental_collections(self):
+        '''
+        '''
+        s3, set = mock.Mock(), mock.Mock()
+        set.owner, set.repository, set.commit_sha = 'oa', 'oa', 'ff9900'
+        content = u'LON,LAT,NUMBER,STREET\n-122.2359742,37.7362507,{},MAITLAND DR\n'
+
+        def make_run(id, source_base, processed):
+            state = RunState({'processed': processed, 'process hash': 'hash-' + processed})
+            run = Run(id, 'sources/{}.json'.format(source_base), None, None, None,
+                      state, True, None, None, None, None, None, None, True)
+
+            with open(join(self.output_dir, processed), 'w') as file:
+                file.write(content.format(id))
+
+            return run, LocalProcessedResult(source_base, join(self.output_dir, processed), state, None)
+
+        def publish(collection):
+            db = mock.Mock()
+            with patch('openaddr.ci.collect.write_to_s3') as write_to_s3:
+                write_to_s3.return_value.name = basename(collection.zip.filename)
+                write_to_s3.return_value.bucket.name = 'a-bucket'
+                collection.publish(db)
+
+            url, _, _, _, manifest_text = db.execute.mock_calls[1][1][1]
+            return url, json.loads(manifest_text)
+
+        def read_zip(filename):
+            with ZipFile(filename) as zip_file:
+                return {info.filename: (info.compress_size, zip_file.read(info))
+                        for info in zip_file.infolist()}
+
+        run1, result1 = make_run(1, 'us/ca/alameda', '1.csv')
+        run2, result2 = make_run(2, 'us/ca/berkeley', '2.csv')
+        run3, result3 = make_run(3, 'us/ca/berkeley', '3.csv')
+        tests1, tests2 = {'global': lambda result: True}, {'': lambda result: True}
+
+        # Build the first collection from scratch.
+        dir1, dir2 = mkdtemp(dir=self.output_dir), mkdtemp(dir=self.output_dir)
+        ((collection1, _), ) = prepare_collections(s3, set, dir1, tests1, tests2)
+        self.assertEqual(collect_unchanged_sources([(collection1, lambda result: True)], [run1, run2]), [run1, run2])
+        collection1.collect(result1)
+        collection1.collect(result2)
+        url, manifest = publish(collection1)
+
+        self.assertEqual(url, 'https://s3.amazonaws.com/a-bucket/openaddr-collected-global.zip')
+        self.assertEqual(manifest['us/ca/alameda'], {'processed': '1.csv', 'process hash': 'hash-1.csv',
+            'members': ['us/ca/alameda.csv', 'summary/us/ca/alameda-summary.csv', 'summary/us/ca/alameda-summary.vrt']})
+        self.assertEqual(read_zip(collection1.zip.filename)['manifest.json'][1], json.dumps(manifest, indent=2, sort_keys=True).encode('utf8'))
+
+        # Build the second collection, with only berkeley changed.
+        def download_processed_file(url):
+            handle, filename = mkstemp(dir=self.output_dir, suffix='.zip')
+            close(handle)
+            shutil.copy(collection1.zip.filename, filename)
+            return filename
+
+        previous_zips = {('global', ''): (url, manifest)}
+        ((collection2, test), ) = prepare_collections(s3, set, dir2, tests1, tests2, previous_zips)
+
+        with patch('openaddr.ci.collect.download_processed_file') as download:
+            download.side_effect = download_processed_file
+            changed_runs = collect_unchanged_sources([(collection2, test)], [run1, run3])
+
+        self.assertEqual(changed_runs, [run3])
+        self.assertEqual(download.mock_calls, [mock.call(url)])
+
+        collection2.collect(result3)
+        previous_filename = collection2.previous_zip.filename
+        url2, manifest2 = publish(collection2)
+
+        self.assertFalse(os.path.exists(previous_filename))
+        self.assertEqual(url2, url)
+        self.assertEqual(manifest2['us/ca/alameda'], manifest['us/ca/alameda'])
+        self.assertEqual(manifest2['us/ca/berkeley']['processed'], '3.csv')
+        self.assertEqual({result.source_base for result in collection2.results}, {'us/ca/alameda', 'us/ca/berkeley'})
+
+        contents1, contents2 = read_zip(collection1.zip.filename), read_zip(collection2.zip.filename)
+
+        for name in manifest['us/ca/alameda']['members']:
+            self.assertEqual(contents2[name], contents1[name])
+
+        self.assertIn(b',2,MAITLAND DR', contents1['us/ca/berkeley.csv'][1])
+        self.assertIn(b',3,MAITLAND DR', contents2['us/ca/berkeley.csv'][1])
 
     def test_collector_publisher_multipart_s3_one_part(self):
         '''
@@ -3951,6 +4144,116 @@ class TestCollect (unittest.TestCase):
         bucket.initiate_multipart_upload.assert_has_calls([mock.call('keyname.csv', headers={'Content-Type': 'text/csv'})])
         self.assertEqual(bucket.get_key.mock_calls[0][1], ('keyname.csv', ), 'Should upload a correctly-named key')
 
+    def test_write_to_s3_concurrent_parts(self):
+        '''
+        '''
+        filename = join(self.output_dir, 'collected.zip')
+        content = os.urandom(10000)
+
+        with open(filename, 'wb') as file:
+            file.write(content)
+
+        # 1KB chunks give four parts of 3200 bytes for 10000 bytes of data.
+        bucket = FakeMultipartBucket(corrupt_parts=[2])
+
+        with patch('openaddr.ci.collect.MULTIPART_CHUNK_SIZE', 1024), \
+             patch('openaddr.ci.collect.sleep') as sleep:
+            key = write_to_s3(bucket, filename, 'keyname.zip')
+
+        self.assertEqual(key.name, 'keyname.zip')
+        self.assertEqual(bucket.keys['keyname.zip'], content)
+        self.assertFalse(bucket.cancelled)
+
+        # Only the corrupted part was sent again, after a pause.
+        self.assertEqual(dict(bucket.attempts), {1: 1, 2: 2, 3: 1, 4: 1})
+        self.assertEqual(sleep.mock_calls, [mock.call(1)])
+
+        # Parts that keep failing abandon the whole upload.
+        bucket = FakeMultipartBucket()
+
+        with patch('openaddr.ci.collect.MULTIPART_CHUNK_SIZE', 1024), \
+             patch('openaddr.ci.collect.sleep') as sleep, \
+             patch.object(bucket, 'upload_part_from_file') as upload_part_from_file:
+            upload_part_from_file.side_effect = boto.exception.S3ResponseError(500, 'InternalError')
+
+            with self.assertRaises(boto.exception.S3ResponseError):
+                write_to_s3(bucket, filename, 'keyname.zip')
+
+        self.assertTrue(bucket.cancelled)
+        self.assertNotIn('keyname.zip', bucket.keys)
+        self.assertEqual({call[1] for call in sleep.mock_calls}, {(1, ), (2, )})
+
+    def test_upload_file_multipart(self):
+        '''
+        '''
+        filename = join(self.output_dir, 'cache.zip')
+        content = os.urandom(10000)
+
+        with open(filename, 'wb') as file:
+            file.write(content)
+
+        s3 = mock.Mock()
+        s3.bucket = FakeMultipartBucket()
+
+        with patch('openaddr.ci.collect.MULTIPART_CHUNK_SIZE', 1024):
+            url, md5 = upload_file(s3, '/runs/0/cache.zip', filename)
+
+        self.assertEqual(url, 'https://s3.amazonaws.com/a-bucket/runs/0/cache.zip')
+        self.assertEqual(md5, hashlib.md5(content).hexdigest())
+        self.assertEqual(s3.bucket.keys['/runs/0/cache.zip'], content)
+        self.assertEqual(s3.bucket.headers, {'Content-Type': 'application/zip'})
+        self.assertEqual(len(s3.new_key.mock_calls), 0)
+
+    def test_upload_to_s3(self):
+        '''
+        '''
+        filename1, filename2 = join(self.output_dir, 'small.zip'), join(self.output_dir, 'large.zip')
+        content1, content2 = os.urandom(1000), os.urandom(10000)
+
+        for (filename, content) in ((filename1, content1), (filename2, content2)):
+            with open(filename, 'wb') as file:
+                file.write(content)
+
+        bucket = FakeMultipartBucket()
+
+        with patch('openaddr.ci.collect.MULTIPART_CHUNK_SIZE', 1024):
+            self.assertTrue(upload_to_s3(bucket, filename1, 'small.zip'))
+            self.assertTrue(upload_to_s3(bucket, filename2, 'large.zip'))
+
+            # Small files are sent in a single request, large ones in parts.
+            self.assertEqual(bucket.puts, ['small.zip'])
+            self.assertEqual(dict(bucket.attempts), {1: 1, 2: 1, 3: 1, 4: 1})
+            self.assertEqual(bucket.keys, {'small.zip': content1, 'large.zip': content2})
+            self.assertEqual(bucket.etags['small.zip'].strip('"'), get_s3_etag(filename1))
+            self.assertEqual(bucket.etags['large.zip'].strip('"'), get_s3_etag(filename2))
+
+            # Unchanged files are not sent again.
+            self.assertFalse(upload_to_s3(bucket, filename1, 'small.zip'))
+            self.assertFalse(upload_to_s3(bucket, filename2, 'large.zip'))
+            self.assertEqual(bucket.puts, ['small.zip'])
+            self.assertEqual(dict(bucket.attempts), {1: 1, 2: 1, 3: 1, 4: 1})
+
+            # Changed files are.
+            self.assertTrue(upload_to_s3(bucket, filename2, 'small.zip'))
+            self.assertEqual(bucket.keys['small.zip'], content2)
+
+    def test_add_manifest_column(self):
+        '''
+        '''
+        db = mock.Mock()
+
+        # Databases from before zips.manifest get the new column.
+        db.fetchone.return_value = None
+        add_manifest_column(db)
+        self.assertEqual(db.execute.mock_calls[-1], mock.call('ALTER TABLE zips ADD COLUMN manifest JSON NULL'))
+
+        # Up-to-date databases are left alone.
+        db.reset_mock()
+        db.fetchone.return_value = ('manifest', )
+        add_manifest_column(db)
+        self.assertEqual(len(db.execute.mock_calls), 1)
+        self.assertIn('information_schema.columns', db.execute.mock_calls[0][1][0])
+
     def test_collection_checks(self):
         '''
         '''
@@ -4046,6 +4349,126 @@ class TestCollect (unittest.TestCase):
                     if test_func is not is_north_america:
                         self.assertFalse(test_func(result), '{}("{}") should be false'.format(test_func.__name__, source_base))
 
+    def test_copy_zipfile_members(self):
+        '''
+        '''
+        staged_filename, collected_filename = join(self.output_dir, 'staged.zip'), join(self.output_dir, 'collected.zip')
+
+        with ZipFile(staged_filename, 'w', ZIP_DEFLATED) as zip_in:
+            zip_in.writestr(u'us/ca/älameda.csv', b'LON,LAT\n' * 1000)
+            zip_in.writestr('README.txt', b'hello world', ZIP_STORED)
+
+        with ZipFile(collected_filename, 'w', ZIP_DEFLATED) as zip_out:
+            zip_out.writestr('LICENSE.txt', b'license')
+
+            with ZipFile(staged_filename) as zip_in:
+                copy_zipfile_members(zip_in, zip_out)
+
+            zip_out.writestr('other.txt', b'other')
+
+        with ZipFile(collected_filename) as zip_out:
+            self.assertIsNone(zip_out.testzip())
+            self.assertEqual(zip_out.namelist(), ['LICENSE.txt', u'us/ca/älameda.csv', 'README.txt', 'other.txt'])
+            self.assertEqual(zip_out.read(u'us/ca/älameda.csv'), b'LON,LAT\n' * 1000)
+            self.assertEqual(zip_out.getinfo('README.txt').compress_type, ZIP_STORED)
+
+            with ZipFile(staged_filename) as zip_in:
+                self.assertEqual(zip_out.getinfo('README.txt').compress_size, zip_in.getinfo('README.txt').compress_size)
+                self.assertEqual(zip_out.getinfo(u'us/ca/älameda.csv').compress_size,
+                                 zip_in.getinfo(u'us/ca/älameda.csv').compress_size)
+
+    def test_build_collections(self):
+        '''
+        '''
+        set = mock.Mock()
+        set.owner, set.repository, set.commit_sha = 'oa', 'oa', 'ff9900'
+
+        def make_result(source_base, content):
+            handle, filename = mkstemp(dir=self.output_dir, suffix='.csv')
+            with open(handle, 'w') as file:
+                file.write(content)
+            return LocalProcessedResult(source_base, filename, RunState({}), None)
+
+        content = u'LON,LAT,NUMBER,STREET\n-122.2359742,37.7362507,85,MAITLAND DR\n-1e+308,-1e+308,1,BAD\n'
+        results = [make_result('us/ca/alameda', content), make_result('de/he/frankfurt', content),
+                   make_result('us/ca/berkeley', content)]
+
+        # Expected zip contents come from adding each source serially.
+        expected = dict()
+        for result in results:
+            with ZipFile(join(self.output_dir, 'expected.zip'), 'w', ZIP_DEFLATED) as zip_out:
+                add_source_to_zipfile(zip_out, result)
+            with ZipFile(join(self.output_dir, 'expected.zip')) as zip_out:
+                expected[result.source_base] = {name: zip_out.read(name) for name in zip_out.namelist()}
+
+        tests = {'global': lambda result: True, 'us': lambda result: result.source_base.startswith('us/')}
+        collections = prepare_collections(self.s3, set, self.output_dir, tests, {'': lambda result: True})
+
+        def iterate_results():
+            for result in results:
+                yield result
+                self.assertFalse(os.path.exists(result.filename))
+
+        with patch('openaddr.ci.collect.add_source_to_zipfile') as add_source:
+            build_collections(collections, iterate_results(), self.output_dir, 2)
+
+        self.assertEqual(len(add_source.mock_calls), 0)
+
+        for (collection, test) in collections:
+            self.assertEqual(collection.results, {result for result in results if test(result)})
+            collection.zip.close()
+
+            with ZipFile(collection.zip.filename) as zip_out:
+                self.assertIsNone(zip_out.testzip())
+                contents = {name: zip_out.read(name) for name in zip_out.namelist()}
+
+            self.assertIn('README.txt', contents)
+            self.assertEqual(len(contents), 1 + 3 * len(collection.results))
+
+            for result in collection.results:
+                for (name, data) in expected[result.source_base].items():
+                    self.assertEqual(contents[name], data)
+
+        # Only collections remain in the output directory.
+        self.assertEqual(sorted(os.listdir(self.output_dir)), sorted(['expected.zip'] +
+            [os.path.basename(collection.zip.filename) for (collection, _) in collections]))
+
+    def test_build_collections_crc(self):
+        '''
+        '''
+        set = mock.Mock()
+        set.owner, set.repository, set.commit_sha = 'oa', 'oa', 'ff9900'
+        tests = {'global': lambda result: True, 'us': lambda result: result.source_base.startswith('us/')}
+
+        content = u'LON,LAT,NUMBER,STREET\n' + u''.join(u'-122.{0:07d},37.{0:07d},{0},MAITLAND DR\n'.format(n) for n in range(1000))
+
+        # Copy raw members where zipfile internals allow it, and recompress them otherwise.
+        for can_copy in (True, False):
+            output_dir = mkdtemp(dir=self.output_dir)
+            results = list()
+
+            for source_base in ('us/ca/alameda', 'de/he/frankfurt', 'us/ca/berkeley'):
+                handle, filename = mkstemp(dir=output_dir, suffix='.csv')
+                with open(handle, 'w') as file:
+                    file.write(content)
+                results.append(LocalProcessedResult(source_base, filename, RunState({}), None))
+
+            collections = prepare_collections(self.s3, set, output_dir, tests, {'': lambda result: True})
+
+            with patch('openaddr.ci.collect._can_copy_zipfile_members') as can_copy_zipfile_members:
+                can_copy_zipfile_members.return_value = can_copy
+                build_collections(collections, iter(results), output_dir, 2)
+
+            for (collection, _) in collections:
+                collection.zip.close()
+
+                with ZipFile(collection.zip.filename) as zip_out:
+                    self.assertIsNone(zip_out.testzip())
+                    self.assertIn(u'us/ca/alameda.csv', zip_out.namelist())
+
+                    for info in zip_out.infolist():
+                        self.assertEqual(info.CRC, crc32(zip_out.read(info)) & 0xffffffff, info.filename)
+
     def test_add_source_to_zipfile(self):
         '''
         '''
@@ -4096,15 +4519,17 @@ class TestCollect (unittest.TestCase):
         output_write_contents = list()
         output_writestr_contents = list()
 
-        def remember_write_contents(fn, _):
-            with open(fn) as file:
-                # Python 2.7 and 3 use different line endings in csv module:
-                output_write_contents.append([line.strip() for line in file])
+        class RememberedMember (BytesIO):
+            def close(self):
+                if not self.closed:
+                    lines = self.getvalue().decode('utf8').splitlines()
+                    output_write_contents.append([line.strip() for line in lines])
+                BytesIO.close(self)
 
         def remember_writestr_contents(_, bytes):
             output_writestr_contents.append(bytes)
 
-        output.write.side_effect = remember_write_contents
+        output.open.side_effect = lambda name, mode, force_zip64: RememberedMember()
         output.writestr.side_effect = remember_writestr_contents
 
         # Addresses that should trigger expansion.
@@ -4125,18 +4550,20 @@ class TestCollect (unittest.TestCase):
         input5 = u'LON,LAT,NUMBER,STREET,UNIT,CITY,DISTRICT,REGION,POSTCODE,ID,HASH\n-104.6843547,39.5793748,26050,E JAMISON CIR N,, CO,,,80016-2056,,629e0367e92b4c47\n-1.79769313486e+308,-1.79769313486e+308,26900,E COLFAX AVE,428,,,,,,8764a6de3c9f688c\n-104.1139093,39.6761295,2050,S PEORIA CROSSING RD,, CO,,,,,28b370f54c8e40ef\n'
         add_csv_to_zipfile(output, u'us/co/arapahoe.csv', BytesIO(input5.encode('utf8')))
 
-        self.assertEqual(len(output.write.mock_calls), 10)
-
-        self.assertEqual(output.write.mock_calls[0][1][1], u'us/ca/älameda.csv')
-        self.assertEqual(output.write.mock_calls[1][1][1], u'summary/us/ca/älameda-summary.csv')
-        self.assertEqual(output.write.mock_calls[2][1][1], output.write.mock_calls[0][1][1])
-        self.assertEqual(output.write.mock_calls[3][1][1], output.write.mock_calls[1][1][1])
-        self.assertEqual(output.write.mock_calls[4][1][1], 'de/he/frankfurt.csv')
-        self.assertEqual(output.write.mock_calls[5][1][1], 'summary/de/he/frankfurt-summary.csv')
-        self.assertEqual(output.write.mock_calls[6][1][1], output.write.mock_calls[0][1][1])
-        self.assertEqual(output.write.mock_calls[7][1][1], output.write.mock_calls[1][1][1])
-        self.assertEqual(output.write.mock_calls[8][1][1], 'us/co/arapahoe.csv')
-        self.assertEqual(output.write.mock_calls[9][1][1], 'summary/us/co/arapahoe-summary.csv')
+        self.assertEqual(len(output.open.mock_calls), 10)
+        self.assertEqual(len(output.write.mock_calls), 0)
+        self.assertEqual(output.open.mock_calls[0], mock.call(u'us/ca/älameda.csv', 'w', force_zip64=True))
+
+        self.assertEqual(output.open.mock_calls[0][1][0], u'us/ca/älameda.csv')
+        self.assertEqual(output.open.mock_calls[1][1][0], u'summary/us/ca/älameda-summary.csv')
+        self.assertEqual(output.open.mock_calls[2][1][0], output.open.mock_calls[0][1][0])
+        self.assertEqual(output.open.mock_calls[3][1][0], output.open.mock_calls[1][1][0])
+        self.assertEqual(output.open.mock_calls[4][1][0], 'de/he/frankfurt.csv')
+        self.assertEqual(output.open.mock_calls[5][1][0], 'summary/de/he/frankfurt-summary.csv')
+        self.assertEqual(output.open.mock_calls[6][1][0], output.open.mock_calls[0][1][0])
+        self.assertEqual(output.open.mock_calls[7][1][0], output.open.mock_calls[1][1][0])
+        self.assertEqual(output.open.mock_calls[8][1][0], 'us/co/arapahoe.csv')
+        self.assertEqual(output.open.mock_calls[9][1][0], 'summary/us/co/arapahoe-summary.csv')
 
         self.assertIn(u'älameda'.encode('utf8'), output_writestr_contents[0])
         self.assertIn(u'älameda'.encode('utf8'), output_writestr_contents[1])
@@ -4210,6 +4637,29 @@ class TestCollect (unittest.TestCase):
             '1,-104.2,39.6,"POLYGON((-104.2 39.6,-104.2 39.7,-104.1 39.7,-104.1 39.6,-104.2 39.6))"'
             ])
 
+    def test_add_csv_to_zipfile_without_streaming(self):
+        '''
+        '''
+        input = u'LON,LAT,NUMBER,STREET\n8.6885893,50.1042197,12,Abtsgäßchen\n-122.2359742,37.7362507,85,MAITLAND DR\n'
+        contents = list()
+
+        for streaming in (True, False):
+            zip_filename = join(self.output_dir, 'collected.zip')
+
+            with patch('openaddr.ci.collect.ZIP_STREAMING', new=streaming):
+                with ZipFile(zip_filename, 'w', ZIP_DEFLATED) as zip_out:
+                    add_csv_to_zipfile(zip_out, 'de/he/frankfurt.csv', BytesIO(input.encode('utf8')))
+
+            with ZipFile(zip_filename) as zip_out:
+                self.assertIsNone(zip_out.testzip())
+                contents.append({name: zip_out.read(name) for name in zip_out.namelist()})
+
+            remove(zip_filename)
+
+        self.assertEqual(sorted(contents[0].keys()), ['de/he/frankfurt.csv',
+            'summary/de/he/frankfurt-summary.csv', 'summary/de/he/frankfurt-summary.vrt'])
+        self.assertEqual(contents[0], contents[1])
+
 class TestTileIndex (unittest.TestCase):
 
     def setUp(self):
@@ -4263,43 +4713,31 @@ class TestTileIndex (unittest.TestCase):
         with HTTMock(self.response_content):
             addresses1 = list(iterate_runs_points(self.runs[:1]))
             self.assertEqual(len(addresses1), 5305, 'Should equal first output')
-            self.assertEqual(addresses1[0].result.source_base, 'us/ca/alameda')
+            self.assertEqual(addresses1[0][1].source_base, 'us/ca/alameda')
+
+            for (key, _, _) in addresses1:
+                self.assertIn(key, ((-123, 37), (-122, 37)), 'Alameda county is north of 37.0')
 
         with HTTMock(self.response_content):
             addresses2 = list(iterate_runs_points(self.runs[1:]))
             self.assertEqual(len(addresses2), 4912, 'Should equal second output')
-            self.assertEqual(addresses2[0].result.source_base, 'us/ca/santa_clara')
+            self.assertEqual(addresses2[0][1].source_base, 'us/ca/santa_clara')
 
         with HTTMock(self.response_content):
             addresses3 = list(iterate_runs_points(self.runs))
             self.assertEqual(len(addresses3), 5305 + 4912, 'Should add up to the lengths of both outputs')
-            self.assertEqual(addresses3[0].result.source_base, 'us/ca/alameda')
-            self.assertEqual(addresses3[-1].result.source_base, 'us/ca/santa_clara')
+            self.assertEqual(addresses3[0][1].source_base, 'us/ca/alameda')
+            self.assertEqual(addresses3[-1][1].source_base, 'us/ca/santa_clara')
 
-    def test_iterate_point_blocks(self):
-        '''
-        '''
-        with HTTMock(self.response_content):
-            total1, addresses1 = 0, iterate_runs_points(self.runs[:1])
-            for (key, points) in iterate_point_blocks(addresses1):
-                self.assertIn(key, ((-123, 37), (-122, 37)), 'Alameda county is north of 37.0')
-                total1 += len(list(points))
-            self.assertEqual(total1, 5305, 'Should equal first output')
-
-        with HTTMock(self.response_content):
-            total2, addresses2 = 0, iterate_runs_points(self.runs)
-            for (key, points) in iterate_point_blocks(addresses2):
+            for (key, _, _) in addresses3:
                 self.assertIn(key, ((-123, 37), (-122, 36), (-122, 37)))
-                total2 += len(list(points))
-            self.assertEqual(total2, 5305 + 4912, 'Should add up to the lengths of both outputs')
 
     def test_populate_tiles(self):
         '''
         '''
         with HTTMock(self.response_content):
             addresses = iterate_runs_points(self.runs)
-            point_blocks = iterate_point_blocks(addresses)
-            tiles = populate_tiles(self.output_dir, point_blocks)
+            tiles = populate_tiles(self.output_dir, addresses)
             self.assertEqual(len(tiles), 3)
             self.assertIn((-122, 36), tiles)
             self.assertIn((-122, 37), tiles)
@@ -4340,26 +4778,52 @@ class TestTileIndex (unittest.TestCase):
                     self.assertEqual(result.run_state.attribution_name, 'Santa Clara County')
                     self.assertIsNone(result.run_state.attribution_flag)
 
+    def test_populate_tiles_open_files(self):
+        '''
+        '''
+        def read_tiles(tiles):
+            contents = dict()
+            for (key, tile) in tiles.items():
+                with gzip.open(tile.filename, 'rt', encoding='utf8') as file:
+                    contents[key] = file.read()
+            return contents
+
+        with HTTMock(self.response_content):
+            points = list(iterate_runs_points(self.runs))
+
+        # Interleave points from different tiles, to open and close files often.
+        points = points[::2] + points[1::2]
+        contents1 = read_tiles(populate_tiles(mkdtemp(dir=self.output_dir), points))
+
+        with patch('openaddr.ci.tileindex.MAX_OPEN_TILES', 1), \
+             patch('openaddr.ci.tileindex.gzip.open', side_effect=gzip.open) as gzip_open:
+            contents2 = read_tiles(populate_tiles(mkdtemp(dir=self.output_dir), points))
+
+        # Tile files are the same, with just one open at a time.
+        self.assertEqual(contents2, contents1)
+        self.assertGreater(len(gzip_open.mock_calls), 6)
+        self.assertEqual(sum([len(content.splitlines()) - 1 for content in contents1.values()]), len(points))
+
     def test_tile_publish(self):
         '''
         '''
         result, s3 = mock.Mock(), mock.Mock()
         result.source_base = 'xx/anytown'
-        point = Point(0., 0., result, dict(LAT='0.0', LON='0.0'))
+        point = lonlat_key(0., 0.), result, dict(LAT='0.0', LON='0.0')
 
         tile = Tile((0, 0), self.output_dir)
         tile.add_points([point])
 
-        with patch('openaddr.ci.collect.write_to_s3') as write_to_s3:
+        with patch('openaddr.ci.collect.upload_to_s3') as upload_to_s3:
             with patch('openaddr.util.summarize_result_licenses') as summarize_result_licenses:
                 summarize_result_licenses.return_value = str(uuid4())
                 tile.publish(s3)
 
-        _s3, _zip_file, _keyname = write_to_s3.mock_calls[0][1]
+        _s3, _zip_file, _keyname = upload_to_s3.mock_calls[0][1]
         zipfile = ZipFile(_zip_file, 'r')
         names = zipfile.namelist()
 
-        self.assertEqual(len(write_to_s3.mock_calls), 1, 'Write to S3 called just once')
+        self.assertEqual(len(upload_to_s3.mock_calls), 1, 'Upload to S3 called just once')
         self.assertIs(_s3, s3, 'S3 bucket should be first arg')
         self.assertEqual(_keyname, 'tiles/0.0/0.0.zip')
         self.assertEqual(names, ['addresses.csv', 'LICENSE.txt'])
@@ -4370,6 +4834,220 @@ class TestTileIndex (unittest.TestCase):
         license = zipfile.read('LICENSE.txt').decode('utf8')
         self.assertEqual(license, summarize_result_licenses.return_value)
 
+        # Older Pythons can't stream into zip members, but package the same tile.
+        with patch('openaddr.ci.collect.upload_to_s3') as upload_to_s3, \
+             patch('openaddr.ci.collect.ZIP_STREAMING', new=False):
+            with patch('openaddr.util.summarize_result_licenses') as summarize_result_licenses:
+                summarize_result_licenses.return_value = license
+                tile.publish(s3)
+
+        with ZipFile(upload_to_s3.mock_calls[0][1][1], 'r') as zipfile2:
+            self.assertIsNone(zipfile2.testzip())
+            self.assertEqual(zipfile2.namelist(), names)
+            self.assertEqual(zipfile2.getinfo('addresses.csv').date_time, zipfile.getinfo('addresses.csv').date_time)
+            self.assertEqual(zipfile2.read('addresses.csv'), zipfile.read('addresses.csv'))
+
+    def test_publish_tiles(self):
+        '''
+        '''
+        result = mock.Mock()
+        result.source_base = 'xx/anytown'
+        result.run_state.attribution_flag = 'false'
+        result.run_state.website, result.run_state.license = 'http://example.com', 'CC0'
+
+        points = [(lonlat_key(lon, lat), result, dict(LON=str(lon), LAT=str(lat), NUMBER=str(n)))
+                  for (n, (lon, lat)) in enumerate([(0.5, 0.5), (1.5, 0.5), (0.5, 1.5), (0.6, 0.6)])]
+
+        tiles = populate_tiles(self.output_dir, points)
+        bucket = FakeMultipartBucket()
+
+        self.assertEqual(publish_tiles(bucket, tiles.values(), 2), 3)
+        self.assertEqual(sorted(bucket.puts), ['tiles/0.0/0.0.zip', 'tiles/0.0/1.0.zip', 'tiles/1.0/0.0.zip'])
+
+        with ZipFile(BytesIO(bucket.keys['tiles/0.0/0.0.zip'])) as zipfile:
+            rows = list(DictReader(TextIOWrapper(zipfile.open('addresses.csv'), 'utf8')))
+            self.assertEqual([row['NUMBER'] for row in rows], ['0', '3'])
+            self.assertIn('License: CC0', zipfile.read('LICENSE.txt').decode('utf8'))
+
+        # Temporary zip files are gone, and unchanged tiles are not uploaded again.
+        self.assertFalse([name for name in os.listdir(self.output_dir) if name.endswith('.zip')])
+        self.assertEqual(publish_tiles(bucket, tiles.values(), 2), 0)
+        self.assertEqual(len(bucket.puts), 3)
+
+        # Changed tiles are.
+        tiles[(0, 0)].add_points([((0, 0), result, dict(LON='0.7', LAT='0.7', NUMBER='4'))])
+        self.assertEqual(publish_tiles(bucket, tiles.values(), 2), 1)
+        self.assertEqual(bucket.puts[3:], ['tiles/0.0/0.0.zip'])
+
+    def test_index_tiles(self):
+        '''
+        '''
+        def make_run(source_base, process_hash):
+            run = mock.Mock()
+            run.source_path, run.code_version = 'sources/{}.json'.format(source_base), '0.0.0'
+            run.state.processed, run.state.process_hash = 'http://example.com/processed.zip', process_hash
+            run.state.share_alike, run.state.attribution_flag = 'false', 'false'
+            run.state.website, run.state.license = 'http://example.com', 'CC0'
+            return run
+
+        def iterate_runs_points(runs, *args):
+            for run in runs:
+                source_base = splitext(relpath(run.source_path, 'sources'))[0]
+                read_sources.append(source_base)
+                result = LocalProcessedResult(source_base, None, run.state, run.code_version)
+                for (lon, lat) in source_lonlats[(source_base, run.state.process_hash)]:
+                    yield lonlat_key(lon, lat), result, dict(LON=str(lon), LAT=str(lat))
+
+        def read_tile(keyname):
+            with ZipFile(BytesIO(bucket.keys[keyname])) as zipfile:
+                rows = DictReader(TextIOWrapper(zipfile.open('addresses.csv'), 'utf8'))
+                return sorted((row['OA:Source'], row['LON']) for row in rows)
+
+        source_lonlats = {
+            ('xx/a', 'a1'): [(0.5, 0.5), (1.5, 0.5)],
+            ('xx/b', 'b1'): [(0.6, 0.6), (5.5, 5.5)],
+            ('xx/b', 'b2'): [(0.7, 0.7), (1.7, 0.7)],
+            }
+
+        bucket, read_sources = FakeMultipartBucket(), list()
+
+        def index(runs):
+            del read_sources[:], bucket.puts[:]
+            with patch('openaddr.ci.tileindex.iterate_runs_points') as iterate:
+                iterate.side_effect = iterate_runs_points
+                index_tiles(mkdtemp(dir=self.output_dir), bucket, runs, 2)
+            return json.loads(bucket.keys['tiles/manifest.json'].decode('utf8'))
+
+        # Everything is read the first time.
+        manifest = index([make_run('xx/a', 'a1'), make_run('xx/b', 'b1')])
+        self.assertEqual(sorted(read_sources), ['xx/a', 'xx/b'])
+        self.assertEqual(manifest['sources'], {'xx/a': 'a1', 'xx/b': 'b1'})
+        self.assertEqual(manifest['tiles'], {'0,0': ['xx/a', 'xx/b'], '1,0': ['xx/a'], '5,5': ['xx/b']})
+        self.assertEqual(read_tile('tiles/0.0/0.0.zip'), [('xx/a', '0.5'), ('xx/b', '0.6')])
+
+        # Nothing is read or uploaded when nothing has changed.
+        index([make_run('xx/a', 'a1'), make_run('xx/b', 'b1')])
+        self.assertEqual(read_sources, [])
+        self.assertEqual(bucket.puts, [])
+
+        # Only a changed source is read, and unchanged points are kept.
+        manifest = index([make_run('xx/a', 'a1'), make_run('xx/b', 'b2')])
+        self.assertEqual(read_sources, ['xx/b'])
+        self.assertEqual(manifest['tiles'], {'0,0': ['xx/a', 'xx/b'], '1,0': ['xx/a', 'xx/b']})
+        self.assertEqual(read_tile('tiles/0.0/0.0.zip'), [('xx/a', '0.5'), ('xx/b', '0.7')])
+        self.assertEqual(read_tile('tiles/1.0/0.0.zip'), [('xx/a', '1.5'), ('xx/b', '1.7')])
+        self.assertNotIn('tiles/5.0/5.0.zip', bucket.keys)
+
+        # Removed sources are dropped without reading anything.
+        manifest = index([make_run('xx/b', 'b2')])
+        self.assertEqual(read_sources, [])
+        self.assertEqual(manifest['sources'], {'xx/b': 'b2'})
+        self.assertEqual(read_tile('tiles/0.0/0.0.zip'), [('xx/b', '0.7')])
+
+        # A missing tile means rebuilding everything.
+        index([make_run('xx/a', 'a1'), make_run('xx/b', 'b2')])
+        bucket.delete_key('tiles/1.0/0.0.zip')
+        manifest = index([make_run('xx/a', 'a1'), make_run('xx/b', 'b1')])
+        self.assertEqual(read_sources, ['xx/b', 'xx/a', 'xx/b'])
+        self.assertEqual(manifest['tiles'], {'0,0': ['xx/a', 'xx/b'], '1,0': ['xx/a'], '5,5': ['xx/b']})
+        self.assertEqual(read_tile('tiles/1.0/0.0.zip'), [('xx/a', '1.5')])
+
+    def test_split_tile(self):
+        '''
+        '''
+        result1, result2 = mock.Mock(), mock.Mock()
+        result1.source_base, result2.source_base = 'xx/a', 'xx/b'
+        lonlats = [(0.1, 0.1), (0.2, 0.2), (0.3, 0.4), (0.9, 0.9), (0.6, 0.1)]
+
+        tile = Tile((0, 0), self.output_dir)
+        tile.add_points([((0, 0), result1 if lon < .5 else result2, dict(LON=str(lon), LAT=str(lat)))
+                         for (lon, lat) in lonlats])
+
+        self.assertEqual(tile.count, 5)
+        self.assertEqual(split_tile(tile, 5, 6), [tile])
+
+        # The southwest quadrant has three points, and is split again.
+        leaves = split_tile(tile, 2, 6)
+        self.assertEqual([leaf.quadkey for leaf in leaves], ['00', '01', '02', '03', '1', '2', '3'])
+        self.assertEqual([leaf.count for leaf in leaves], [2, 0, 0, 1, 1, 0, 1])
+        self.assertEqual([leaf.keyname for leaf in leaves][:2], ['tiles/0.0/0.0/00.zip', 'tiles/0.0/0.0/01.zip'])
+        self.assertEqual(leaves[0].results, {result1})
+        self.assertEqual(leaves[4].results, {result2})
+
+        with gzip.open(leaves[3].filename, 'rt', encoding='utf8') as file:
+            self.assertEqual([(row['LON'], row['LAT']) for row in DictReader(file)], [('0.3', '0.4')])
+
+        # Depth is limited, and intermediate files are removed.
+        self.assertEqual([leaf.quadkey for leaf in split_tile(tile, 2, 1)], ['0', '1', '2', '3'])
+        self.assertEqual(len(os.listdir(self.output_dir)), 1 + 7 + 4)
+
+        # Every location maps to one leaf.
+        index = make_tile_index(None, {(0, 0): tile}, {(0, 0): leaves})
+        self.assertEqual(index['tiles'], {'0,0': ['00', '01', '02', '03', '1', '2', '3']})
+        self.assertEqual(lookup_tile_keyname(index, 0.3, 0.4), 'tiles/0.0/0.0/03.zip')
+        self.assertEqual(lookup_tile_keyname(index, 0.9, 0.1), 'tiles/0.0/0.0/1.zip')
+        self.assertEqual(lookup_tile_keyname(index, 1.5, 0.5), 'tiles/1.0/0.0.zip')
+        self.assertEqual(lookup_tile_keyname(None, -0.5, 0.5), 'tiles/-1.0/0.0.zip')
+
+    def test_index_tiles_split(self):
+        '''
+        '''
+        run = mock.Mock()
+        run.source_path, run.code_version = 'sources/xx/a.json', '0.0.0'
+        run.state.processed, run.state.share_alike = 'http://example.com/processed.zip', 'false'
+        run.state.attribution_flag, run.state.website, run.state.license = 'false', None, None
+
+        def iterate_runs_points(runs, *args):
+            for run in runs:
+                result = LocalProcessedResult('xx/a', None, run.state, run.code_version)
+                for (lon, lat) in lonlats[run.state.process_hash]:
+                    yield lonlat_key(lon, lat), result, dict(LON=str(lon), LAT=str(lat))
+
+        lonlats = {'a1': [(0.2, 0.2), (0.3, 0.3), (0.8, 0.8)], 'a2': [(0.2, 0.2)]}
+        bucket = FakeMultipartBucket()
+
+        leaf_keynames = ['tiles/0.0/0.0/0.zip', 'tiles/0.0/0.0/1.zip', 'tiles/0.0/0.0/2.zip', 'tiles/0.0/0.0/3.zip']
+
+        def index_tiles_at(process_hash, now):
+            run.state.process_hash = process_hash
+            with patch('openaddr.ci.tileindex.time') as time:
+                time.time.return_value = now
+                index_tiles(mkdtemp(dir=self.output_dir), bucket, [run], 2, max_points=2)
+            return json.loads(bucket.keys['tiles/index.json'].decode('utf8'))
+
+        with patch('openaddr.ci.tileindex.iterate_runs_points') as iterate:
+            iterate.side_effect = iterate_runs_points
+
+            index = index_tiles_at('a1', 1000)
+            self.assertEqual(index['tiles'], {'0,0': ['0', '1', '2', '3']})
+            self.assertEqual(index['removed'], {})
+            self.assertEqual(sorted(name for name in bucket.keys if name.startswith('tiles/0.0/')),
+                             ['tiles/0.0/0.0.zip'] + leaf_keynames)
+
+            # Leaves dropped from the index outlive cached copies of it.
+            index = index_tiles_at('a2', 2000)
+            self.assertEqual(index['tiles'], {})
+            self.assertEqual(index['removed'], {keyname: 2000 for keyname in leaf_keynames})
+            self.assertEqual(sorted(name for name in bucket.keys if name.startswith('tiles/0.0/')),
+                             ['tiles/0.0/0.0.zip'] + leaf_keynames)
+
+            # Leaves published again are no longer removed.
+            index = index_tiles_at('a1', 2000 + TILE_INDEX_TTL)
+            self.assertEqual(index['tiles'], {'0,0': ['0', '1', '2', '3']})
+            self.assertEqual(index['removed'], {})
+            self.assertEqual(len(bucket.keys), 7)
+
+            # Otherwise, a later run removes them after the new index is written.
+            index_tiles_at('a2', 3000)
+            index = index_tiles_at('a2', 3000 + TILE_INDEX_TTL - 1)
+            self.assertEqual(len(index['removed']), 4)
+            self.assertEqual(len(bucket.keys), 7)
+
+            index = index_tiles_at('a2', 3000 + TILE_INDEX_TTL)
+            self.assertEqual(index['tiles'], {})
+            self.assertEqual(index['removed'], {})
+            self.assertEqual([name for name in bucket.keys if name.startswith('tiles/0.0/')], ['tiles/0.0/0.0.zip'])
+
 class TestLogging (unittest.TestCase):
 
     def test_cloudwatch(self):
@@ -11,12 +11,16 @@ import re
 import unittest
 import tempfile
 import shutil
+import zipfile
+import importlib
+import mock
 
 from ..conform import (
     GEOM_FIELDNAME, X_FIELDNAME, Y_FIELDNAME,
     csv_source_to_csv, find_source_path, row_transform_and_convert,
+    compile_conform_transform,
     row_fxn_regexp, row_smash_case, row_round_lat_lon, row_merge,
-    row_extract_and_reproject, row_convert_to_out, row_fxn_join, row_fxn_format,
+    row_extract_and_reproject, rows_extract_and_reproject, row_convert_to_out, row_fxn_join, row_fxn_format,
     row_fxn_prefixed_number, row_fxn_postfixed_street,
     row_fxn_postfixed_unit,
     row_fxn_remove_prefix, row_fxn_remove_postfix, row_fxn_chain,
@@ -25,7 +29,11 @@ from ..conform import (
     row_canonicalize_unit_and_number, conform_smash_case, conform_cli,
     convert_regexp_replace, conform_license,
     conform_attribution, conform_sharealike, normalize_ogr_filename_case,
-    OPENADDR_CSV_SCHEMA, is_in, geojson_source_to_csv, check_source_tests
+    OPENADDR_CSV_SCHEMA, is_in, geojson_source_to_csv, check_source_tests,
+    transform_to_out_csv, find_csv_row_boundaries, iterate_extract_rows,
+    iterate_ogr_source, _geojson_centroid_xy, name_index, ZipDecompressTask,
+    split_zip_member_path, open_source_file, iterate_csv_source, ConformStats,
+    ConvertToCsvTask
     )
 
 class TestConformTransforms (unittest.TestCase):
@@ -273,6 +281,34 @@ class TestConformTransforms (unittest.TestCase):
                           "CITY": None, "REGION": None, "DISTRICT": None, "POSTCODE": None, "ID": None,
                           'HASH': 'eee8eb535bb20a03'}, r)
 
+    def test_compile_conform_transform(self):
+        d = conform_smash_case({ "conform": {
+            "number": { "function": "regexp", "field": "S", "pattern": "^(\\S+)" },
+            "street": { "function": "chain", "variable": "foo", "functions": [
+                { "function": "format", "fields": ["s1", "s2"], "format": "$1 $2" },
+                { "function": "remove_postfix", "field": "foo", "field_to_remove": "u" }
+                ] },
+            "unit": "u", "city": ["c1", "c2"], "lon": "y", "lat": "x" }, "fingerprint": "0000" })
+
+        transform = compile_conform_transform(d)
+        rows = [
+            { "S": "123 MAPLE ST", "s1": "MAPLE", "s2": "ST #2", "u": "#2", "c1": "Old", "c2": "Town", X_FIELDNAME: "-119.2", Y_FIELDNAME: "39.3" },
+            { "S": "45 OAK AVE", "s1": "OAK", "s2": None, "u": "", "c1": "New", "c2": "Town", X_FIELDNAME: "-119.1", Y_FIELDNAME: "39.4" },
+            ]
+
+        # The compiled transform is reusable and matches the per-row path.
+        for row in rows:
+            self.assertEqual(transform(dict(row)), row_transform_and_convert(d, dict(row)))
+
+        r = transform(dict(rows[0]))
+        self.assertEqual(("123", "MAPLE ST", "#2", "Old Town"), (r["NUMBER"], r["STREET"], r["UNIT"], r["CITY"]))
+
+        r = transform(dict(rows[1]))
+        self.assertEqual(("45", "OAK", "", "New Town"), (r["NUMBER"], r["STREET"], r["UNIT"], r["CITY"]))
+
+        with self.assertRaises(ValueError):
+            compile_conform_transform({ "conform": { "split": "address" } })
+
     def test_row_canonicalize_unit_and_number(self):
         r = row_canonicalize_unit_and_number({}, {"NUMBER": "324 ", "STREET": " OAK DR.", "UNIT": "1"})
         self.assertEqual("324", r["NUMBER"])
@@ -351,6 +387,22 @@ class TestConformTransforms (unittest.TestCase):
         r = row_extract_and_reproject(d, {"LONG_WGS84": "-21,77", "LAT_WGS84": "64,11"})
         self.assertEqual({Y_FIELDNAME: "64.11", X_FIELDNAME: "-21.77"}, r)
 
+    def test_rows_extract_and_reproject(self):
+        d = { "conform" : { "lon": "X", "lat": "Y", "srs": "EPSG:2913", "format": "csv" }, 'protocol': 'test' }
+        rows = [{"X": "7655634.924", "Y": "668868.414", "n": "1"}, {"X": "", "Y": ""},
+                {"X": "bad", "Y": "668868.414"}, {"X": None, "Y": None}, {"X": "7655634,924", "Y": "668868,414"}]
+
+        r = rows_extract_and_reproject(d, rows)
+        self.assertEqual(r, [row_extract_and_reproject(d, row) for row in rows])
+
+        self.assertAlmostEqual(-122.630842186650796, float(r[0][X_FIELDNAME]))
+        self.assertAlmostEqual(45.481554393851063, float(r[0][Y_FIELDNAME]))
+        self.assertEqual("1", r[0]["n"])
+        self.assertEqual(("", ""), (r[1][X_FIELDNAME], r[1][Y_FIELDNAME]))
+        self.assertEqual(("", ""), (r[2][X_FIELDNAME], r[2][Y_FIELDNAME]))
+        self.assertEqual((None, None), (r[3][X_FIELDNAME], r[3][Y_FIELDNAME]))
+        self.assertEqual((r[0][X_FIELDNAME], r[0][Y_FIELDNAME]), (r[4][X_FIELDNAME], r[4][Y_FIELDNAME]))
+
     def test_row_fxn_prefixed_number_and_postfixed_street_no_units(self):
         "Regex prefixed_number and postfix_street - both fields present"
         c = { "conform": {
@@ -1538,6 +1590,68 @@ class TestConformCli (unittest.TestCase):
             rows = list(csv.DictReader(fp))
             self.assertEqual(rows[0]['STREET'], u'PZ ESPA\u00d1A')
 
+    def test_lake_man_shp_columnar(self):
+        with open(os.path.join(self.conforms_dir, 'lake-man-utf8.json')) as file:
+            source_definition = json.load(file)
+        source_path = os.path.join(self.conforms_dir, 'lake-man-utf8.shp')
+
+        # Batched reads, where supported, should match feature-by-feature reads.
+        fieldnames1, rows1 = iterate_ogr_source(source_definition, source_path, columnar=True)
+        fieldnames2, rows2 = iterate_ogr_source(source_definition, source_path, columnar=False)
+        self.assertEqual(fieldnames1, fieldnames2)
+        self.assertEqual(list(rows1), list(rows2))
+
+    def test_iterate_ogr_source_nullable_numbers(self):
+        source_definition = {'conform': {'srs': 'EPSG:4326'}}
+
+        # openaddr.conform is also the name of a function in openaddr.
+        conform_module = importlib.import_module('openaddr.conform')
+
+        with mock.patch.object(conform_module, 'ogr') as ogr, mock.patch.object(conform_module, 'osr'):
+            def field_defn(name, type, nullable):
+                defn = mock.Mock()
+                defn.GetName.return_value = defn.GetNameRef.return_value = name
+                defn.type, defn.IsNullable.return_value = type, nullable
+                defn.GetSubType.return_value = ogr.OFSTNone
+                return defn
+
+            def feature(number, street):
+                feature = mock.Mock()
+                feature.GetField.return_value = number
+                feature.GetFieldAsBinary.return_value = street
+                feature.GetGeometryRef.return_value = None
+                return feature
+
+            def column(values):
+                return mock.Mock(**{'tolist.return_value': values})
+
+            for nullable in (True, False):
+                layer = ogr.Open.return_value.GetLayerByIndex.return_value
+                layer.GetNextFeature.side_effect = [feature(85, b'MAITLAND DR'), feature(None, b''), None]
+                layer.GetGeometryColumn.return_value = 'wkb_geometry'
+                layer.GetLayerDefn.return_value.GetFieldCount.return_value = 2
+                layer.GetLayerDefn.return_value.GetFieldDefn.side_effect = \
+                    lambda i: [field_defn('NUMBER', ogr.OFTInteger, nullable), field_defn('STREET', ogr.OFTString, True)][i]
+
+                # Batched numbers have no validity bitmap, and nulls read as zero.
+                layer.GetArrowStreamAsNumPy.return_value = [{'NUMBER': column([85, 0]),
+                    'STREET': column([b'MAITLAND DR', None]), 'wkb_geometry': column([None, None])}]
+                layer.GetArrowStreamAsNumPy.reset_mock()
+
+                fieldnames, rows = iterate_ogr_source(source_definition, 'fake.shp')
+                rows = list(rows)
+
+                self.assertEqual(fieldnames, ['NUMBER', 'STREET', X_FIELDNAME, Y_FIELDNAME])
+                self.assertEqual([row['STREET'] for row in rows], ['MAITLAND DR', ''])
+                self.assertEqual([(row[X_FIELDNAME], row[Y_FIELDNAME]) for row in rows], [(None, None)] * 2)
+
+                if nullable:
+                    self.assertEqual([row['NUMBER'] for row in rows], [85, None])
+                    self.assertFalse(layer.GetArrowStreamAsNumPy.called)
+                else:
+                    self.assertEqual([row['NUMBER'] for row in rows], [85, 0])
+                    self.assertTrue(layer.GetArrowStreamAsNumPy.called)
+
     def test_lake_man_shp_epsg26943(self):
         rc, dest_path = self._run_conform_on_source('lake-man-epsg26943', 'shp')
         self.assertEqual(0, rc)
@@ -1825,6 +1939,61 @@ class TestConformMisc(unittest.TestCase):
         self.assertTrue(is_in('foo/Bar', ['foo/bar']), 'Should match a directory path case-insensitively')
         self.assertTrue(is_in('foo/Bar/baz', ['foo/bar']), 'Should match a directory path case-insensitively')
 
+        names = name_index(['foo/bar', 'baz/'])
+        self.assertTrue(is_in('foo/bar/baz', names), 'Should match a directory path in an index')
+        self.assertTrue(is_in('baz/foo', names), 'Should match a directory with a trailing slash')
+        self.assertFalse(is_in('foo/baz', names), 'Should not match a sibling path in an index')
+
+    def test_zip_decompress_stream(self):
+        zip_path = os.path.join(self.testdir, 'source.zip')
+
+        with zipfile.ZipFile(zip_path, 'w') as z:
+            z.writestr('Data/Addresses.csv', 'NUMBER,STREET,LAT,LON\n1,Main St,37.8,-122.2\n')
+            z.writestr('Data/Other.csv', 'NUMBER,STREET\n')
+            z.writestr('Ignored/Readme.txt', 'Nothing to see here')
+
+        # Without streaming, only the named file is extracted.
+        workdir1 = os.path.join(self.testdir, 'extracted')
+        paths1 = ZipDecompressTask().decompress([zip_path], workdir1, ['data/addresses.csv'])
+        self.assertEqual(paths1, [os.path.join(workdir1, 'unzipped', 'Data/Addresses.csv')])
+
+        # With streaming, the named file is not extracted at all.
+        workdir2 = os.path.join(self.testdir, 'streamed')
+        paths2 = ZipDecompressTask().decompress([zip_path], workdir2, ['data/addresses.csv'], True)
+        self.assertEqual(paths2, ['/vsizip/{}/Data/Addresses.csv'.format(zip_path)])
+        self.assertEqual(os.listdir(os.path.join(workdir2, 'unzipped')), [])
+        self.assertEqual(split_zip_member_path(paths2[0]), (zip_path, 'Data/Addresses.csv'))
+        self.assertIsNone(split_zip_member_path(paths1[0]))
+
+        with open_source_file(paths1[0], 'r', 'utf8') as file1, \
+             open_source_file(paths2[0], 'r', 'utf8') as file2:
+            self.assertEqual(file1.read(), file2.read())
+
+        source_definition = {
+            'protocol': 'http', 'conform': {'format': 'csv', 'file': 'Data/Addresses.csv',
+            'lat': 'LAT', 'lon': 'LON', 'number': 'NUMBER', 'street': 'STREET'}}
+
+        fieldnames, rows = iterate_csv_source(source_definition, paths2[0])
+        self.assertEqual(fieldnames, ['NUMBER', 'STREET', X_FIELDNAME, Y_FIELDNAME])
+        self.assertEqual(list(rows), [{'NUMBER': '1', 'STREET': 'Main St', X_FIELDNAME: '-122.2', Y_FIELDNAME: '37.8'}])
+
+        # Synthesized headers need to rewind the streamed file.
+        source_definition['conform'].update(headers=-1, lat='COLUMN3', lon='COLUMN4')
+        fieldnames, rows = iterate_csv_source(source_definition, paths2[0])
+        self.assertEqual(fieldnames, ['COLUMN1', 'COLUMN2', X_FIELDNAME, Y_FIELDNAME])
+        self.assertEqual(len(list(rows)), 2)
+
+    def test_zip_decompress_stream_directory(self):
+        zip_path = os.path.join(self.testdir, 'source.zip')
+
+        with zipfile.ZipFile(zip_path, 'w') as z:
+            z.writestr('Data/', '')
+            z.writestr('Data/Addresses.csv', 'NUMBER,STREET,LAT,LON\n1,Main St,37.8,-122.2\n')
+
+        # A directory entry named exactly is extracted, never streamed.
+        paths = ZipDecompressTask().decompress([zip_path], self.testdir, ['data'], True)
+        self.assertEqual(paths, [os.path.join(self.testdir, 'unzipped', 'Data/Addresses.csv')])
+
     def test_geojson_source_to_csv(self):
         '''
         '''
@@ -1838,6 +2007,147 @@ class TestConformMisc(unittest.TestCase):
             self.assertAlmostEqual(float(row[Y_FIELDNAME]), 40.054962450263616)
             self.assertEqual(row['PARCEL_NUM'], '02-022-003')
 
+    def test_find_csv_row_boundaries(self):
+        '''
+        '''
+        csv_path = os.path.join(self.testdir, 'extract.csv')
+        with open(csv_path, 'wb') as file:
+            file.write(b'A,B\r\n1,"x\r\ny"\r\n2,z\r\n3,"q\n""r"""\r\n')
+
+        self.assertEqual(find_csv_row_boundaries(csv_path, [0]), [5])
+        self.assertEqual(find_csv_row_boundaries(csv_path, [0, 6, 10, 16]), [5, 15, 20])
+        self.assertEqual(find_csv_row_boundaries(csv_path, [22]), [33])
+        self.assertEqual(find_csv_row_boundaries(csv_path, [33]), [])
+
+    def test_transform_to_out_csv_workers(self):
+        '''
+        '''
+        extract_path = os.path.join(self.testdir, 'extract.csv')
+        with open(extract_path, 'w', encoding='utf-8') as file:
+            rows = csv.writer(file)
+            rows.writerow(['ADDRESS', X_FIELDNAME, Y_FIELDNAME])
+            for index in range(1000):
+                address = '{} Main St' if index % 3 else '{} Ma\u00efn "St"\nUnit 1'
+                rows.writerow([address.format(index), '-122.{}'.format(index), '37.{}'.format(index)])
+
+        source = {'conform': {'format': 'csv', 'number': {'function': 'prefixed_number', 'field': 'ADDRESS'},
+                  'street': {'function': 'postfixed_street', 'field': 'ADDRESS'}}, 'fingerprint': '0000'}
+
+        serial_path = os.path.join(self.testdir, 'serial.csv')
+        transform_to_out_csv(source, extract_path, serial_path)
+
+        parallel_path = os.path.join(self.testdir, 'parallel.csv')
+        transform_to_out_csv(source, extract_path, parallel_path, workers=3)
+
+        with open(serial_path, 'rb') as file1, open(parallel_path, 'rb') as file2:
+            self.assertEqual(file1.read(), file2.read())
+
+    def test_iterate_extract_rows(self):
+        '''
+        '''
+        fieldnames = ['a', 'b', X_FIELDNAME, Y_FIELDNAME]
+        rows = iterate_extract_rows(fieldnames, [{'a': 'x\r\ny', 'b': 3, X_FIELDNAME: -122.25, Y_FIELDNAME: None}])
+        self.assertEqual(list(rows), [{'a': 'x\ny', 'b': '3', X_FIELDNAME: '-122.25', Y_FIELDNAME: ''}])
+
+        rows = iterate_extract_rows(fieldnames, [{'a': 'x', 'c': 'y'}])
+        self.assertRaises(ValueError, list, rows)
+
+    def test_conform_cli_streaming(self):
+        '''
+        '''
+        source_path = os.path.join(self.testdir, 'source.csv')
+        with open(source_path, 'w', encoding='utf-8', newline='') as file:
+            rows = csv.writer(file)
+            rows.writerow(['ADDRESS', 'LON', 'LAT', 'NOTE'])
+            for index in range(100):
+                rows.writerow(['{} Main\r\nSt'.format(index), '-122.{}'.format(index), '37.{}'.format(index), '\u2603' * (index % 2)])
+            rows.writerow(['1 Short St'])
+
+        source = {'conform': {'format': 'csv', 'lon': 'LON', 'lat': 'LAT',
+                  'number': {'function': 'prefixed_number', 'field': 'ADDRESS'},
+                  'street': {'function': 'postfixed_street', 'field': 'ADDRESS'}},
+                  'protocol': 'http', 'fingerprint': '0000'}
+
+        extract_path = os.path.join(self.testdir, 'extract.csv')
+        debug_path = os.path.join(self.testdir, 'debug.csv')
+        self.assertEqual(0, conform_cli(source, source_path, debug_path, extract_path=extract_path))
+        self.assertTrue(os.path.exists(extract_path))
+
+        stream_path, stream_stats = os.path.join(self.testdir, 'stream.csv'), ConformStats()
+        self.assertEqual(0, conform_cli(source, source_path, stream_path, stats=stream_stats))
+
+        parallel_path, parallel_stats = os.path.join(self.testdir, 'parallel.csv'), ConformStats()
+        self.assertEqual(0, conform_cli(source, source_path, parallel_path, workers=2, stats=parallel_stats))
+
+        with open(debug_path, 'rb') as file1, open(stream_path, 'rb') as file2:
+            self.assertEqual(file1.read(), file2.read())
+
+        # Quoted newlines in addresses don't throw off the row count.
+        self.assertEqual(stream_stats.todict(), parallel_stats.todict())
+        self.assertEqual(stream_stats.row_count, 101)
+        self.assertEqual(stream_stats.invalid_latlon_count, 1)
+        self.assertEqual(stream_stats.missing_number_count, 0)
+        self.assertEqual(stream_stats.missing_street_count, 0)
+        self.assertEqual(stream_stats.bbox, [-122.99, 37.0, -122.0, 37.99])
+
+    def test_conform_stats(self):
+        '''
+        '''
+        stats1, stats2 = ConformStats(), ConformStats()
+        stats1.add_row({'LON': '-122.25', 'LAT': '37.8', 'NUMBER': '1', 'STREET': 'Main St'})
+        stats1.add_row({'LON': '', 'LAT': '', 'NUMBER': '2', 'STREET': 'Main St'})
+        stats1.add_row({'LON': 'nan', 'LAT': '37.8', 'NUMBER': '', 'STREET': 'Main St'})
+        stats2.add_row({'LON': '-122.5', 'LAT': '95', 'NUMBER': '3', 'STREET': ''})
+        stats2.add_row({'LON': '-121.5', 'LAT': '38', 'NUMBER': None, 'STREET': None})
+
+        self.assertEqual(stats1.bbox, [-122.25, 37.8, -122.25, 37.8])
+        self.assertEqual(stats2.bbox, [-121.5, 38, -121.5, 38])
+
+        stats1.update(stats2)
+        self.assertEqual(stats1.todict(), dict(row_count=5, invalid_latlon_count=3,
+                         missing_number_count=2, missing_street_count=2,
+                         bbox=[-122.25, 37.8, -121.5, 38]))
+
+        stats3 = ConformStats()
+        stats3.update(ConformStats())
+        self.assertIsNone(stats3.bbox)
+
+    def test_convert_extract_path(self):
+        '''
+        '''
+        conform_module = importlib.import_module('openaddr.conform')
+        source_definition = {'conform': {'format': 'csv'}}
+
+        with mock.patch.object(conform_module, 'conform_cli') as conform_cli, \
+             mock.patch.object(conform_module, 'find_source_path') as find_source_path:
+            conform_cli.return_value, find_source_path.return_value = 0, 'source.csv'
+            ConvertToCsvTask().convert(source_definition, ['source.csv'], self.testdir, 2, 'extracted.csv')
+
+        self.assertEqual(conform_cli.mock_calls[0][1][:5], (source_definition, 'source.csv',
+            os.path.join(self.testdir, 'converted', 'source.csv'), 2, 'extracted.csv'))
+
+    def test_geojson_centroid_xy(self):
+        '''
+        '''
+        self.assertIsNone(_geojson_centroid_xy(None))
+        self.assertEqual(_geojson_centroid_xy({'type': 'Point', 'coordinates': [-122.25, 37.8]}), (-122.25, 37.8))
+        self.assertEqual(_geojson_centroid_xy({'type': 'MultiPoint', 'coordinates': [[0, 0], [2, 4]]}), (1, 2))
+
+        x, y = _geojson_centroid_xy({'type': 'LineString', 'coordinates': [[0, 0], [2, 0], [2, 4]]})
+        self.assertAlmostEqual(x, 10/6)
+        self.assertAlmostEqual(y, 8/6)
+
+        # Shell wound clockwise, hole wound counter-clockwise
+        square = [[0, 0], [0, 4], [4, 4], [4, 0], [0, 0]]
+        hole = [[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]]
+        x, y = _geojson_centroid_xy({'type': 'Polygon', 'coordinates': [square, hole]})
+        self.assertAlmostEqual(x, 30.5/15)
+        self.assertAlmostEqual(y, 30.5/15)
+
+        x, y = _geojson_centroid_xy({'type': 'MultiPolygon', 'coordinates': [[square], [hole[::-1]]]})
+        self.assertAlmostEqual(x, 33.5/17)
+        self.assertAlmostEqual(y, 33.5/17)
+
 class TestConformCsv(unittest.TestCase):
     "Fixture to create real files to test csv_source_to_csv()"
 
@@ -4,12 +4,12 @@ from __future__ import print_function
 from sys import stderr
 from os import environ
 from shutil import rmtree
-from os.path import join
+from os.path import join, dirname
 from tempfile import mkdtemp
 from urllib.parse import parse_qsl
 from zipfile import ZipFile
 from datetime import date
-import unittest
+import unittest, json, os
 
 import mock
 from httmock import HTTMock, response
@@ -19,7 +19,9 @@ from ..ci.objects import RunState
 
 from ..dotmap import (
     stream_all_features, call_tippecanoe, _upload_to_s3,
-    _mapbox_get_credentials, _mapbox_create_upload
+    _mapbox_get_credentials, _mapbox_create_upload,
+    iterate_feature_lines, stream_all_feature_bytes, write_to_pipes,
+    iterate_encoded_files
     )
 
 class TestDotmap (unittest.TestCase):
@@ -40,6 +42,11 @@ class TestDotmap (unittest.TestCase):
         zf.writestr('stuff.csv', u'LON,LAT,CITY\n0,0,Womp\n-122.413729,37.775641,Wómp Wómp\n'.encode('utf8'))
         zf.close()
 
+        self.results.append(LocalProcessedResult('us/nowhere', join(self.test_dir, 'file3.zip'), RunState(None), None))
+        zf = ZipFile(self.results[-1].filename, 'w')
+        zf.writestr('stuff.csv', u'LON,LAT,NUMBER,STREET\n,,1,Nowhere\n1.5,-2,"2%s","Main ""St"""\n'.encode('utf8'))
+        zf.close()
+
     def tearDown(self):
         rmtree(self.test_dir)
 
@@ -166,3 +173,108 @@ class TestDotmap (unittest.TestCase):
                 _mapbox_create_upload('http://example.com/whatever', 'oa.tiles', 'goofus', '0xDEADBEEF')
 
         self.assertIn('Streams are crossed', str(error.exception))
+
+    def test_iterate_feature_lines(self):
+        '''
+        '''
+        for result in self.results:
+            with ZipFile(result.filename) as zipfile:
+                lines = list(iterate_feature_lines(zipfile))
+
+            # Lines are the same as encoded feature dictionaries.
+            expected = [json.dumps(feature) + '\n' for feature in stream_all_features([result])]
+            self.assertEqual(lines, expected)
+
+        self.assertEqual(json.loads(lines[0])['properties'], {'NUMBER': '2%s', 'STREET': 'Main "St"'})
+
+    def test_stream_all_feature_bytes(self):
+        '''
+        '''
+        expected = b''.join([json.dumps(feature).encode('utf8') + b'\n'
+                             for feature in stream_all_features(self.results)])
+
+        with mock.patch('openaddr.dotmap.FEATURE_CHUNK_SIZE', 64):
+            chunks = list(stream_all_feature_bytes(self.results, 2))
+
+        self.assertEqual(b''.join(chunks), expected)
+        self.assertGreater(len(chunks), 4)
+
+        # Processed files are taken over and removed.
+        self.assertEqual(os.listdir(self.test_dir), [])
+
+    def test_write_to_pipes(self):
+        '''
+        '''
+        pipe1, pipe2 = mock.Mock(), mock.Mock()
+        chunks = [str(i).encode('ascii') for i in range(1000)]
+
+        with mock.patch('openaddr.dotmap.PIPE_QUEUE_SIZE', 2):
+            write_to_pipes(iter(chunks), [pipe1, pipe2])
+
+        self.assertEqual([call[1][0] for call in pipe1.write.mock_calls], chunks)
+        self.assertEqual([call[1][0] for call in pipe2.write.mock_calls], chunks)
+
+        # A broken pipe does not stop the other one, and is raised at the end.
+        pipe1, pipe2 = mock.Mock(), mock.Mock()
+        pipe1.write.side_effect = BrokenPipeError()
+
+        with mock.patch('openaddr.dotmap.PIPE_QUEUE_SIZE', 2):
+            with self.assertRaises(BrokenPipeError):
+                write_to_pipes(iter(chunks), [pipe1, pipe2])
+
+        self.assertEqual(len(pipe1.write.mock_calls), 1)
+        self.assertEqual([call[1][0] for call in pipe2.write.mock_calls], chunks)
+
+    def test_call_tippecanoe_files(self):
+        '''
+        '''
+        with mock.patch('subprocess.Popen') as Popen:
+            call_tippecanoe('oa.mbtiles', True, ['a.geojson', 'b.geojson'])
+            call_tippecanoe('oa.mbtiles', False, ['a.csv', 'b.csv'])
+
+        (_, args1, kwargs1), (_, args2, kwargs2) = Popen.mock_calls
+        self.assertEqual(args1[0][-3:], ('--read-parallel', 'a.geojson', 'b.geojson'))
+        self.assertEqual(args1[0][-13:-3], (
+            '--include', 'NUMBER', '--include', 'STREET', '--include', 'UNIT',
+            '--maximum-zoom', '15', '--minimum-zoom', '15'
+            ))
+        self.assertEqual(args2[0][-4:], ('--base-zoom', '15', 'a.csv', 'b.csv'))
+        self.assertNotIn('stdin', kwargs1)
+        self.assertNotIn('stdin', kwargs2)
+
+    def test_tippecanoe_input_files(self):
+        '''
+        '''
+        path = os.pathsep.join([join(dirname(__file__), 'bin'), os.environ['PATH']])
+        outputs = dict()
+
+        # Run a stand-in tippecanoe that reports what it read.
+        with mock.patch.dict(os.environ, PATH=path):
+            for input_format in ('geojson', 'csv'):
+                results = [LocalProcessedResult(result.source_base, join(self.test_dir, 'copy.zip'), result.run_state, None)
+                           for result in self.results[:2]]
+                input_dirname = mkdtemp(dir=self.test_dir)
+
+                # Each result is taken over in turn, like iterate_local_processed_files() does.
+                def iterate_results():
+                    for (original, result) in zip(self.results, results):
+                        with open(original.filename, 'rb') as file1, open(result.filename, 'wb') as file2:
+                            file2.write(file1.read())
+                        yield result
+
+                filenames = list(iterate_encoded_files(iterate_results(), 2, input_dirname, input_format))
+                self.assertEqual([os.path.splitext(name)[1] for name in filenames], ['.' + input_format] * 2)
+
+                mbtiles_filename = join(self.test_dir, 'out.mbtiles')
+                call_tippecanoe(mbtiles_filename, True, filenames).wait()
+
+                with open(mbtiles_filename) as file:
+                    outputs[input_format] = json.load(file)
+
+        features = [dict(coordinates=list(f['geometry']['coordinates']), properties=f['properties'])
+                    for f in stream_all_features(self.results[:2])]
+
+        self.assertEqual(outputs['geojson']['features'], features)
+        self.assertEqual(outputs['csv']['features'], features)
+        self.assertIn('--read-parallel', outputs['geojson']['args'])
+        self.assertNotIn('--read-parallel', outputs['csv']['args'])
@@ -0,0 +1,171 @@
+# coding=utf8
+from __future__ import division
+
+import os
+import json
+import unittest
+import tempfile
+import mock
+
+from os.path import join, dirname
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+from csv import DictReader, DictWriter
+from io import TextIOWrapper
+from shutil import rmtree
+
+from .. import geoparquet, util, dotmap, LocalProcessedResult
+from ..ci import collect
+
+@unittest.skipIf(geoparquet.pyarrow is None, 'GeoParquet output requires pyarrow')
+class TestGeoParquet (unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix='TestGeoParquet-')
+
+        # Start with real output, and add some rows with odd locations.
+        with ZipFile(join(dirname(__file__), 'outputs', 'alameda.zip')) as zipfile:
+            with zipfile.open('alameda/us/ca/alameda.csv') as file:
+                rows = list(DictReader(TextIOWrapper(file, 'utf8')))
+                fieldnames = list(rows[0].keys())
+
+        extra = dict(NUMBER='1', STREET=u'Ålameda Way', UNIT='', CITY='', DISTRICT='', REGION='', POSTCODE='', ID='')
+        rows.append(dict(extra, LON='', LAT=''))
+        rows.append(dict(extra, LON='-122', LAT='37'))
+        rows.append(dict(extra, LON='nan', LAT='1e-07'))
+        rows.append(dict(extra, LON='-1.79769313486e+308', LAT='-1.79769313486e+308'))
+
+        self.csv_path = join(self.temp_dir, 'out.csv')
+
+        with open(self.csv_path, 'w', encoding='utf8', newline='') as file:
+            out = DictWriter(file, fieldnames)
+            out.writeheader()
+            out.writerows(rows)
+
+    def tearDown(self):
+        rmtree(self.temp_dir)
+
+    def _read_csv(self):
+        with open(self.csv_path, encoding='utf8') as file:
+            return list(DictReader(file))
+
+    def test_write_parquet(self):
+        '''
+        '''
+        parquet_path = geoparquet.get_parquet_path(self.csv_path)
+        self.assertEqual(parquet_path, join(self.temp_dir, 'out.parquet'))
+
+        with mock.patch('openaddr.geoparquet.ROW_GROUP_SIZE', 1000):
+            self.assertEqual(geoparquet.write_parquet(self.csv_path, parquet_path), parquet_path)
+
+        parquet_file = geoparquet.open_parquet(parquet_path)
+        self.assertEqual(parquet_file.metadata.num_row_groups, 6)
+        self.assertEqual(str(parquet_file.schema_arrow.field('LON').type), 'double')
+        self.assertEqual(str(parquet_file.schema_arrow.field('NUMBER').type), 'string')
+
+        geo = json.loads(parquet_file.schema_arrow.metadata[b'geo'].decode('utf8'))
+        self.assertEqual(geo['primary_column'], 'geometry')
+        self.assertEqual(geo['columns']['geometry']['encoding'], 'WKB')
+
+        expected_rows = self._read_csv()
+        rows = list(geoparquet.iterate_rows(parquet_file))
+        self.assertEqual([row for (_, _, row) in rows], expected_rows)
+        self.assertEqual(rows[0][:2], (-122.2371548, 37.7468954))
+        self.assertEqual(rows[-4][:2], (None, None))
+        self.assertEqual(rows[-3][:2], (-122, 37))
+
+        # Compare as strings, because NaN is not equal to itself.
+        lonlats = list(map(repr, geoparquet.iterate_lonlats(parquet_file)))
+        self.assertEqual(lonlats, [repr((lon, lat)) for (lon, lat, _) in rows])
+        self.assertEqual(lonlats[-2], '(nan, 1e-07)')
+
+    def test_zipped_parquet(self):
+        '''
+        '''
+        geoparquet.write_parquet(self.csv_path, geoparquet.get_parquet_path(self.csv_path))
+        zip_path = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+
+        try:
+            with ZipFile(zip_path) as zipfile:
+                self.assertEqual(zipfile.getinfo('us-ca-alameda.parquet').compress_type, ZIP_STORED)
+                name, parquet_file = geoparquet.open_zipped_parquet(zipfile)
+
+            self.assertEqual(name, 'us-ca-alameda.parquet')
+            rows = [row for (_, _, row) in geoparquet.iterate_rows(parquet_file)]
+            self.assertEqual(rows, self._read_csv())
+
+            # Compressed members are read into memory instead.
+            with ZipFile(zip_path) as zipfile1, ZipFile(zip_path + '2', 'w') as zipfile2:
+                zipfile2.writestr('out.parquet', zipfile1.read(name), ZIP_DEFLATED)
+
+            with ZipFile(zip_path + '2') as zipfile:
+                _, parquet_file = geoparquet.open_zipped_parquet(zipfile)
+
+            rows = [row for (_, _, row) in geoparquet.iterate_rows(parquet_file)]
+            self.assertEqual(rows, self._read_csv())
+        finally:
+            os.remove(zip_path)
+            if os.path.exists(zip_path + '2'):
+                os.remove(zip_path + '2')
+
+    def test_collect_from_parquet(self):
+        '''
+        '''
+        zip_path1 = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+        geoparquet.write_parquet(self.csv_path, geoparquet.get_parquet_path(self.csv_path))
+        zip_path2 = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+
+        try:
+            collected = list()
+
+            for zip_path in (zip_path1, zip_path2):
+                result = LocalProcessedResult('us/ca/alameda', zip_path, mock.Mock(), None)
+                collection_path = join(self.temp_dir, 'collection.zip')
+
+                with ZipFile(collection_path, 'w') as zip_out:
+                    collect.add_source_to_zipfile(zip_out, result)
+
+                with ZipFile(collection_path) as zip_out:
+                    collected.append({name: zip_out.read(name) for name in zip_out.namelist()})
+
+            # Collections are identical whether rows were read from CSV or GeoParquet.
+            self.assertNotIn('us-ca-alameda.parquet', collected[1])
+            self.assertEqual(collected[0], collected[1])
+        finally:
+            os.remove(zip_path1)
+            os.remove(zip_path2)
+
+    def test_dotmap_from_parquet(self):
+        '''
+        '''
+        zip_path1 = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+        geoparquet.write_parquet(self.csv_path, geoparquet.get_parquet_path(self.csv_path))
+        zip_path2 = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+
+        try:
+            with ZipFile(zip_path1) as zipfile1, ZipFile(zip_path2) as zipfile2:
+                lines1 = list(dotmap.iterate_feature_lines(zipfile1))
+                lines2 = list(dotmap.iterate_feature_lines(zipfile2))
+
+            # Features are identical whether rows were read from CSV or GeoParquet.
+            self.assertEqual(lines1, lines2)
+            self.assertGreater(len(lines1), 5000)
+        finally:
+            os.remove(zip_path1)
+            os.remove(zip_path2)
+
+    def test_no_pyarrow(self):
+        '''
+        '''
+        parquet_path = geoparquet.get_parquet_path(self.csv_path)
+
+        with mock.patch('openaddr.geoparquet.pyarrow', None):
+            self.assertIsNone(geoparquet.write_parquet(self.csv_path, parquet_path))
+            self.assertIsNone(geoparquet.open_parquet(parquet_path))
+
+            zip_path = util.package_output('us-ca-alameda', self.csv_path, 'http://example.com', 'ODbL')
+
+            try:
+                with ZipFile(zip_path) as zipfile:
+                    self.assertIsNone(geoparquet.open_zipped_parquet(zipfile))
+            finally:
+                os.remove(zip_path)
@@ -3,7 +3,7 @@ from __future__ import absolute_import, division, print_function
 import json
 import unittest
 
-from io import BytesIO
+from io import BytesIO, StringIO
 
 from ..sample import sample_geojson, stream_geojson
 
@@ -79,3 +79,25 @@ class TestSample (unittest.TestCase):
         self.assertEqual(len(feature3['geometry']['coordinates']), 1)
         self.assertEqual(feature3['geometry']['coordinates'][0][0][0], 100.)
         self.assertEqual(feature3['geometry']['coordinates'][0][0][1], 0.)
+
+    def test_stream_numbers(self):
+        geojson_input = u'''{ "type": "FeatureCollection", "features": [
+                            { "type": "Feature", "geometry": {"type": "Point", "coordinates": [102.0, 0.5]}, "properties": {"int": 1, "float": 1.5, "round": 2.0, "name": "\u2603"} }
+                            ] }'''
+
+        for stream in (StringIO(geojson_input), BytesIO(geojson_input.encode('utf8'))):
+            (feature, ) = stream_geojson(stream)
+            self.assertEqual(feature['properties'], {'int': 1, 'float': 1.5, 'round': 2, 'name': u'\u2603'})
+            self.assertIs(type(feature['properties']['round']), int)
+            self.assertIs(type(feature['geometry']['coordinates'][1]), float)
+
+    def test_stream_root(self):
+        for geojson_input in (u'[{ "type": "FeatureCollection", "features": [] }]', u'"features"', u'  ', u''):
+            for stream in (StringIO(geojson_input), BytesIO(geojson_input.encode('utf8'))):
+                with self.assertRaises(ValueError):
+                    list(stream_geojson(stream))
+
+        # Leading whitespace is skipped, and the peeked bytes are still parsed.
+        geojson_input = u'''\n\t { "features": [ { "type": "Feature", "geometry": null, "properties": {} } ] }'''
+        (feature, ) = stream_geojson(StringIO(geojson_input))
+        self.assertEqual(feature, {'type': 'Feature', 'geometry': None, 'properties': {}})
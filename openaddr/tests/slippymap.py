@@ -1,6 +1,7 @@
 from __future__ import division
 
 import os
+import json
 import unittest
 import tempfile
 import mock
@@ -65,3 +66,32 @@ class TestSlippyMap (unittest.TestCase):
             os.remove(mbtiles_filename)
             os.remove(csv_filename)
             os.rmdir(temp_dir)
+
+    def test_render_input_files(self):
+        '''
+        '''
+        zip_filename = join(dirname(__file__), 'outputs', 'alameda.zip')
+        mbtiles_filename = join(self.temp_dir, 'out.mbtiles')
+        path = os.pathsep.join([join(dirname(__file__), 'bin'), os.environ['PATH']])
+        outputs = dict()
+
+        # Run a stand-in tippecanoe that reports what it read.
+        with mock.patch.dict(os.environ, PATH=path):
+            for input_format in ('stdin', 'geojson', 'csv'):
+                slippymap.generate(mbtiles_filename, zip_filename, input_format=input_format, temp_dir=self.temp_dir)
+
+                with open(mbtiles_filename) as file:
+                    outputs[input_format] = json.load(file)
+
+        self.assertNotIn('--read-parallel', outputs['stdin']['args'])
+        self.assertIn('--read-parallel', outputs['geojson']['args'])
+        self.assertNotIn('--read-parallel', outputs['csv']['args'])
+
+        # Every input gives the same features, and input files are removed.
+        self.assertEqual(len(outputs['stdin']['features']), 5305)
+        self.assertEqual(outputs['geojson']['features'], outputs['stdin']['features'])
+        self.assertEqual(outputs['csv']['features'], outputs['stdin']['features'])
+        self.assertEqual(os.listdir(self.temp_dir), ['out.mbtiles'])
+
+        with self.assertRaises(ValueError):
+            slippymap.generate(mbtiles_filename, zip_filename, input_format='flatgeobuf')
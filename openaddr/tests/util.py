@@ -2,7 +2,7 @@
 # Test suite. This code could be in a separate file
 
 from shutil import rmtree
-from os.path import dirname, join
+from os.path import dirname, join, samefile
 from datetime import datetime
 from shlex import quote
 
@@ -162,6 +162,33 @@ class TestUtilities (unittest.TestCase):
         key6.name, key6.bucket.name = u'/kéy6', 'bucket6'
         self.assertEqual(util.s3_key_url(key6), u'https://s3.amazonaws.com/bucket6/kéy6')
 
+    def test_link_or_copy(self):
+        '''
+        '''
+        tempdir = tempfile.mkdtemp(prefix='test_link_or_copy-')
+        src_path, dest_path = join(tempdir, 'src'), join(tempdir, 'dest')
+
+        try:
+            with open(src_path, 'w') as file:
+                file.write('Yo')
+
+            with open(dest_path, 'w') as file:
+                file.write('Old')
+
+            util.link_or_copy(src_path, dest_path)
+            self.assertTrue(samefile(src_path, dest_path), 'Should be a link')
+
+            with patch('openaddr.util.link') as link:
+                link.side_effect = OSError('Invalid cross-device link')
+                util.link_or_copy(src_path, dest_path)
+
+            self.assertFalse(samefile(src_path, dest_path), 'Should be a copy')
+
+            with open(dest_path) as file:
+                self.assertEqual(file.read(), 'Yo')
+        finally:
+            rmtree(tempdir)
+
     def test_log_current_usage(self):
         '''
         '''
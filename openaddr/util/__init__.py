@@ -5,7 +5,8 @@ from datetime import datetime, timedelta, date
 from os.path import join, basename, splitext, dirname, exists
 from operator import attrgetter
 from tempfile import mkstemp
-from os import close, getpid
+from os import close, getpid, link, remove
+from shutil import copyfile
 import glob
 import collections
 import ftplib
@@ -15,6 +16,8 @@ import zipfile
 import time
 import re
 
+from ..geoparquet import get_parquet_path
+
 RESOURCE_LOG_INTERVAL = timedelta(seconds=30)
 RESOURCE_LOG_FORMAT = 'Resource usage: {{ user: {user:.0f}%, system: {system:.0f}%, ' \
     'memory: {memory:.0f}MB, read: {read:.0f}KB, written: {written:.0f}KB, ' \
@@ -62,6 +65,8 @@ def set_autoscale_capacity(autoscale, cloudwatch, cloudwatch_ns, capacity):
 
 def package_output(source, processed_path, website, license):
     ''' Write a zip archive to temp dir with processed data and optional .vrt.
+
+        A GeoParquet file alongside processed_path is included if it exists.
     '''
     _, ext = splitext(processed_path)
     handle, zip_path = mkstemp(prefix='util-package_output-', suffix='.zip')
@@ -83,6 +88,12 @@ def package_output(source, processed_path, website, license):
             zip_file.writestr(source + '.vrt', content.encode('utf8'))
 
     zip_file.write(processed_path, source + ext)
+
+    parquet_path = get_parquet_path(processed_path)
+    if exists(parquet_path):
+        # Already compressed, and stored as-is so readers can map it in place.
+        zip_file.write(parquet_path, source + '.parquet', compress_type=zipfile.ZIP_STORED)
+
     zip_file.close()
 
     return zip_path
@@ -136,6 +147,19 @@ def request_ftp_file(url):
     # Using mock response because HTTP responses are expected downstream
     return httmock.response(200, file.read(), headers={'Content-Type': 'application/octet-stream'})
 
+def link_or_copy(src_path, dest_path):
+    ''' Hard link a file to a new path, or copy it where a link is impossible.
+
+        Replaces any file already at the new path.
+    '''
+    if exists(dest_path):
+        remove(dest_path)
+
+    try:
+        link(src_path, dest_path)
+    except OSError:
+        copyfile(src_path, dest_path)
+
 def s3_key_url(key):
     '''
     '''
@@ -40,7 +40,7 @@ setup(
             'schema.pgsql'
         ],
         'openaddr.tests': [
-            'data/*.*', 'outputs/*.*', 'sources/*.*', 'sources/fr/*.*',
+            'bin/*', 'data/*.*', 'outputs/*.*', 'sources/*.*', 'sources/fr/*.*',
             'sources/us/*/*.*', 'sources/de/*.*', 'sources/nl/*.*',
             'sources/be/*/*.json', 'conforms/lake-man-gdb.gdb/*',
             'conforms/*.csv', 'conforms/*.dbf', 'conforms/*.zip', 'conforms/*.gfs',
@@ -121,5 +121,11 @@ setup(
         'pyclipper==1.1.0',
         'six==1.11.0',
 
-        ]
+        ],
+    extras_require = {
+        # Optional GeoParquet output and readers in openaddr.geoparquet,
+        # needs Python 3.6+ so it's not part of the machine image.
+        # https://arrow.apache.org/docs/python/
+        'geoparquet': ['pyarrow >= 3.0'],
+    }
 )
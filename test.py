@@ -21,12 +21,13 @@ from openaddr import jobs
 
 from openaddr.tests import TestOA, TestState, TestPackage
 from openaddr.tests.sample import TestSample
-from openaddr.tests.cache import TestCacheExtensionGuessing, TestCacheEsriDownload
+from openaddr.tests.cache import TestCacheExtensionGuessing, TestCacheEsriDownload, TestCacheURLDownload, TestCacheDownloadCache
 from openaddr.tests.conform import TestConformCli, TestConformTransforms, TestConformMisc, TestConformCsv, TestConformLicense, TestConformTests
 from openaddr.tests.render import TestRender
 from openaddr.tests.dotmap import TestDotmap
 from openaddr.tests.preview import TestPreview
 from openaddr.tests.slippymap import TestSlippyMap
+from openaddr.tests.geoparquet import TestGeoParquet
 from openaddr.tests.util import TestUtilities
 from openaddr.tests.summarize import TestSummarizeFunctions
 from openaddr.tests.parcels import TestParcelsUtils, TestParcelsParse